@@ -1,54 +1,40 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+import logging
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, AsyncSessionLocal
+from app.config import settings
 from app.schemas import ChatRequest, ChatResponse
-from app.services.rag import generate_rag_answer_with_context
+from app.services.rag import generate_rag_answer_with_context, stream_rag_answer_with_context
 from app.models import QueryLog, Conversation, Message
 import json
 
+logger = logging.getLogger(__name__)
+
+# Length of Conversation.last_message_preview (also in migrations/add_conversation_summary.sql)
+PREVIEW_LENGTH = 100
+
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
 
 @router.post("", response_model=ChatResponse)
 async def ask_question(
     request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Ask a question about indexed papers using RAG pipeline with conversation context
+
+    No connection is held while the provider is called: the history is read
+    in a first transaction, retrieval runs in a second one (committed by the
+    RAG pipeline), and the conversation, messages and query log are written
+    in a last one once the answer is there.
     """
     try:
-        # Get or create conversation
-        if request.conversation_id:
-            conversation = db.query(Conversation).filter(
-                Conversation.id == request.conversation_id
-            ).first()
-            if not conversation:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-
-            # Load conversation history
-            messages = db.query(Message).filter(
-                Message.conversation_id == request.conversation_id
-            ).order_by(Message.created_at).all()
-
-            conversation_history = [
-                {"role": msg.role, "content": msg.content}
-                for msg in messages
-            ]
-        else:
-            # Create new conversation
-            conversation = Conversation(title=request.question[:50] + "..." if len(request.question) > 50 else request.question)
-            db.add(conversation)
-            db.flush()  # Get the ID without committing
-            conversation_history = []
-
-        # Save user message
-        user_message = Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=request.question
-        )
-        db.add(user_message)
+        conversation_history = await _load_history(db, request.conversation_id)
+        await db.commit()  # Release the connection before the embedding call
 
         # Generate answer using RAG pipeline with conversation context
         result = await generate_rag_answer_with_context(
@@ -56,44 +42,12 @@ async def ask_question(
             question=request.question,
             conversation_history=conversation_history,
             max_sources=request.max_sources,
-            paper_ids=request.paper_ids
-        )
-
-        # Save assistant message with sources
-        sources_json = json.dumps([
-            {
-                "paper_title": src["paper_title"],
-                "paper_year": src["paper_year"],
-                "section_name": src["section_name"],
-                "content": src["content"],
-                "relevance_score": src["relevance_score"]
-            }
-            for src in result["sources"]
-        ])
-
-        assistant_message = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            content=result["answer"],
-            sources=sources_json,
-            cost_usd=result["cost_usd"],
-            response_time_ms=result["response_time_ms"]
-        )
-        db.add(assistant_message)
-
-        # Log the query
-        query_log = QueryLog(
-            question=request.question,
-            answer=result["answer"],
-            nb_sources=len(result["sources"]),
-            prompt_tokens=result["prompt_tokens"],
-            completion_tokens=result["completion_tokens"],
-            cost_usd=result["cost_usd"],
-            response_time_ms=result["response_time_ms"]
+            paper_ids=request.paper_ids,
+            search_mode=request.search_mode
         )
-        db.add(query_log)
 
-        db.commit()
+        conversation_id = await _save_exchange(db, request, result)
+        await db.commit()
 
         # Return the response
         return ChatResponse(
@@ -101,12 +55,232 @@ async def ask_question(
             sources=result["sources"],
             cost_usd=result["cost_usd"],
             response_time_ms=result["response_time_ms"],
-            conversation_id=conversation.id
+            conversation_id=conversation_id
         )
 
     except ValueError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error generating answer: {str(e)}")
+
+
+@router.post("/stream")
+async def ask_question_stream(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Streaming variant of ask_question (Server-Sent Events)
+
+    Events: `conversation` ({conversation_id}), `sources`, one `token` per
+    generated fragment, then `done` (usage, cost, response time) or `error`.
+    The messages and the query log are saved once the stream completes.
+    """
+    if request.conversation_id:
+        exists = await db.scalar(
+            select(Conversation.id).where(Conversation.id == request.conversation_id)
+        )
+        if not exists:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+    return StreamingResponse(
+        _stream_answer(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _stream_answer(request: ChatRequest) -> AsyncIterator[str]:
+    """
+    Runs the streaming RAG pipeline and formats its events as SSE
+
+    The request-scoped session is closed before the response body is sent,
+    so the stream uses its own session. As in ask_question, nothing is
+    written before the answer is complete: the id of a new conversation is
+    reserved from its sequence so that it can be sent first.
+    """
+    db = AsyncSessionLocal()
+    try:
+        conversation_history = await _load_history(db, request.conversation_id)
+        conversation_id = request.conversation_id or await _reserve_conversation_id(db)
+        await db.commit()  # Release the connection before the embedding call
+        yield _sse("conversation", {"conversation_id": conversation_id})
+
+        async for event in stream_rag_answer_with_context(
+            db=db,
+            question=request.question,
+            conversation_history=conversation_history,
+            max_sources=request.max_sources,
+            paper_ids=request.paper_ids,
+            search_mode=request.search_mode
+        ):
+            if event["type"] == "sources":
+                yield _sse("sources", {"sources": event["sources"]})
+            elif event["type"] == "token":
+                yield _sse("token", {"content": event["content"]})
+            else:
+                await _save_exchange(db, request, event, conversation_id)
+                await db.commit()
+                yield _sse("done", {
+                    "conversation_id": conversation_id,
+                    "cost_usd": event["cost_usd"],
+                    "response_time_ms": event["response_time_ms"],
+                    "prompt_tokens": event["prompt_tokens"],
+                    "completion_tokens": event["completion_tokens"]
+                })
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error streaming answer: {str(e)}", exc_info=True)
+        yield _sse("error", {"detail": f"Error generating answer: {str(e)}"})
+    finally:
+        # Also reached when the client disconnects: nothing is saved then
+        await db.rollback()
+        await db.close()
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    Formats one Server-Sent Event
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _load_history(db: AsyncSession, conversation_id: Optional[int]) -> List[Dict[str, str]]:
+    """
+    Loads the last settings.CHAT_HISTORY_WINDOW messages of a conversation,
+    oldest first ([] for a new conversation)
+
+    Only role and content are read, through ix_messages_conversation_created_at_id
+
+    Raises:
+        HTTPException: 404 if the conversation does not exist
+    """
+    if not conversation_id:
+        return []
+
+    exists = await db.scalar(select(Conversation.id).where(Conversation.id == conversation_id))
+    if not exists:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    rows = (await db.execute(
+        select(Message.role, Message.content)
+        .where(Message.conversation_id == conversation_id)
+        # Both messages of an exchange share created_at (same transaction): id breaks the tie
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(settings.CHAT_HISTORY_WINDOW)
+    )).all()
+
+    return [
+        {"role": row.role, "content": row.content}
+        for row in reversed(rows)
+    ]
+
+
+async def _reserve_conversation_id(db: AsyncSession) -> int:
+    """
+    Takes the next id of the conversations sequence without inserting a row
+    """
+    return await db.scalar(
+        select(func.nextval(func.pg_get_serial_sequence(Conversation.__tablename__, "id")))
+    )
+
+
+async def _save_exchange(
+    db: AsyncSession,
+    request: ChatRequest,
+    result: Dict[str, Any],
+    conversation_id: Optional[int] = None
+) -> int:
+    """
+    Adds the question, the answer and the query log, creating the conversation
+    first if the request did not name one (not committed)
+
+    The message count and last message preview of the conversation are
+    updated in the same transaction.
+
+    Args:
+        conversation_id: Reserved id for the new conversation (default: from
+            its sequence on insert)
+
+    Returns:
+        The conversation id
+    """
+    preview = _message_preview(result["answer"])
+
+    if request.conversation_id:
+        conversation_id = request.conversation_id
+        # Relative update: concurrent answers in the same conversation add up
+        await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(
+                message_count=Conversation.message_count + 2,
+                last_message_preview=preview
+            )
+        )
+    else:
+        question = request.question
+        conversation = Conversation(
+            id=conversation_id,
+            title=question[:50] + "..." if len(question) > 50 else question,
+            message_count=2,
+            last_message_preview=preview
+        )
+        db.add(conversation)
+        await db.flush()  # Get the ID of the new conversation
+        conversation_id = conversation.id
+
+    db.add(Message(
+        conversation_id=conversation_id,
+        role="user",
+        content=request.question
+    ))
+    _save_answer(db, conversation_id, request.question, result)
+    return conversation_id
+
+
+def _message_preview(content: str) -> str:
+    if len(content) > PREVIEW_LENGTH:
+        return content[:PREVIEW_LENGTH] + "..."
+    return content
+
+
+def _save_answer(db: AsyncSession, conversation_id: int, question: str, result: Dict[str, Any]):
+    """
+    Adds the assistant message and the query log of an answer (not committed)
+    """
+    # Save assistant message with sources
+    sources_json = json.dumps([
+        {
+            "paper_title": src["paper_title"],
+            "paper_year": src["paper_year"],
+            "section_name": src["section_name"],
+            "content": src["content"],
+            "relevance_score": src["relevance_score"]
+        }
+        for src in result["sources"]
+    ])
+
+    assistant_message = Message(
+        conversation_id=conversation_id,
+        role="assistant",
+        content=result["answer"],
+        sources=sources_json,
+        cost_usd=result["cost_usd"],
+        response_time_ms=result["response_time_ms"]
+    )
+    db.add(assistant_message)
+
+    # Log the query
+    query_log = QueryLog(
+        question=question,
+        answer=result["answer"],
+        nb_sources=len(result["sources"]),
+        prompt_tokens=result["prompt_tokens"],
+        completion_tokens=result["completion_tokens"],
+        cost_usd=result["cost_usd"],
+        response_time_ms=result["response_time_ms"]
+    )
+    db.add(query_log)
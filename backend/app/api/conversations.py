@@ -1,10 +1,10 @@
 """
 Conversations API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
 import json
 from app.database import get_db
 from app.schemas import (
@@ -14,6 +14,7 @@ from app.schemas import (
     MessageResponse,
     SourceCitation
 )
+from app.services.pagination import NEXT_CURSOR_HEADER, keyset_query, split_page
 import app.models as models
 
 router = APIRouter(prefix="/api/conversations", tags=["conversations"])
@@ -22,86 +23,153 @@ router = APIRouter(prefix="/api/conversations", tags=["conversations"])
 @router.post("", response_model=ConversationResponse)
 async def create_conversation(
     conversation: ConversationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new conversation"""
     new_conversation = models.Conversation(
         title=conversation.title or "Nouvelle conversation"
     )
     db.add(new_conversation)
-    db.commit()
-    db.refresh(new_conversation)
-    return new_conversation
+    await db.commit()
+    await db.refresh(new_conversation)
+    # Built explicitly: reading the messages relationship would lazy-load
+    return ConversationResponse(
+        id=new_conversation.id,
+        title=new_conversation.title,
+        created_at=new_conversation.created_at,
+        updated_at=new_conversation.updated_at,
+        messages=[]
+    )
 
 
 @router.get("", response_model=List[ConversationListItem])
 async def list_conversations(
-    skip: int = 0,
-    limit: int = 20,
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
 ):
-    """List all conversations with preview"""
-    conversations = db.query(models.Conversation).order_by(
-        desc(models.Conversation.updated_at)
-    ).offset(skip).limit(limit).all()
-
-    result = []
-    for conv in conversations:
-        # Get message count
-        message_count = db.query(func.count(models.Message.id)).filter(
-            models.Message.conversation_id == conv.id
-        ).scalar() or 0
-
-        # Get last message preview
-        last_message = db.query(models.Message).filter(
-            models.Message.conversation_id == conv.id
-        ).order_by(desc(models.Message.created_at)).first()
-
-        last_message_preview = None
-        if last_message:
-            preview_text = last_message.content[:100]
-            if len(last_message.content) > 100:
-                preview_text += "..."
-            last_message_preview = preview_text
-
-        result.append(ConversationListItem(
+    """
+    List conversations with preview, most recently active first
+
+    Pages are keyset-paginated over (updated_at, id): pass the X-Next-Cursor
+    header of a page as `cursor` to get the next one (no header on the last page).
+    Message count and preview are stored on the conversation: one query per page
+    """
+    try:
+        query = keyset_query(
+            select(models.Conversation),
+            models.Conversation.updated_at, models.Conversation.id,
+            cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    conversations, next_cursor = split_page(
+        (await db.scalars(query)).all(), limit, lambda conv: (conv.updated_at, conv.id)
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return [
+        ConversationListItem(
             id=conv.id,
             title=conv.title,
             created_at=conv.created_at,
             updated_at=conv.updated_at,
-            message_count=message_count,
-            last_message_preview=last_message_preview
-        ))
-
-    return result
+            message_count=conv.message_count,
+            last_message_preview=conv.last_message_preview
+        )
+        for conv in conversations
+    ]
 
 
 @router.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db)
+    messages_limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get a specific conversation with all messages"""
-    conversation = db.query(models.Conversation).filter(
-        models.Conversation.id == conversation_id
-    ).first()
+    """
+    Get a specific conversation with its latest messages (oldest first)
+
+    Earlier messages are read from GET /{conversation_id}/messages with
+    next_messages_cursor
+    """
+    conversation = await db.get(models.Conversation, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    # Get all messages
-    messages = db.query(models.Message).filter(
-        models.Message.conversation_id == conversation_id
-    ).order_by(models.Message.created_at).all()
+    messages, next_cursor = await _messages_page(db, conversation_id, None, messages_limit)
+
+    return ConversationResponse(
+        id=conversation.id,
+        title=conversation.title,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        messages=messages,
+        next_messages_cursor=next_cursor
+    )
+
+
+@router.get("/{conversation_id}/messages", response_model=List[MessageResponse])
+async def list_messages(
+    conversation_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Page of messages of a conversation, oldest first
+
+    Without cursor, the latest messages; pass the X-Next-Cursor header (or
+    next_messages_cursor of the conversation) as `cursor` to get the messages
+    before them.
+    """
+    exists = await db.scalar(
+        select(models.Conversation.id).where(models.Conversation.id == conversation_id)
+    )
+    if not exists:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    messages, next_cursor = await _messages_page(db, conversation_id, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return messages
+
+
+async def _messages_page(
+    db: AsyncSession,
+    conversation_id: int,
+    cursor: Optional[str],
+    limit: int
+) -> Tuple[List[MessageResponse], Optional[str]]:
+    """
+    Reads the messages before cursor, newest first over (created_at, id), and
+    returns them oldest first with the cursor of the previous messages
+    """
+    try:
+        query = keyset_query(
+            select(models.Message).where(models.Message.conversation_id == conversation_id),
+            models.Message.created_at, models.Message.id,
+            cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    messages, next_cursor = split_page(
+        (await db.scalars(query)).all(), limit, lambda msg: (msg.created_at, msg.id)
+    )
 
     # Format messages with sources
     formatted_messages = []
-    for msg in messages:
+    for msg in reversed(messages):
         sources = None
         if msg.sources:
             sources_data = json.loads(msg.sources)
             sources = [SourceCitation(**src) for src in sources_data]
-            
 
         formatted_messages.append(MessageResponse(
             id=msg.id,
@@ -114,30 +182,22 @@ async def get_conversation(
             created_at=msg.created_at
         ))
 
-    return ConversationResponse(
-        id=conversation.id,
-        title=conversation.title,
-        created_at=conversation.created_at,
-        updated_at=conversation.updated_at,
-        messages=formatted_messages
-    )
+    return formatted_messages, next_cursor
 
 
 @router.delete("/{conversation_id}")
 async def delete_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a conversation and all its messages"""
-    conversation = db.query(models.Conversation).filter(
-        models.Conversation.id == conversation_id
-    ).first()
+    conversation = await db.get(models.Conversation, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    db.delete(conversation)
-    db.commit()
+    await db.delete(conversation)
+    await db.commit()
 
     return {"message": "Conversation deleted successfully"}
 
@@ -146,17 +206,15 @@ async def delete_conversation(
 async def update_conversation_title(
     conversation_id: int,
     title: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update conversation title"""
-    conversation = db.query(models.Conversation).filter(
-        models.Conversation.id == conversation_id
-    ).first()
+    conversation = await db.get(models.Conversation, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
     conversation.title = title
-    db.commit()
+    await db.commit()
 
     return {"message": "Title updated successfully"}
@@ -1,31 +1,35 @@
+from typing import Dict
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database import get_db
-from app.schemas import MonitoringStats
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, get_db_pool_stats
+from app.schemas import MonitoringStats, EmbeddingCacheStats, ProviderCallStats, ProviderPoolStats, DbPoolStats
+from app.services.embedding_cache import get_cache_stats
+from app.services.openai_client import get_pool_stats
+from app.services.resilience import get_provider_stats
 import app.models as models
 
 router = APIRouter(prefix="/api/monitoring", tags=["monitoring"])
 
 
 @router.get("/stats", response_model=MonitoringStats)
-async def get_stats(db: Session = Depends(get_db)):
+async def get_stats(db: AsyncSession = Depends(get_db)):
     """
     Usage and cost statistics
     """
-    total_papers = db.query(func.count(models.Paper.id)).scalar() or 0
-    total_chunks = db.query(func.count(models.Chunk.id)).scalar() or 0
-    total_queries = db.query(func.count(models.QueryLog.id)).scalar() or 0
+    total_papers = await db.scalar(select(func.count(models.Paper.id))) or 0
+    total_chunks = await db.scalar(select(func.count(models.Chunk.id))) or 0
+    total_queries = await db.scalar(select(func.count(models.QueryLog.id))) or 0
 
-    total_cost = db.query(func.sum(models.QueryLog.cost_usd)).scalar() or 0.0
-    avg_response_time = db.query(func.avg(models.QueryLog.response_time_ms)).scalar() or 0.0
+    total_cost = await db.scalar(select(func.sum(models.QueryLog.cost_usd))) or 0.0
+    avg_response_time = await db.scalar(select(func.avg(models.QueryLog.response_time_ms))) or 0.0
 
     # Queries today
     from datetime import datetime
     today = datetime.now().date()
-    queries_today = db.query(func.count(models.QueryLog.id)).filter(
-        func.date(models.QueryLog.created_at) == today
-    ).scalar() or 0
+    queries_today = await db.scalar(
+        select(func.count(models.QueryLog.id)).where(func.date(models.QueryLog.created_at) == today)
+    ) or 0
 
     return MonitoringStats(
         total_papers=total_papers,
@@ -35,3 +39,37 @@ async def get_stats(db: Session = Depends(get_db)):
         avg_response_time_ms=round(avg_response_time, 0),
         queries_today=queries_today
     )
+
+
+@router.get("/embedding-cache", response_model=EmbeddingCacheStats)
+async def get_embedding_cache_stats(db: AsyncSession = Depends(get_db)):
+    """
+    Embedding cache size and hit rate (counters are per process, since startup)
+    """
+    entries = await db.scalar(select(func.count(models.EmbeddingCache.id))) or 0
+
+    return EmbeddingCacheStats(entries=entries, **get_cache_stats())
+
+
+@router.get("/providers", response_model=Dict[str, ProviderCallStats])
+async def get_provider_call_stats():
+    """
+    Provider calls, retries and latency per operation (counters are per process, since startup)
+    """
+    return get_provider_stats()
+
+
+@router.get("/provider-pool", response_model=ProviderPoolStats)
+async def get_provider_pool_stats():
+    """
+    Connections of the shared provider HTTP client of this process
+    """
+    return get_pool_stats()
+
+
+@router.get("/db-pool", response_model=DbPoolStats)
+async def get_database_pool_stats():
+    """
+    Connections of the API database pool and time spent waiting for one (per process, since startup)
+    """
+    return get_db_pool_stats()
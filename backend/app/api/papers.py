@@ -1,18 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
+from sqlalchemy import Float, Text, case, cast, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from pathlib import Path
-import shutil
+import hashlib
 import os
 from datetime import datetime
 
 from app.database import get_db
-from app.schemas import PaperResponse
+from app.executors import run_blocking_io
+from app.schemas import PaperResponse, IngestionJobResponse
 import app.models as models
-from app.services.pdf_extractor import extract_text_from_pdf
-from app.services.metadata_extractor import extract_metadata_from_text
-from app.services.chunker import chunk_text
-from app.services.embeddings import generate_embeddings_batch
+from app.config import settings
+from app.services.job_queue import submit_upload, retry_job
+from app.services.pagination import NEXT_CURSOR_HEADER, keyset_query, split_page
+from app.services.vector_replica import get_vector_replica
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,23 +25,25 @@ router = APIRouter(prefix="/api/papers", tags=["papers"])
 UPLOAD_DIR = Path(__file__).parent.parent.parent / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Read size when streaming uploads to disk
+COPY_BUFFER_SIZE = 1024 * 1024
 
-@router.post("/upload", response_model=PaperResponse, status_code=201)
+
+@router.post("/upload", response_model=IngestionJobResponse, status_code=202)
 async def upload_paper(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Upload and indexing of a scientific paper PDF
+    Upload a scientific paper PDF and queue it for indexing
+
+    The file is saved and an ingestion job is created; extraction, metadata,
+    chunking and embeddings are run by the background workers (app/worker.py).
+    Poll GET /api/papers/jobs/{job_id} to follow the job.
 
-    Steps:
-    1. Validate PDF file
-    2. Save uploaded file
-    3. Extract text from PDF
-    4. Extract metadata (title, authors, year, etc.)
-    5. Chunk the text
-    6. Generate embeddings for chunks
-    7. Save paper and chunks to database
+    If the same file (same SHA-256) is already indexed, the returned job is
+    already done and points to the existing paper; if it is already queued,
+    the queued job is returned.
     """
 
     # Validate file type
@@ -52,125 +56,148 @@ async def upload_paper(
     file_path = UPLOAD_DIR / safe_filename
 
     try:
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Step 1: Extract text from PDF
-        extracted_text = extract_text_from_pdf(str(file_path))
-
-        if not extracted_text or not extracted_text.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="No text could be extracted from the PDF"
-            )
-
-        # Step 2: Extract metadata from text
-        text_preview = extracted_text[:3000]
-
-        metadata = await extract_metadata_from_text(text_preview)
-
-        if metadata.get('error'):
-            logger.error(f"❌ Metadata extraction had error: {metadata['error']}")
-
-        # Step 3: Chunk the text
-        # Note: metadata_extractor returns sections if available
-        sections = metadata.get("sections", None)
-        chunks = chunk_text(extracted_text, sections)
-
-        if not chunks:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not create chunks from the PDF text"
-            )
-
-        # Step 4: Generate embeddings for all chunks
-        chunk_texts = [chunk["content"] for chunk in chunks]
-        embeddings = await generate_embeddings_batch(chunk_texts)
-
-        # Step 5: Create Paper record
-        # Use filename as fallback if title is None or empty
-        title = metadata.get("title") or file.filename
-
-        paper = models.Paper(
-            title=title,
-            authors=metadata.get("authors") or [],
-            year=metadata.get("year"),
-            abstract=metadata.get("abstract"),
-            keywords=metadata.get("keywords") or [],
-            pdf_path=str(file_path)
-        )
+        # Save uploaded file, hashing it on the way
+        content_hash = await run_blocking_io(_save_upload_file, file.file, file_path)
 
-        db.add(paper)
-        db.flush()  # Get paper.id without committing
-
-        # Step 6: Create Chunk records with embeddings
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk_record = models.Chunk(
-                paper_id=paper.id,
-                content=chunk["content"],
-                section_name=chunk.get("section_name"),
-                chunk_index=chunk["chunk_index"],
-                embedding=embedding
-            )
-            db.add(chunk_record)
-
-        # Commit all changes
-        db.commit()
-        db.refresh(paper)
-
-        # Return response
-        return PaperResponse(
-            id=paper.id,
-            title=paper.title,
-            authors=paper.authors,
-            year=paper.year,
-            abstract=paper.abstract,
-            keywords=paper.keywords,
-            nb_chunks=len(chunks),
-            created_at=paper.created_at
+        # Queue the ingestion job, or link to the paper / job of the same file
+        job, is_duplicate = await db.run_sync(
+            submit_upload, file.filename, str(file_path), content_hash
         )
 
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        if file_path.exists():
+        if is_duplicate:
+            logger.info(f"{file.filename} is a duplicate upload (job {job.id}), discarding the new copy")
             os.remove(file_path)
-        raise
+
+        return job
+
     except Exception as e:
         # Clean up file on error
         if file_path.exists():
             os.remove(file_path)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
-            detail=f"Error processing PDF: {str(e)}"
+            detail=f"Error saving PDF: {str(e)}"
         )
 
 
+def _save_upload_file(source, destination: Path) -> str:
+    """
+    Streams the uploaded file to disk and computes its SHA-256
+    (blocking, run in the I/O pool)
+
+    Returns:
+        Hex digest of the file content
+    """
+    sha256 = hashlib.sha256()
+    with open(destination, "wb") as buffer:
+        while True:
+            data = source.read(COPY_BUFFER_SIZE)
+            if not data:
+                break
+            sha256.update(data)
+            buffer.write(data)
+    return sha256.hexdigest()
+
+
+@router.get("/jobs", response_model=List[IngestionJobResponse])
+async def list_jobs(
+    skip: int = 0,
+    limit: int = 20,
+    status: str = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List ingestion jobs, most recent first
+    """
+    query = select(models.IngestionJob)
+
+    if status:
+        query = query.where(models.IngestionJob.status == status)
+
+    query = query.order_by(models.IngestionJob.id.desc()).offset(skip).limit(limit)
+    return (await db.scalars(query)).all()
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Retrieve the status of an ingestion job
+    """
+    job = await db.get(models.IngestionJob, job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+@router.post("/jobs/{job_id}/retry", response_model=IngestionJobResponse, status_code=202)
+async def retry_failed_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Put a failed ingestion job back in the queue
+    """
+    job = await db.get(models.IngestionJob, job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if not Path(job.pdf_path).exists():
+        raise HTTPException(status_code=409, detail="PDF file of this job no longer exists")
+
+    try:
+        return await db.run_sync(retry_job, job)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
 @router.get("", response_model=List[PaperResponse])
 async def list_papers(
-    skip: int = 0,
-    limit: int = 10,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
     search: str = None,
     year: int = None,
-    db: Session = Depends(get_db)
+    year_min: int = None,
+    year_max: int = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     List papers with pagination and filters
-    TODO: Implement search and filters
-    """
-    query = db.query(models.Paper)
 
+    Without search, most recent first; with search, most relevant first
+    (see _search_relevance). Pages are keyset-paginated over (created_at, id),
+    or (relevance, id) with search: pass the X-Next-Cursor header of a page as
+    `cursor` to get the next one with the same filters (no header on the last page)
+    """
+    search = search.strip() if search else None
     if search:
-        # TODO: Implement search by title/author
-        pass
+        relevance = _search_relevance(search)
+        sort_key, key_type = relevance, float
+        query = select(models.Paper, relevance.label("sort_key")).where(_search_condition(search))
+    else:
+        sort_key, key_type = models.Paper.created_at, datetime
+        query = select(models.Paper, models.Paper.created_at.label("sort_key"))
 
     if year:
-        query = query.filter(models.Paper.year == year)
+        query = query.where(models.Paper.year == year)
+    if year_min:
+        query = query.where(models.Paper.year >= year_min)
+    if year_max:
+        query = query.where(models.Paper.year <= year_max)
+
+    try:
+        query = keyset_query(query, sort_key, models.Paper.id, cursor, limit, key_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    papers = query.offset(skip).limit(limit).all()
+    rows, next_cursor = split_page(
+        (await db.execute(query)).all(), limit, lambda row: (row.sort_key, row.Paper.id)
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    papers = [row.Paper for row in rows]
 
-    # Calculate number of chunks for each paper
     result = []
     for paper in papers:
         paper_dict = {
@@ -180,7 +207,7 @@ async def list_papers(
             "year": paper.year,
             "abstract": paper.abstract,
             "keywords": paper.keywords,
-            "nb_chunks": len(paper.chunks),
+            "nb_chunks": paper.nb_chunks,
             "created_at": paper.created_at
         }
         result.append(PaperResponse(**paper_dict))
@@ -188,12 +215,51 @@ async def list_papers(
     return result
 
 
+def _contains_text(array_column, search: str):
+    # Substring of the lowercased, space-joined elements: case-insensitive and
+    # partial ("vaswani" matches "Ashish Vaswani"), served by the trigram index
+    # on the same expression
+    return func.array_search_text(array_column, type_=Text).contains(search.lower(), autoescape=True)
+
+
+def _search_condition(search: str):
+    """
+    Papers whose title contains words similar to the search (pg_trgm word
+    similarity above pg_trgm.word_similarity_threshold, 0.6 by default), or
+    whose authors or keywords contain the search, ignoring case
+
+    Served by the trigram indexes on title, authors and keywords
+    (migrations/add_paper_search_indexes.sql)
+    """
+    return or_(
+        models.Paper.title.op("%>")(search),
+        _contains_text(models.Paper.authors, search),
+        _contains_text(models.Paper.keywords, search)
+    )
+
+
+def _search_relevance(search: str):
+    """
+    Relevance of a paper to the search: word similarity of the title (0 to 1),
+    plus 1 for an author match and 1 for a keyword match, so that author and
+    keyword matches rank above fuzzy title matches
+
+    Double precision, so that the value round-trips exactly through cursors
+    """
+    return cast(
+        func.word_similarity(search, models.Paper.title)
+        + case((_contains_text(models.Paper.authors, search), 1), else_=0)
+        + case((_contains_text(models.Paper.keywords, search), 1), else_=0),
+        Float
+    )
+
+
 @router.get("/{paper_id}", response_model=PaperResponse)
-async def get_paper(paper_id: int, db: Session = Depends(get_db)):
+async def get_paper(paper_id: int, db: AsyncSession = Depends(get_db)):
     """
     Retrieve a specific paper
     """
-    paper = db.query(models.Paper).filter(models.Paper.id == paper_id).first()
+    paper = await db.get(models.Paper, paper_id)
 
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found")
@@ -205,17 +271,17 @@ async def get_paper(paper_id: int, db: Session = Depends(get_db)):
         year=paper.year,
         abstract=paper.abstract,
         keywords=paper.keywords,
-        nb_chunks=len(paper.chunks),
+        nb_chunks=paper.nb_chunks,
         created_at=paper.created_at
     )
 
 
 @router.delete("/{paper_id}", status_code=204)
-async def delete_paper(paper_id: int, db: Session = Depends(get_db)):
+async def delete_paper(paper_id: int, db: AsyncSession = Depends(get_db)):
     """
     Delete a paper and all its chunks
     """
-    paper = db.query(models.Paper).filter(models.Paper.id == paper_id).first()
+    paper = await db.get(models.Paper, paper_id)
 
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found")
@@ -225,20 +291,23 @@ async def delete_paper(paper_id: int, db: Session = Depends(get_db)):
     if pdf_path.exists():
         os.remove(pdf_path)
 
-    db.delete(paper)
-    db.commit()
+    await db.delete(paper)
+    await db.commit()
+
+    if settings.VECTOR_REPLICA_ENABLED:
+        get_vector_replica().remove_paper(paper_id)
 
     return None
 
 
 @router.get("/{paper_id}/pdf")
-async def get_paper_pdf(paper_id: int, db: Session = Depends(get_db)):
+async def get_paper_pdf(paper_id: int, db: AsyncSession = Depends(get_db)):
     """
     Serve the PDF file for a specific paper
     """
     from fastapi.responses import FileResponse
 
-    paper = db.query(models.Paper).filter(models.Paper.id == paper_id).first()
+    paper = await db.get(models.Paper, paper_id)
 
     if not paper:
         raise HTTPException(status_code=404, detail="Paper not found")
@@ -7,11 +7,84 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
 
+    # API connection pool (async engine, per process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_S: float = 30.0  # Wait for a free connection before failing
+    DB_SLOW_CHECKOUT_MS: float = 100.0  # Connection waits longer than this are logged
+    # Server-side prepared statements kept per connection (LRU): hot queries are parsed and planned once
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+
     # Mammouth AI API (compatible OpenAI)
     OPENAI_API_KEY: str
     OPENAI_API_BASE: str = "https://api.mammouth.ai/v1"
     OPENAI_CHAT_MODEL: str = "gpt-4.1-nano"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    OPENAI_EMBEDDING_DIMENSIONS: int = 1536
+    # Ask for token usage at the end of chat streams (stream_options); disable for providers that reject it
+    OPENAI_STREAM_INCLUDE_USAGE: bool = True
+
+    # Provider HTTP client (one pooled client per process, see app/services/openai_client.py)
+    PROVIDER_MAX_CONNECTIONS: int = 50
+    PROVIDER_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    PROVIDER_KEEPALIVE_EXPIRY_S: float = 60.0
+    PROVIDER_CONNECT_TIMEOUT_S: float = 5.0
+    PROVIDER_READ_TIMEOUT_S: float = 120.0
+    PROVIDER_WRITE_TIMEOUT_S: float = 30.0
+    PROVIDER_POOL_TIMEOUT_S: float = 30.0  # Wait for a free connection
+    PROVIDER_HTTP2: bool = True  # Only used when the h2 package is installed
+
+    # Provider retries (see app/services/resilience.py)
+    PROVIDER_MAX_ATTEMPTS: int = 5
+    PROVIDER_RETRY_BASE_DELAY_S: float = 1.0  # Backoff ceiling before retry n is 1s * 2^(n-1), jittered
+    PROVIDER_RETRY_MAX_DELAY_S: float = 60.0
+
+    # Embedding cache (see app/services/embedding_cache.py)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500000  # Least recently used entries are evicted beyond this
+    EMBEDDING_CACHE_EVICT_INTERVAL_S: int = 300  # Delay between two eviction passes of each ingestion worker
+
+    # Embedding dispatch (AIMD-adjusted concurrency, see app/services/rate_limiter.py)
+    EMBEDDING_INITIAL_CONCURRENCY: int = 4
+    EMBEDDING_MAX_CONCURRENCY: int = 16
+    EMBEDDING_LATENCY_TARGET_S: float = 10.0  # Slower batches reduce concurrency like a 429
+    EMBEDDING_MAX_TOKENS_PER_REQUEST: int = 100000  # Estimated tokens packed in one request
+    EMBEDDING_TOKENS_PER_MINUTE: int = 1000000  # Estimated tokens sent per minute (0 = unlimited)
+
+    # Executors (keep ingestion work off the event loop)
+    IO_POOL_WORKERS: int = 8  # Threads for blocking I/O (file copies, DB writes)
+    CPU_POOL_WORKERS: int = 0  # Processes for pypdf and chunking (0 = number of CPUs)
+
+    # Vector search (see migrations/create_vector_index_*.sql)
+    VECTOR_INDEX_TYPE: str = "hnsw"  # hnsw, ivfflat or none
+    HNSW_EF_SEARCH: int = 0  # 0 = server default (40); raised to top_k when lower
+    IVFFLAT_PROBES: int = 0  # 0 = server default (1)
+    VECTOR_EXACT_SEARCH_MAX_CHUNKS: int = 5000  # paper_ids filters selecting fewer chunks are ranked exactly by Postgres
+    VECTOR_ITERATIVE_SCAN: bool = True  # Iterative index scans for broader filters (pgvector >= 0.8)
+    SEARCH_MODE: str = "vector"  # vector or hybrid (full-text + vector, needs HYBRID_SEARCH_ENABLED)
+    HYBRID_SEARCH_ENABLED: bool = False  # init_db.py then adds chunks.search_vector: table rewrite
+    HYBRID_CANDIDATES_MULTIPLIER: int = 4  # Each hybrid leg fetches top_k * this candidates
+    VECTOR_BINARY_RERANK: bool = False  # Hamming scan over sign bits + exact rerank instead of the ANN index (init_db.py then adds chunks.embedding_bits: table rewrite)
+    VECTOR_BINARY_OVERFETCH: int = 10  # Binary prefilter keeps top_k * this candidates (see benchmark_binary_rerank.py)
+
+    # In-process vector replica (see app/services/vector_replica.py), for corpora that fit in RAM
+    VECTOR_REPLICA_ENABLED: bool = False
+    VECTOR_REPLICA_DIR: str = "vector_replica"  # Snapshots, relative to the backend directory
+    VECTOR_REPLICA_SYNC_INTERVAL_S: float = 5.0  # Max delay before papers indexed by a worker are searchable
+    VECTOR_REPLICA_SNAPSHOT_INTERVAL_S: float = 300.0
+
+    # Chat
+    CHAT_HISTORY_WINDOW: int = 10  # Previous messages sent with each question
+
+    # PDF extraction
+    PDF_PARALLEL_MIN_PAGES: int = 32  # Smaller PDFs are extracted in-process
+
+    # Ingestion queue (see app/worker.py)
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BACKOFF_S: int = 30  # Delay before retry n is 30s * 2^(n-1)
+    INGESTION_JOB_TIMEOUT_S: int = 1800  # Running jobs whose lease is older than this are reclaimed (crashed worker)
+    INGESTION_LEASE_RENEWAL_S: float = 60.0  # Workers refresh the lease of their running job this often
+    INGESTION_POLL_INTERVAL_S: float = 2.0
 
     # App
     APP_NAME: str = "PaperChat RAG"
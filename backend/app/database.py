@@ -1,8 +1,20 @@
-from sqlalchemy import create_engine
+import logging
+import time
+from typing import Any, Dict
+import numpy as np
+from pgvector.asyncpg import register_vector
+from pgvector.sqlalchemy import Vector as TextVector
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Synchronous engine (psycopg2): ingestion workers, init_db.py, in-process replica sync
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
@@ -11,15 +23,127 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url(url: str) -> str:
+    """
+    Same database as DATABASE_URL, through the asyncpg driver
+    """
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+# Checkouts of the API pool since startup, exposed by /api/monitoring/db-pool
+_checkout_stats: Dict[str, float] = {
+    "checkouts": 0,
+    "slow_checkouts": 0,
+    "failed_checkouts": 0,  # Pool timeouts and connection errors
+    "total_wait_ms": 0.0,
+    "max_wait_ms": 0.0
+}
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool recording how long each checkout waited for a connection
+
+    The wait includes opening a new connection when the pool grows, and the
+    pre-ping of a pooled one.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except Exception:
+            _checkout_stats["failed_checkouts"] += 1
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - start) * 1000
+            _checkout_stats["checkouts"] += 1
+            _checkout_stats["total_wait_ms"] += wait_ms
+            _checkout_stats["max_wait_ms"] = max(_checkout_stats["max_wait_ms"], wait_ms)
+            if wait_ms > settings.DB_SLOW_CHECKOUT_MS:
+                _checkout_stats["slow_checkouts"] += 1
+                logger.warning(f"Waited {wait_ms:.0f} ms for a database connection ({self.status()})")
+
+
+class Vector(TextVector):
+    """
+    pgvector column type binding numpy float32 arrays
+
+    With asyncpg, arrays are passed as is to the binary codec registered on
+    each connection (_register_vector_codec): vectors travel in pgvector's
+    binary format (4 bytes per dimension) instead of a decimal text literal
+    that Postgres parses again, and come back as float32 arrays. psycopg2 has
+    no binary parameters and keeps the text format.
+    """
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        if dialect.driver != "asyncpg":
+            return super().bind_processor(dialect)
+
+        def process(value):
+            if value is None:
+                return None
+            value = np.asarray(value, dtype=np.float32)
+            if value.ndim != 1 or (self.dim is not None and value.shape[0] != self.dim):
+                raise ValueError(f"expected a vector of {self.dim} dimensions, got shape {value.shape}")
+            return value
+        return process
+
+
+# Asynchronous engine (asyncpg): API requests, so that queries do not block the event loop
+# Statements are prepared on the server and cached per connection: the SQL of the
+# vector searches does not depend on the query vector or top_k (bound parameters),
+# so each connection parses and plans them once.
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    poolclass=TimedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_S,
+    pool_pre_ping=True,
+    connect_args={"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+    echo=settings.DEBUG
+)
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector_codec(dbapi_connection, connection_record):
+    """
+    Registers pgvector's binary codec once per new pooled connection
+    """
+    dbapi_connection.await_(register_vector(dbapi_connection.driver_connection))
+
+# expire_on_commit=False: attributes read after a commit must not trigger implicit (sync) I/O
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
-def get_db():
+def get_db_pool_stats() -> Dict[str, Any]:
+    """
+    Returns the state of the API connection pool and its checkout wait times
+    """
+    pool = async_engine.pool
+    checkouts = _checkout_stats["checkouts"]
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        **_checkout_stats,
+        "avg_wait_ms": round(_checkout_stats["total_wait_ms"] / checkouts, 2) if checkouts else 0.0
+    }
+
+
+async def get_db():
     """
-    Dependency to get a database session
+    Dependency to get an async database session
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,99 @@
+"""
+Executor layer to keep blocking and CPU-bound work off the event loop
+
+- A thread pool for blocking I/O (file copies, synchronous database calls)
+- A process pool for CPU-bound work (pypdf text extraction, chunking)
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from app.config import settings
+
+_io_pool: ThreadPoolExecutor = None
+_cpu_pool: ProcessPoolExecutor = None
+
+
+def get_cpu_worker_count() -> int:
+    """
+    Number of processes in the CPU pool
+
+    Returns:
+        settings.CPU_POOL_WORKERS, or the number of CPUs if not set
+    """
+    return settings.CPU_POOL_WORKERS or os.cpu_count() or 1
+
+
+def get_io_pool() -> ThreadPoolExecutor:
+    """
+    Returns the shared thread pool for blocking I/O, creating it if needed
+    """
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(
+            max_workers=settings.IO_POOL_WORKERS,
+            thread_name_prefix="paperchat-io"
+        )
+    return _io_pool
+
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    """
+    Returns the shared process pool for CPU-bound work, creating it if needed
+    """
+    global _cpu_pool
+    if _cpu_pool is None:
+        # spawn: workers must not inherit the server's event loop, locks or DB connections
+        _cpu_pool = ProcessPoolExecutor(
+            max_workers=get_cpu_worker_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _cpu_pool
+
+
+async def run_blocking_io(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs a blocking function in the I/O thread pool
+
+    Args:
+        func: Function to run
+        *args, **kwargs: Arguments passed to func
+
+    Returns:
+        The return value of func
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_pool(), partial(func, *args, **kwargs))
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs a CPU-bound function in the process pool
+
+    func, its arguments and its return value must be picklable.
+
+    Args:
+        func: Module-level function to run
+        *args, **kwargs: Arguments passed to func
+
+    Returns:
+        The return value of func
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_pool(), partial(func, *args, **kwargs))
+
+
+def shutdown_executors():
+    """
+    Shuts down both pools (called on app shutdown)
+    """
+    global _io_pool, _cpu_pool
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=True, cancel_futures=True)
+        _io_pool = None
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=True, cancel_futures=True)
+        _cpu_pool = None
@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import papers, chat, monitoring, conversations
+from app.database import async_engine
+from app.executors import shutdown_executors
+from app.services.openai_client import close_openai_client
+from app.services.pagination import NEXT_CURSOR_HEADER
 
 app = FastAPI(
     title="PaperChat RAG API",
@@ -17,6 +21,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # Readable by the frontend for pagination
 )
 
 # Include routers
@@ -25,6 +30,14 @@ app.include_router(chat.router)
 app.include_router(conversations.router)
 app.include_router(monitoring.router)
 
+
+@app.on_event("shutdown")
+async def shutdown():
+    shutdown_executors()
+    await close_openai_client()
+    await async_engine.dispose()
+
+
 @app.get("/")
 async def root():
     return {
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, ARRAY, UniqueConstraint, Index, literal_column
+from sqlalchemy.dialects.postgresql import BIT, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
-from pgvector.sqlalchemy import Vector
-from app.database import Base
+from app.database import Base, Vector
 
 
 class Paper(Base):
@@ -12,16 +12,26 @@ class Paper(Base):
     __tablename__ = "papers"
 
     id = Column(Integer, primary_key=True, index=True)
+    # Title, authors and keywords also have search indexes (migrations/add_paper_search_indexes.sql)
     title = Column(String, nullable=False, index=True)
     authors = Column(ARRAY(String), nullable=True)
     year = Column(Integer, nullable=True, index=True)
     abstract = Column(Text, nullable=True)
     keywords = Column(ARRAY(String), nullable=True)
     pdf_path = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True, unique=True, index=True)  # SHA-256 of the PDF file
+    # Set with the chunks at ingestion (app/services/ingestion.py): paper endpoints do not load chunks to count them
+    nb_chunks = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship with chunks
-    chunks = relationship("Chunk", back_populates="paper", cascade="all, delete-orphan")
+    # passive_deletes: chunks are deleted by the ON DELETE CASCADE of chunks.paper_id, not loaded to be deleted
+    chunks = relationship("Chunk", back_populates="paper", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Keyset pagination of the paper list (app/api/papers.py)
+        Index("ix_papers_created_at_id", "created_at", "id"),
+    )
 
 
 class Chunk(Base):
@@ -31,11 +41,22 @@ class Chunk(Base):
     __tablename__ = "chunks"
 
     id = Column(Integer, primary_key=True, index=True)
-    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    # Indexed: searches scoped by paper_ids count and read the chunks of the selected papers
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False, index=True)
     content = Column(Text, nullable=False)
     section_name = Column(String, nullable=True)
     chunk_index = Column(Integer, nullable=False)
-    embedding = Column(Vector(1536), nullable=True)  # OpenAI text-embedding-3-small = 1536 dimensions
+    # OpenAI text-embedding-3-small = 1536 dimensions
+    # Deferred: loading Chunk entities does not fetch the vectors, search queries select them explicitly
+    embedding = deferred(Column(Vector(1536), nullable=True))
+    # Full-text index of the chunk, computed by Postgres on insert (lexical leg of hybrid search)
+    # Not created with the table: init_db.py adds the generated column and its GIN index
+    # (migrations/add_chunk_search_vector.sql) only with HYBRID_SEARCH_ENABLED
+    search_vector = deferred(literal_column("chunks.search_vector", TSVECTOR))
+    # Sign bit of each embedding dimension, computed by Postgres on insert (binary prefilter of vector_search)
+    # Not created with the table: init_db.py adds the generated column (migrations/add_chunk_embedding_bits.sql,
+    # pgvector >= 0.7) only with VECTOR_BINARY_RERANK
+    embedding_bits = deferred(literal_column("chunks.embedding_bits", BIT(1536)))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship with paper
@@ -67,12 +88,20 @@ class Conversation(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=True)  # Optional title for the conversation
+    # Maintained when messages are written (app/api/chat.py), for the conversation list
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_preview = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationship with messages
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", order_by="Message.created_at")
 
+    __table_args__ = (
+        # Keyset pagination of the conversation list (app/api/conversations.py)
+        Index("ix_conversations_updated_at_id", "updated_at", "id"),
+    )
+
 
 class Message(Base):
     """
@@ -91,3 +120,50 @@ class Message(Base):
 
     # Relationship with conversation
     conversation = relationship("Conversation", back_populates="messages")
+
+    __table_args__ = (
+        # Latest messages of a conversation (history window, message pages) without a sort
+        Index("ix_messages_conversation_created_at_id", "conversation_id", "created_at", "id"),
+    )
+
+
+class IngestionJob(Base):
+    """
+    Table to queue uploaded PDFs for ingestion by the background workers
+    """
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, nullable=False)  # Original name of the uploaded file
+    pdf_path = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the PDF file
+    status = Column(String, nullable=False, default="pending", index=True)  # 'pending', 'running', 'done' or 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    error = Column(Text, nullable=True)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="SET NULL"), nullable=True)
+    worker_id = Column(String, nullable=True)  # hostname:pid of the worker holding the job
+    available_at = Column(DateTime(timezone=True), server_default=func.now())  # Not claimed before this time (retry backoff)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class EmbeddingCache(Base):
+    """
+    Table to cache embeddings by normalized text hash, model and dimensions
+    """
+    __tablename__ = "embedding_cache"
+    __table_args__ = (
+        UniqueConstraint("text_hash", "model", "dimensions", name="uq_embedding_cache_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    text_hash = Column(String(64), nullable=False)  # SHA-256 of the normalized text
+    model = Column(String, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    embedding = Column(Vector(), nullable=False)  # No fixed size: depends on the model
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # LRU eviction
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -25,12 +25,30 @@ class PaperResponse(PaperBase):
         from_attributes = True
 
 
+# Ingestion Job Schemas
+class IngestionJobResponse(BaseModel):
+    id: int
+    filename: str
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    paper_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Chat Schemas
 class ChatRequest(BaseModel):
     question: str
     conversation_id: Optional[int] = None  # Optional conversation ID for context
     paper_ids: Optional[List[int]] = None
     max_sources: int = 5
+    search_mode: Optional[Literal["vector", "hybrid"]] = None  # Default: settings.SEARCH_MODE
 
 
 class SourceCitation(BaseModel):
@@ -80,6 +98,7 @@ class ConversationResponse(ConversationBase):
     created_at: datetime
     updated_at: datetime
     messages: List[MessageResponse] = []
+    next_messages_cursor: Optional[str] = None  # Cursor of the earlier messages, if any
 
     class Config:
         from_attributes = True
@@ -105,3 +124,45 @@ class MonitoringStats(BaseModel):
     total_cost_usd: float
     avg_response_time_ms: float
     queries_today: int
+
+
+class EmbeddingCacheStats(BaseModel):
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+    stores: int
+    evictions: int
+
+
+class ProviderPoolStats(BaseModel):
+    http2: bool
+    max_connections: int
+    max_keepalive_connections: int
+    connections: int
+    active_connections: int
+    idle_connections: int
+    queued_requests: int
+
+
+class DbPoolStats(BaseModel):
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    idle: int
+    checkouts: int
+    slow_checkouts: int
+    failed_checkouts: int
+    total_wait_ms: float
+    max_wait_ms: float
+    avg_wait_ms: float
+
+
+class ProviderCallStats(BaseModel):
+    calls: int
+    successes: int
+    failures: int
+    retries: int
+    throttled: int
+    total_latency_ms: float
+    avg_latency_ms: float
@@ -0,0 +1,186 @@
+"""
+Persistent embedding cache
+
+Embeddings are stored by SHA-256 of the normalized text, model name and
+number of dimensions, so a text that was already embedded (re-upload,
+re-chunking, shared boilerplate, repeated question) is never sent to the
+provider again.
+"""
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# In-process counters, exposed by /api/monitoring/embedding-cache
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_last_eviction = 0.0
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes whitespace so that re-extracted text maps to the same key
+    """
+    return " ".join(text.split())
+
+
+def hash_text(text: str) -> str:
+    """
+    SHA-256 of the normalized text
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def lookup_embeddings(
+    db: Session,
+    texts: List[str],
+    model: str,
+    dimensions: int
+) -> List[Optional[np.ndarray]]:
+    """
+    Looks up the cached embeddings of several texts in one query
+
+    Args:
+        db: Database session dedicated to the cache (committed here)
+        texts: Texts to look up
+        model: Embedding model name
+        dimensions: Number of dimensions of the embeddings
+
+    Returns:
+        List aligned with texts: the cached embedding (float32), or None on a miss
+    """
+    hashes = [hash_text(text) for text in texts]
+
+    rows = db.execute(
+        select(EmbeddingCache.id, EmbeddingCache.text_hash, EmbeddingCache.embedding)
+        .where(
+            EmbeddingCache.model == model,
+            EmbeddingCache.dimensions == dimensions,
+            EmbeddingCache.text_hash.in_(set(hashes))
+        )
+    ).fetchall()
+
+    if rows:
+        # Refresh the LRU position of the entries that were hit
+        db.execute(
+            update(EmbeddingCache)
+            .where(EmbeddingCache.id.in_([row.id for row in rows]))
+            .values(hit_count=EmbeddingCache.hit_count + 1, last_used_at=func.now())
+        )
+        db.commit()
+
+    found = {row.text_hash: np.asarray(row.embedding, dtype=np.float32) for row in rows}
+    results = [found.get(text_hash) for text_hash in hashes]
+
+    hits = sum(1 for result in results if result is not None)
+    _stats["hits"] += hits
+    _stats["misses"] += len(results) - hits
+
+    return results
+
+
+def store_embeddings(
+    db: Session,
+    texts: List[str],
+    embeddings: List[np.ndarray],
+    model: str,
+    dimensions: int
+):
+    """
+    Stores embeddings in the cache (existing keys are left untouched)
+
+    Args:
+        db: Database session dedicated to the cache (committed here)
+        texts: Texts that were embedded
+        embeddings: Embeddings aligned with texts
+        model: Embedding model name
+        dimensions: Number of dimensions of the embeddings
+    """
+    rows = {}
+    for text, embedding in zip(texts, embeddings):
+        rows[hash_text(text)] = embedding
+
+    if not rows:
+        return
+
+    db.execute(
+        insert(EmbeddingCache)
+        .values([
+            {
+                "text_hash": text_hash,
+                "model": model,
+                "dimensions": dimensions,
+                "embedding": embedding
+            }
+            for text_hash, embedding in rows.items()
+        ])
+        .on_conflict_do_nothing(constraint="uq_embedding_cache_key")
+    )
+    db.commit()
+    _stats["stores"] += len(rows)
+
+
+def maybe_evict(db: Session) -> bool:
+    """
+    Runs evict_embeddings once every settings.EMBEDDING_CACHE_EVICT_INTERVAL_S
+
+    Called by the ingestion workers between jobs, never on a request path. The
+    first call only starts the clock: a starting process does not scan the cache.
+
+    Returns:
+        True if an eviction pass ran
+    """
+    global _last_eviction
+    now = time.monotonic()
+    if not _last_eviction:
+        _last_eviction = now
+        return False
+    if now - _last_eviction < settings.EMBEDDING_CACHE_EVICT_INTERVAL_S:
+        return False
+    _last_eviction = now
+    evict_embeddings(db, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+    return True
+
+
+def evict_embeddings(db: Session, max_entries: int) -> int:
+    """
+    Deletes the least recently used entries beyond max_entries
+
+    Args:
+        db: Database session dedicated to the cache (committed here)
+        max_entries: Number of entries to keep
+
+    Returns:
+        Number of deleted entries
+    """
+    overflow = (
+        select(EmbeddingCache.id)
+        .order_by(EmbeddingCache.last_used_at.desc())
+        .offset(max_entries)
+    )
+    result = db.execute(delete(EmbeddingCache).where(EmbeddingCache.id.in_(overflow)))
+    db.commit()
+
+    deleted = result.rowcount or 0
+    if deleted:
+        logger.info(f"Evicted {deleted} embedding cache entries")
+    _stats["evictions"] += deleted
+    return deleted
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Returns the in-process hit/miss counters and the hit rate
+    """
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0
+    }
@@ -1,28 +1,145 @@
 """
 Embeddings generation service using Mammouth AI (OpenAI-compatible API)
 """
-from typing import List
-from openai import AsyncOpenAI
+from typing import Awaitable, Callable, List, Optional, Union
+import asyncio
+import base64
+import logging
+import time
+import numpy as np
+from openai import BadRequestError, RateLimitError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from app.config import settings
+from app.executors import run_blocking_io
+from app.services.embedding_cache import hash_text, lookup_embeddings, store_embeddings
+from app.services.openai_client import get_openai_client
+from app.services.rate_limiter import AdaptiveConcurrencyLimiter, TokenBucket
+from app.services.resilience import call_with_retry
 
+logger = logging.getLogger(__name__)
 
-# Initialize the AsyncOpenAI client with Mammouth AI configuration
-client = AsyncOpenAI(
-    api_key=settings.OPENAI_API_KEY,
-    base_url=settings.OPENAI_API_BASE
+# Embeddings are requested as base64 buffers of little-endian float32 values:
+# 4 bytes per dimension decoded in one step, instead of a JSON number per dimension
+EMBEDDING_ENCODING_FORMAT = "base64"
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+# Shared AsyncOpenAI client (Mammouth AI configuration, pooled connections)
+client = get_openai_client()
+
+# Shared by all embedding calls of the process (the provider quota is per account)
+_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+_token_bucket: Optional[TokenBucket] = None
+_controls_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Provider error messages meaning that a request carried too many tokens or inputs
+TOO_LARGE_MARKERS = (
+    "too large",
+    "too many",
+    "maximum context length",
+    "max_tokens_per_request",
+    "maximum request size",
 )
 
 
-async def generate_embedding(text: str, model: str = None) -> List[float]:
+def _bind_dispatch_controls():
+    """
+    Creates the limiter and token bucket for the running event loop
+
+    asyncio primitives are bound to one event loop, so they are recreated
+    if the running loop changed
+    """
+    global _limiter, _token_bucket, _controls_loop
+    loop = asyncio.get_running_loop()
+    if _controls_loop is loop and _limiter is not None:
+        return
+    _limiter = AdaptiveConcurrencyLimiter(
+        initial=settings.EMBEDDING_INITIAL_CONCURRENCY,
+        maximum=settings.EMBEDDING_MAX_CONCURRENCY,
+        latency_target_s=settings.EMBEDDING_LATENCY_TARGET_S
+    )
+    _token_bucket = TokenBucket(settings.EMBEDDING_TOKENS_PER_MINUTE) if settings.EMBEDDING_TOKENS_PER_MINUTE > 0 else None
+    _controls_loop = loop
+
+
+def get_embedding_limiter() -> AdaptiveConcurrencyLimiter:
+    """
+    Returns the process-wide concurrency limiter for batch embedding requests
+    """
+    _bind_dispatch_controls()
+    return _limiter
+
+
+def get_token_bucket() -> Optional[TokenBucket]:
+    """
+    Returns the process-wide per-minute token budget (None when unlimited)
+    """
+    _bind_dispatch_controls()
+    return _token_bucket
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative token estimate (about 3 characters per token, English
+    averages 4; formulas and non-Latin scripts are denser)
+    """
+    return len(text) // 3 + 1
+
+
+def pack_batches(texts: List[str], max_items: int, max_tokens: int) -> List[List[str]]:
+    """
+    Groups consecutive texts into batches bounded by item count and estimated tokens
+
+    Args:
+        texts: Texts to pack, in order
+        max_items: Maximum number of texts per batch
+        max_tokens: Maximum estimated tokens per batch; a single longer
+            text gets a batch of its own
+
+    Returns:
+        Batches whose concatenation is texts
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def decode_embedding(data: Union[str, List[float]]) -> np.ndarray:
+    """
+    Decodes an embedding of the API response into a float32 array
+
+    base64 payloads are viewed in place (no per-value conversion, read-only
+    array); providers that ignore encoding_format and return a list of floats
+    are converted as well.
+    """
+    if isinstance(data, str):
+        return np.frombuffer(base64.b64decode(data), dtype=EMBEDDING_DTYPE)
+    return np.asarray(data, dtype=np.float32)
+
+
+async def generate_embedding(text: str, model: str = None, db: Union[Session, AsyncSession] = None) -> np.ndarray:
     """
     Generates an embedding for a given text
 
     Args:
         text: Text to vectorize
         model: Embedding model to use (default: from settings.OPENAI_EMBEDDING_MODEL)
+        db: Database session; when given, the embedding cache is checked first
 
     Returns:
-        Embedding vector (1536 dimensions for text-embedding-3-small)
+        Embedding vector, float32 (1536 dimensions for text-embedding-3-small)
 
     Raises:
         ValueError: If text is empty or None
@@ -33,31 +150,49 @@ async def generate_embedding(text: str, model: str = None) -> List[float]:
     if not text or not text.strip():
         raise ValueError("Text cannot be empty")
 
+    use_cache = db is not None and settings.EMBEDDING_CACHE_ENABLED
+    if use_cache:
+        cached = await _cache_lookup(db, [text], model)
+        if cached[0] is not None:
+            return cached[0]
+
     try:
-        response = await client.embeddings.create(
+        response = await call_with_retry(
+            "embeddings",
+            client.embeddings.create,
             model=model,
-            input=text
+            input=text,
+            encoding_format=EMBEDDING_ENCODING_FORMAT
         )
-        return response.data[0].embedding
+        embedding = decode_embedding(response.data[0].embedding)
     except Exception as e:
         raise Exception(f"Failed to generate embedding: {str(e)}")
 
+    if use_cache:
+        await _cache_store(db, [text], [embedding], model)
+
+    return embedding
+
 
 async def generate_embeddings_batch(
     texts: List[str],
     model: str = None,
-    batch_size: int = 100
-) -> List[List[float]]:
+    batch_size: int = 100,
+    db: Union[Session, AsyncSession] = None
+) -> List[np.ndarray]:
     """
     Generates embeddings for multiple texts in batch
 
     Args:
         texts: List of texts to vectorize
         model: Embedding model to use (default: from settings.OPENAI_EMBEDDING_MODEL)
-        batch_size: Maximum number of texts to process in one API call (default: 100)
+        batch_size: Maximum number of texts to process in one API call (default: 100);
+            batches are also bounded by settings.EMBEDDING_MAX_TOKENS_PER_REQUEST
+        db: Database session; when given, cached embeddings are reused and only
+            the missing (deduplicated) texts are sent to the API
 
     Returns:
-        List of embedding vectors in the same order as input texts
+        List of float32 embedding vectors in the same order as input texts
 
     Raises:
         ValueError: If texts list is empty or contains empty strings
@@ -73,22 +208,199 @@ async def generate_embeddings_batch(
     if empty_indices:
         raise ValueError(f"Texts at indices {empty_indices} are empty")
 
+    use_cache = db is not None and settings.EMBEDDING_CACHE_ENABLED
+    if use_cache:
+        all_embeddings = await _cache_lookup(db, texts, model)
+    else:
+        all_embeddings = [None] * len(texts)
+
+    # Texts still to embed: identical texts (after normalization) are sent once
+    pending = {}
+    for i, text in enumerate(texts):
+        if all_embeddings[i] is None:
+            key = hash_text(text) if use_cache else i
+            pending.setdefault(key, []).append(i)
+
+    if not pending:
+        return all_embeddings
+
+    missing_texts = [texts[indices[0]] for indices in pending.values()]
+
+    batches = pack_batches(missing_texts, batch_size, settings.EMBEDDING_MAX_TOKENS_PER_REQUEST)
+
+    # Each completed batch is cached right away, so a failed ingestion that
+    # is retried later only pays for the batches that were not embedded
+    on_batch_done = None
+    if use_cache:
+        async def on_batch_done(batch: List[str], batch_embeddings: List[np.ndarray]):
+            await _cache_store(db, batch, batch_embeddings, model)
+
+    try:
+        batch_results = await _dispatch_batches(batches, model, on_batch_done)
+    except Exception as e:
+        raise Exception(f"Failed to generate batch embeddings: {str(e)}")
+
+    # Batch results are in input order whatever their completion order
+    missing_embeddings = [embedding for batch_embeddings in batch_results for embedding in batch_embeddings]
+
+    for indices, embedding in zip(pending.values(), missing_embeddings):
+        for i in indices:
+            all_embeddings[i] = embedding
+
+    return all_embeddings
+
+
+class BatchAbortedError(Exception):
+    """
+    Raised for batches not sent because another batch of the same call failed
+    """
+
+
+async def _dispatch_batches(
+    batches: List[List[str]],
+    model: str,
+    on_batch_done: Optional[Callable[[List[str], List[np.ndarray]], Awaitable[None]]] = None
+) -> List[List[np.ndarray]]:
+    """
+    Sends batches concurrently, bounded by the adaptive limiter and the token budget
+
+    Once a batch has failed (after its retries), batches that were not sent
+    yet are abandoned, while those in flight are allowed to finish so that
+    on_batch_done can save them
+
+    Returns:
+        Embeddings of each batch, in the order of the batches
+
+    Raises:
+        Exception: The first batch failure
+    """
+    abort = asyncio.Event()
+
+    async def run(batch: List[str]) -> List[np.ndarray]:
+        try:
+            batch_embeddings = await _embed_batch(batch, model, abort)
+        except Exception:
+            abort.set()
+            raise
+        if on_batch_done is not None:
+            await on_batch_done(batch, batch_embeddings)
+        return batch_embeddings
+
+    results = await asyncio.gather(*(run(batch) for batch in batches), return_exceptions=True)
+
+    errors = [
+        result for result in results
+        if isinstance(result, BaseException) and not isinstance(result, BatchAbortedError)
+    ]
+    if errors:
+        raise errors[0]
+    return results
+
+
+async def _embed_batch(batch: List[str], model: str, abort: asyncio.Event) -> List[np.ndarray]:
+    """
+    Embeds one batch, splitting it in two if the provider rejects it as too large
+    """
     try:
-        all_embeddings = []
+        return await _request_embeddings(batch, model, abort)
+    except BadRequestError as e:
+        if len(batch) < 2 or not _is_too_large_error(e):
+            raise
+        logger.warning(f"Embedding batch of {len(batch)} texts rejected as too large, splitting it")
+
+    middle = len(batch) // 2
+    first, second = await asyncio.gather(
+        _embed_batch(batch[:middle], model, abort),
+        _embed_batch(batch[middle:], model, abort)
+    )
+    return first + second
 
-        # Process in batches to optimize API calls and avoid rate limits
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
 
+async def _request_embeddings(batch: List[str], model: str, abort: asyncio.Event) -> List[np.ndarray]:
+    """
+    Sends one embedding request with retries, after taking its estimated
+    tokens from the per-minute budget
+    """
+    token_bucket = get_token_bucket()
+    if token_bucket is not None:
+        await token_bucket.acquire(sum(estimate_tokens(text) for text in batch))
+
+    return await call_with_retry("embeddings", _request_embeddings_once, batch, model, abort)
+
+
+async def _request_embeddings_once(batch: List[str], model: str, abort: asyncio.Event) -> List[np.ndarray]:
+    """
+    One embedding request inside a limiter slot; the slot is released
+    between retries and the outcome is reported to the limiter
+    """
+    limiter = get_embedding_limiter()
+    async with limiter.slot():
+        if abort.is_set():
+            raise BatchAbortedError("Another batch failed")
+        start = time.monotonic()
+        try:
             response = await client.embeddings.create(
                 model=model,
-                input=batch
+                input=batch,
+                encoding_format=EMBEDDING_ENCODING_FORMAT
             )
+        except RateLimitError:
+            limiter.on_throttle()
+            raise
+        limiter.on_success(time.monotonic() - start)
 
-            # Extract embeddings in the correct order
-            batch_embeddings = [item.embedding for item in response.data]
-            all_embeddings.extend(batch_embeddings)
+    # Extract embeddings in the correct order
+    return [decode_embedding(item.embedding) for item in response.data]
 
-        return all_embeddings
+
+def _is_too_large_error(error: BadRequestError) -> bool:
+    """
+    Whether a 400 error means the request carried too many tokens or inputs
+    """
+    message = str(error).lower()
+    return any(marker in message for marker in TOO_LARGE_MARKERS)
+
+
+def _with_cache_session(db: Session, func, *args):
+    """
+    Runs a cache function in its own session on the same engine, so that
+    cache writes are committed independently of the caller's transaction
+    """
+    with Session(bind=db.get_bind()) as cache_db:
+        return func(cache_db, *args)
+
+
+async def _run_in_cache_session(db: Union[Session, AsyncSession], func, *args):
+    """
+    Runs a (sync) cache function in its own session: through run_sync for
+    async sessions (API), in the I/O pool for sync sessions (workers)
+    """
+    if isinstance(db, AsyncSession):
+        async with AsyncSession(db.bind) as cache_db:
+            return await cache_db.run_sync(func, *args)
+    return await run_blocking_io(_with_cache_session, db, func, *args)
+
+
+async def _cache_lookup(db: Union[Session, AsyncSession], texts: List[str], model: str) -> List[Optional[np.ndarray]]:
+    """
+    Bulk cache lookup; a failing cache is treated as a miss
+    """
+    try:
+        return await _run_in_cache_session(
+            db, lookup_embeddings, texts, model, settings.OPENAI_EMBEDDING_DIMENSIONS
+        )
     except Exception as e:
-        raise Exception(f"Failed to generate batch embeddings: {str(e)}")
+        logger.warning(f"Embedding cache lookup failed: {str(e)}")
+        return [None] * len(texts)
+
+
+async def _cache_store(db: Union[Session, AsyncSession], texts: List[str], embeddings: List[np.ndarray], model: str):
+    """
+    Stores new embeddings in the cache; failures are logged and ignored
+    """
+    try:
+        await _run_in_cache_session(
+            db, store_embeddings, texts, embeddings, model, settings.OPENAI_EMBEDDING_DIMENSIONS
+        )
+    except Exception as e:
+        logger.warning(f"Embedding cache store failed: {str(e)}")
@@ -0,0 +1,193 @@
+"""
+Hybrid retrieval: Postgres full-text search + vector search, fused with
+reciprocal rank fusion (RRF)
+
+Dense retrieval misses exact terms (gene names, dataset names, equation
+labels) that full-text search matches directly; RRF combines both rankings
+without having to calibrate their scores against each other.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from sqlalchemy import Text, cast, select, func
+from sqlalchemy.dialects.postgresql import TSQUERY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models import Chunk, Paper
+from app.services.vector_store import vector_search
+
+logger = logging.getLogger(__name__)
+
+# Constant of the RRF formula 1 / (k + rank), from Cormack et al. (2009)
+RRF_K = 60
+
+
+def any_term_tsquery(query_text: str):
+    """
+    Builds a tsquery matching chunks that contain any lexeme of the question
+
+    plainto_tsquery ANDs the lexemes (stop words removed, stemmed), so a
+    chunk had to contain every term of a natural-language question. Its
+    " & " separators are turned into " | ": phrases from hyphenated words
+    (<->) are kept.
+    """
+    return cast(
+        func.replace(cast(func.plainto_tsquery("english", query_text), Text), " & ", " | "),
+        TSQUERY
+    )
+
+
+async def lexical_search(
+    db: AsyncSession,
+    query_text: str,
+    query_embedding: np.ndarray,
+    top_k: int,
+    paper_ids: List[int] = None
+) -> List[dict]:
+    """
+    Full-text search on chunks.search_vector, ranked by ts_rank_cd
+
+    The question's lexemes are OR-ed: a chunk matching any term is a
+    candidate and ts_rank_cd ranks those matching more of them first. The
+    cosine distance to the question is computed for the top_k ranked rows
+    only, so that lexical matches carry the same similarity score as vector
+    matches
+
+    Args:
+        db: Database session
+        query_text: Question, parsed with plainto_tsquery
+        query_embedding: Question embedding
+        top_k: Number of results to return
+        paper_ids: Optional list of paper IDs to filter
+
+    Returns:
+        List of chunks in the format of vector_search, best match first
+    """
+    ts_query = any_term_tsquery(query_text)
+    rank = func.ts_rank_cd(Chunk.search_vector, ts_query).label("rank")
+    ranked = (
+        select(Chunk.id, rank)
+        .where(Chunk.search_vector.op("@@")(ts_query))
+    )
+    if paper_ids:
+        ranked = ranked.where(Chunk.paper_id.in_(paper_ids))
+    ranked = ranked.order_by(rank.desc()).limit(top_k).subquery("ranked")
+
+    query = (
+        select(
+            Chunk.id,
+            Chunk.content,
+            Chunk.section_name,
+            Chunk.paper_id,
+            Paper.title,
+            Paper.authors,
+            Paper.year,
+            Chunk.embedding.cosine_distance(query_embedding).label("distance"),
+            ranked.c.rank
+        )
+        .select_from(ranked)
+        .join(Chunk, Chunk.id == ranked.c.id)
+        .join(Paper, Chunk.paper_id == Paper.id)
+        .order_by(ranked.c.rank.desc())
+    )
+
+    return [
+        {
+            "chunk_id": row.id,
+            "content": row.content,
+            "section_name": row.section_name,
+            "paper_id": row.paper_id,
+            "paper_title": row.title,
+            "authors": row.authors,
+            "year": row.year,
+            "similarity_score": 1 - row.distance if row.distance is not None else 0.0
+        }
+        for row in (await db.execute(query)).fetchall()
+    ]
+
+
+async def _lexical_search_in_session(db: AsyncSession, *args) -> List[dict]:
+    """
+    Runs lexical_search in its own session on the same engine: a session
+    cannot run two queries at the same time
+    """
+    async with AsyncSession(db.bind) as lexical_db:
+        return await lexical_search(lexical_db, *args)
+
+
+def reciprocal_rank_fusion(rankings: List[List[dict]], k: int = RRF_K) -> List[dict]:
+    """
+    Fuses rankings of chunks: score = sum over rankings of 1 / (k + rank)
+
+    Args:
+        rankings: Lists of chunks (dicts with chunk_id), best first
+        k: RRF constant (higher values flatten the weight of top ranks)
+
+    Returns:
+        Chunks of all rankings, by decreasing RRF score, with an rrf_score field
+    """
+    scores: Dict[int, float] = {}
+    chunks: Dict[int, dict] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, 1):
+            chunk_id = chunk["chunk_id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(chunk_id, chunk)
+
+    fused = sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)
+    return [{**chunks[chunk_id], "rrf_score": scores[chunk_id]} for chunk_id in fused]
+
+
+async def hybrid_search(
+    db: AsyncSession,
+    query_text: str,
+    query_embedding: np.ndarray,
+    top_k: int = 5,
+    paper_ids: List[int] = None
+) -> Tuple[List[dict], Dict[str, Any]]:
+    """
+    Runs the lexical and vector legs concurrently and fuses them with RRF
+
+    Each leg fetches top_k * settings.HYBRID_CANDIDATES_MULTIPLIER candidates
+
+    Args:
+        db: Database session
+        query_text: Question text (lexical leg)
+        query_embedding: Question embedding (vector leg)
+        top_k: Number of results to return
+        paper_ids: Optional list of paper IDs to filter
+
+    Returns:
+        (top_k fused chunks, timings in ms and candidate counts of each leg)
+    """
+    nb_candidates = top_k * settings.HYBRID_CANDIDATES_MULTIPLIER
+
+    async def timed(leg):
+        start = time.perf_counter()
+        results = await leg
+        return results, round((time.perf_counter() - start) * 1000, 1)
+
+    (lexical_results, lexical_ms), (vector_results, vector_ms) = await asyncio.gather(
+        timed(_lexical_search_in_session(db, query_text, query_embedding, nb_candidates, paper_ids)),
+        timed(vector_search(
+            db=db,
+            query_embedding=query_embedding,
+            top_k=nb_candidates,
+            paper_ids=paper_ids
+        ))
+    )
+
+    fusion_start = time.perf_counter()
+    results = reciprocal_rank_fusion([vector_results, lexical_results])[:top_k]
+
+    stats = {
+        "lexical_ms": lexical_ms,
+        "vector_ms": vector_ms,
+        "fusion_ms": round((time.perf_counter() - fusion_start) * 1000, 2),
+        "lexical_candidates": len(lexical_results),
+        "vector_candidates": len(vector_results)
+    }
+    logger.info(f"Hybrid search: {stats}")
+    return results, stats
@@ -0,0 +1,146 @@
+"""
+Paper ingestion pipeline (run by the background workers)
+"""
+import logging
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import app.models as models
+from app.executors import run_blocking_io, run_cpu_bound
+from app.services.pdf_extractor import extract_text_from_pdf
+from app.services.metadata_extractor import extract_metadata_from_text
+from app.services.chunker import chunk_text
+from app.services.embeddings import generate_embeddings_batch
+from app.services.vector_store import bulk_insert_chunks
+
+logger = logging.getLogger(__name__)
+
+
+def find_paper_by_content_hash(db: Session, content_hash: str) -> models.Paper:
+    """
+    Returns the paper indexed from a file with this SHA-256, or None
+    """
+    if not content_hash:
+        return None
+    return db.query(models.Paper).filter(models.Paper.content_hash == content_hash).first()
+
+
+async def ingest_pdf(
+    db: Session,
+    pdf_path: str,
+    filename: str,
+    content_hash: str = None
+) -> models.Paper:
+    """
+    Indexes a saved PDF file
+
+    If a paper with the same content_hash already exists, it is returned
+    without running the pipeline.
+
+    Steps:
+    1. Extract text from PDF
+    2. Extract metadata (title, authors, year, etc.)
+    3. Chunk the text
+    4. Generate embeddings for chunks
+    5. Save paper and chunks to database
+
+    Args:
+        db: Database session
+        pdf_path: Path of the saved PDF
+        filename: Original name of the uploaded file (fallback title)
+        content_hash: SHA-256 of the PDF file
+
+    Returns:
+        The created paper, or the existing paper with the same content_hash
+
+    Raises:
+        ValueError: If the PDF has no extractable text or cannot be chunked
+            (permanent failures, not worth retrying)
+        Exception: If an external call or the database write fails
+    """
+    # Same file already indexed (e.g. uploaded twice before the first job finished)
+    existing_paper = await run_blocking_io(find_paper_by_content_hash, db, content_hash)
+    if existing_paper is not None:
+        logger.info(f"{filename} is already indexed as paper {existing_paper.id}, skipping")
+        return existing_paper
+
+    # Step 1: Extract text from PDF
+    # Runs in the I/O pool: large PDFs fan out page ranges to the CPU pool from there
+    extracted_text = await run_blocking_io(extract_text_from_pdf, pdf_path)
+
+    if not extracted_text or not extracted_text.strip():
+        raise ValueError("No text could be extracted from the PDF")
+
+    # Step 2: Extract metadata from text
+    text_preview = extracted_text[:3000]
+
+    metadata = await extract_metadata_from_text(text_preview)
+
+    if metadata.get('error'):
+        logger.error(f"❌ Metadata extraction had error: {metadata['error']}")
+
+    # Step 3: Chunk the text
+    # Note: metadata_extractor returns sections if available
+    sections = metadata.get("sections", None)
+    chunks = await run_cpu_bound(chunk_text, extracted_text, sections)
+
+    if not chunks:
+        raise ValueError("Could not create chunks from the PDF text")
+
+    # Step 4: Generate embeddings for all chunks
+    chunk_texts = [chunk["content"] for chunk in chunks]
+    embeddings = await generate_embeddings_batch(chunk_texts, db=db)
+
+    # Step 5: Save paper and chunks (blocking DB round-trips run in the I/O pool)
+    # Use filename as fallback if title is None or empty
+    title = metadata.get("title") or filename
+    try:
+        return await run_blocking_io(
+            _save_paper, db, title, metadata, chunks, embeddings, pdf_path, content_hash
+        )
+    except IntegrityError:
+        # Another worker indexed the same file concurrently: link to its paper
+        await run_blocking_io(db.rollback)
+        existing_paper = await run_blocking_io(find_paper_by_content_hash, db, content_hash)
+        if existing_paper is None:
+            raise
+        return existing_paper
+    except Exception:
+        await run_blocking_io(db.rollback)
+        raise
+
+
+def _save_paper(
+    db: Session,
+    title: str,
+    metadata: dict,
+    chunks: list,
+    embeddings: list,
+    pdf_path: str,
+    content_hash: str = None
+) -> models.Paper:
+    """
+    Creates the Paper record and its chunks, then commits
+    (blocking, run in the I/O pool)
+    """
+    paper = models.Paper(
+        title=title,
+        authors=metadata.get("authors") or [],
+        year=metadata.get("year"),
+        abstract=metadata.get("abstract"),
+        keywords=metadata.get("keywords") or [],
+        pdf_path=pdf_path,
+        content_hash=content_hash,
+        nb_chunks=len(chunks)
+    )
+
+    db.add(paper)
+    db.flush()  # Get paper.id without committing
+
+    # Chunk rows are streamed in one binary COPY (same transaction as the paper)
+    bulk_insert_chunks(db, paper.id, chunks, embeddings)
+
+    # Commit all changes
+    db.commit()
+    db.refresh(paper)
+    return paper
@@ -0,0 +1,274 @@
+"""
+Postgres-backed ingestion job queue
+
+Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+worker processes (on one or more nodes) can poll the same table without
+handing the same job to two workers.
+"""
+from datetime import timedelta
+from typing import Optional, Tuple
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import IngestionJob, Paper
+
+
+def enqueue_job(db: Session, filename: str, pdf_path: str, content_hash: str = None) -> IngestionJob:
+    """
+    Creates a pending ingestion job for an uploaded PDF
+
+    Args:
+        db: Database session
+        filename: Original name of the uploaded file
+        pdf_path: Path of the saved PDF
+        content_hash: SHA-256 of the PDF file
+
+    Returns:
+        The committed job
+    """
+    job = IngestionJob(
+        filename=filename,
+        pdf_path=pdf_path,
+        content_hash=content_hash,
+        status="pending",
+        max_attempts=settings.INGESTION_MAX_ATTEMPTS
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def submit_upload(
+    db: Session,
+    filename: str,
+    pdf_path: str,
+    content_hash: str
+) -> Tuple[IngestionJob, bool]:
+    """
+    Queues an uploaded PDF unless the same file is already indexed or queued
+
+    - Same file already indexed: a job is recorded as done and linked to the
+      existing paper, without any extraction, LLM or embedding call
+    - Same file already pending or running: that job is returned
+    - Otherwise: a new pending job is created
+
+    Args:
+        db: Database session
+        filename: Original name of the uploaded file
+        pdf_path: Path of the saved PDF
+        content_hash: SHA-256 of the PDF file
+
+    Returns:
+        Tuple (job, is_duplicate). When is_duplicate is True the saved file
+        at pdf_path is not referenced by any job and can be deleted.
+    """
+    paper = db.query(Paper).filter(Paper.content_hash == content_hash).first()
+    if paper is not None:
+        job = IngestionJob(
+            filename=filename,
+            pdf_path=paper.pdf_path,
+            content_hash=content_hash,
+            status="done",
+            paper_id=paper.id,
+            max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+            finished_at=func.now()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job, True
+
+    active_job = (
+        db.query(IngestionJob)
+        .filter(
+            IngestionJob.content_hash == content_hash,
+            IngestionJob.status.in_(["pending", "running"])
+        )
+        .order_by(IngestionJob.id)
+        .first()
+    )
+    if active_job is not None:
+        return active_job, True
+
+    return enqueue_job(db, filename, pdf_path, content_hash), False
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[IngestionJob]:
+    """
+    Claims the oldest available job and marks it as running
+
+    A job is available when it is pending and its retry delay has elapsed, or
+    when its lease (locked_at, renewed by its worker while it runs) is older
+    than settings.INGESTION_JOB_TIMEOUT_S: its worker most likely died. Stale
+    jobs without attempts left are marked as failed instead.
+
+    Args:
+        db: Database session
+        worker_id: Identifier of the claiming worker (hostname:pid)
+
+    Returns:
+        The claimed job, or None if the queue is empty
+    """
+    stale_before = func.now() - timedelta(seconds=settings.INGESTION_JOB_TIMEOUT_S)
+
+    db.query(IngestionJob).filter(
+        IngestionJob.status == "running",
+        IngestionJob.locked_at < stale_before,
+        IngestionJob.attempts >= IngestionJob.max_attempts
+    ).update(
+        {
+            IngestionJob.status: "failed",
+            IngestionJob.error: "Job timed out: its worker stopped renewing the lease",
+            IngestionJob.locked_at: None,
+            IngestionJob.finished_at: func.now()
+        },
+        synchronize_session=False
+    )
+
+    job = (
+        db.query(IngestionJob)
+        .filter(
+            or_(
+                and_(IngestionJob.status == "pending", IngestionJob.available_at <= func.now()),
+                and_(
+                    IngestionJob.status == "running",
+                    IngestionJob.locked_at < stale_before,
+                    IngestionJob.attempts < IngestionJob.max_attempts
+                )
+            )
+        )
+        .order_by(IngestionJob.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+
+    if job is None:
+        db.commit()  # Release the (empty) transaction
+        return None
+
+    job.status = "running"
+    job.attempts += 1
+    job.worker_id = worker_id
+    job.locked_at = func.now()
+    job.error = None
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str) -> bool:
+    """
+    Refreshes the lease of a running job so that it is not reclaimed as stale
+
+    Args:
+        db: Database session
+        job_id: ID of the running job
+        worker_id: Identifier of the worker running it
+
+    Returns:
+        False if the job is no longer running on this worker
+    """
+    renewed = db.query(IngestionJob).filter(
+        IngestionJob.id == job_id,
+        IngestionJob.status == "running",
+        IngestionJob.worker_id == worker_id
+    ).update({IngestionJob.locked_at: func.now()}, synchronize_session=False)
+    db.commit()
+    return renewed > 0
+
+
+def _update_held_job(db: Session, job: IngestionJob, worker_id: str, values: dict) -> bool:
+    """
+    Updates a job only while it is still running on worker_id: a worker whose
+    lease was lost (job reclaimed by another worker) cannot overwrite it
+
+    Returns:
+        False if nothing was written
+    """
+    updated = db.query(IngestionJob).filter(
+        IngestionJob.id == job.id,
+        IngestionJob.status == "running",
+        IngestionJob.worker_id == worker_id
+    ).update(values, synchronize_session=False)
+    db.commit()  # Also expires job: its attributes are reloaded on next access
+    return updated > 0
+
+
+def complete_job(
+    db: Session,
+    job: IngestionJob,
+    worker_id: str,
+    paper_id: int,
+    pdf_path: str = None
+) -> bool:
+    """
+    Marks a job as done and links it to the created paper
+
+    Args:
+        db: Database session
+        job: The job
+        worker_id: Identifier of the worker that ran it
+        paper_id: ID of the created (or already indexed) paper
+        pdf_path: New PDF path of the job, if it changed
+
+    Returns:
+        False if the job is no longer held by worker_id (nothing was written)
+    """
+    values = {
+        IngestionJob.status: "done",
+        IngestionJob.paper_id: paper_id,
+        IngestionJob.locked_at: None,
+        IngestionJob.finished_at: func.now()
+    }
+    if pdf_path is not None:
+        values[IngestionJob.pdf_path] = pdf_path
+    return _update_held_job(db, job, worker_id, values)
+
+
+def fail_job(db: Session, job: IngestionJob, worker_id: str, error: str, retryable: bool = True) -> bool:
+    """
+    Records a job failure and schedules a retry if attempts remain
+
+    Args:
+        db: Database session
+        job: The failed job
+        worker_id: Identifier of the worker that ran it
+        error: Error message to store
+        retryable: False for errors that would fail again (e.g. no text in the PDF)
+
+    Returns:
+        False if the job is no longer held by worker_id (nothing was written)
+    """
+    values = {IngestionJob.error: error, IngestionJob.locked_at: None}
+
+    if retryable and job.attempts < job.max_attempts:
+        # Exponential backoff: 30s, 60s, 120s... with the default settings
+        delay = settings.INGESTION_RETRY_BACKOFF_S * 2 ** (job.attempts - 1)
+        values[IngestionJob.status] = "pending"
+        values[IngestionJob.available_at] = func.now() + timedelta(seconds=delay)
+    else:
+        values[IngestionJob.status] = "failed"
+        values[IngestionJob.finished_at] = func.now()
+
+    return _update_held_job(db, job, worker_id, values)
+
+
+def retry_job(db: Session, job: IngestionJob) -> IngestionJob:
+    """
+    Puts a failed job back in the queue with a fresh attempt budget
+
+    Raises:
+        ValueError: If the job is not in the failed state
+    """
+    if job.status != "failed":
+        raise ValueError(f"Only failed jobs can be retried (job is {job.status})")
+
+    job.status = "pending"
+    job.attempts = 0
+    job.error = None
+    job.finished_at = None
+    job.available_at = func.now()
+    db.commit()
+    db.refresh(job)
+    return job
@@ -4,8 +4,9 @@ Metadata extraction service via LLM
 from typing import Dict, Any
 import json
 import logging
-from openai import AsyncOpenAI
 from app.config import settings
+from app.services.openai_client import get_openai_client
+from app.services.resilience import call_with_retry
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +21,7 @@ async def extract_metadata_from_text(text: str) -> Dict[str, Any]:
     Returns:
         Dict with title, authors, year, abstract, keywords
     """
-    client = AsyncOpenAI(
-        api_key=settings.OPENAI_API_KEY,
-        base_url=settings.OPENAI_API_BASE
-    )
+    client = get_openai_client()
 
     prompt = """You are extracting metadata from a scientific paper. The text below is extracted from a PDF and may contain formatting issues.
 
@@ -52,7 +50,9 @@ Return ONLY the JSON object, no other text:"""
 
     try:
 
-        response = await client.chat.completions.create(
+        response = await call_with_retry(
+            "metadata",
+            client.chat.completions.create,
             model=settings.OPENAI_CHAT_MODEL,
             messages=[
                 {"role": "system", "content": "You are a metadata extraction assistant for scientific papers. Always respond with valid JSON only."},
@@ -0,0 +1,108 @@
+"""
+Shared client for the OpenAI-compatible provider (Mammouth AI)
+
+All LLM and embedding traffic of a process goes through one AsyncOpenAI
+client backed by one httpx connection pool, so TLS connections are kept
+alive and reused, and the connection limits apply to the process as a whole.
+"""
+import importlib.util
+import logging
+from typing import Any, Dict, Optional
+import httpx
+from openai import AsyncOpenAI
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_http_client: Optional[httpx.AsyncClient] = None
+_client: Optional[AsyncOpenAI] = None
+
+
+def http2_available() -> bool:
+    """
+    Whether HTTP/2 can be used (httpx needs the optional h2 package)
+    """
+    return settings.PROVIDER_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide pooled HTTP client for provider calls
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=http2_available(),
+            limits=httpx.Limits(
+                max_connections=settings.PROVIDER_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.PROVIDER_KEEPALIVE_EXPIRY_S
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.PROVIDER_CONNECT_TIMEOUT_S,
+                read=settings.PROVIDER_READ_TIMEOUT_S,
+                write=settings.PROVIDER_WRITE_TIMEOUT_S,
+                pool=settings.PROVIDER_POOL_TIMEOUT_S
+            )
+        )
+    return _http_client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Returns the process-wide AsyncOpenAI client
+
+    Retries are disabled in the SDK: they are handled by
+    app.services.resilience.call_with_retry
+    """
+    global _client
+    if _client is None:
+        http_client = get_http_client()
+        _client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_API_BASE,
+            http_client=http_client,
+            timeout=http_client.timeout,
+            max_retries=0
+        )
+    return _client
+
+
+async def close_openai_client():
+    """
+    Closes the pooled connections (called on application/worker shutdown)
+    """
+    global _http_client, _client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _client = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Returns the state of the provider connection pool
+    """
+    stats = {
+        "http2": http2_available(),
+        "max_connections": settings.PROVIDER_MAX_CONNECTIONS,
+        "max_keepalive_connections": settings.PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+        "connections": 0,
+        "active_connections": 0,
+        "idle_connections": 0,
+        "queued_requests": 0
+    }
+    if _http_client is None:
+        return stats
+
+    # httpcore internals: read defensively, they are not a public API
+    pool = getattr(getattr(_http_client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for connection in connections if connection.is_idle())
+    stats["connections"] = len(connections)
+    stats["idle_connections"] = idle
+    stats["active_connections"] = len(connections) - idle
+    stats["queued_requests"] = sum(
+        1 for request in getattr(pool, "_requests", []) if request.is_queued()
+    )
+    return stats
@@ -0,0 +1,82 @@
+"""
+Keyset (cursor) pagination over (key, id) pairs
+
+Pages are read with WHERE (key, id) < (cursor values) ORDER BY key DESC,
+id DESC LIMIT n, which a (key, id) index serves directly: the cost of a page
+does not grow with its depth, and rows inserted meanwhile do not shift the
+following pages. Keys are timestamps, or relevance scores for search results.
+Cursors are opaque to clients.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar, Union
+from sqlalchemy import Select, tuple_
+
+# Returned with each page of a list endpoint; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+T = TypeVar("T")
+Key = Union[datetime, float]
+
+
+def encode_cursor(key: Key, row_id: int) -> str:
+    # Timestamps are stored as ISO strings, scores as JSON numbers (repr round-trips floats exactly)
+    value = key.isoformat() if isinstance(key, datetime) else float(key)
+    payload = json.dumps([value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: type = datetime) -> Tuple[Key, int]:
+    """
+    Raises:
+        ValueError: If the cursor was not produced by encode_cursor with a key of key_type
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if key_type is datetime:
+            return datetime.fromisoformat(value), int(row_id)
+        if isinstance(value, str):
+            raise ValueError(value)
+        return float(value), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_query(
+    query: Select,
+    key_column,
+    id_column,
+    cursor: Optional[str],
+    limit: int,
+    key_type: type = datetime
+) -> Select:
+    """
+    Restricts a query to the page after cursor, highest key first
+    (newest first for timestamps)
+
+    One extra row is fetched to know whether another page follows (see split_page)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    if cursor:
+        key, row_id = decode_cursor(cursor, key_type)
+        query = query.where(tuple_(key_column, id_column) < tuple_(key, row_id))
+    return query.order_by(key_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def split_page(
+    rows: Sequence[T],
+    limit: int,
+    key: Callable[[T], Tuple[Key, int]]
+) -> Tuple[List[T], Optional[str]]:
+    """
+    Returns the rows of the page and the cursor of the next page (None on the last page)
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit:
+        return page, None
+    return page, encode_cursor(*key(page[-1]))
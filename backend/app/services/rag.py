@@ -1,28 +1,29 @@
 """
 RAG (Retrieval-Augmented Generation) service
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List
 import time
-from sqlalchemy.orm import Session
-from openai import AsyncOpenAI
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
-from app.services.embeddings import generate_embedding
+from app.services.openai_client import get_openai_client
+from app.services.resilience import call_with_retry
+from app.services.embeddings import estimate_tokens, generate_embedding
+from app.services.hybrid_search import hybrid_search
 from app.services.vector_store import vector_search
 
 
-# Initialize the AsyncOpenAI client with Mammouth AI configuration
-client = AsyncOpenAI(
-    api_key=settings.OPENAI_API_KEY,
-    base_url=settings.OPENAI_API_BASE
-)
+# Shared AsyncOpenAI client (Mammouth AI configuration, pooled connections)
+client = get_openai_client()
 
 
 async def generate_rag_answer_with_context(
-    db: Session,
+    db: AsyncSession,
     question: str,
     conversation_history: List[Dict[str, str]] = None,
     max_sources: int = 5,
-    paper_ids: list = None
+    paper_ids: list = None,
+    search_mode: str = None
 ) -> Dict[str, Any]:
     """
     Complete RAG pipeline to answer a question with conversation context
@@ -33,6 +34,7 @@ async def generate_rag_answer_with_context(
         conversation_history: List of previous messages [{"role": "user/assistant", "content": "..."}]
         max_sources: Maximum number of sources to use
         paper_ids: Paper IDs to filter the search
+        search_mode: "vector" or "hybrid" (default: settings.SEARCH_MODE)
 
     Returns:
         Dict with answer, sources, cost_usd, response_time_ms
@@ -43,48 +45,21 @@ async def generate_rag_answer_with_context(
     start_time = time.time()
 
     # 1. Vectorize the question
-    query_embedding = await generate_embedding(question)
-
-    # 2. Vector search to find relevant chunks
-    search_results = await vector_search(
-        db=db,
-        query_embedding=query_embedding,
-        top_k=max_sources,
-        paper_ids=paper_ids
-    )
+    query_embedding = await generate_embedding(question, db=db)
+
+    # 2. Search the relevant chunks
+    search_results = await _retrieve(db, question, query_embedding, max_sources, paper_ids, search_mode)
 
     # 3. Build the context from retrieved chunks
     context = _build_context(search_results)
 
     # 4. Build messages with conversation history
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a helpful assistant specialized in analyzing scientific papers. "
-                "Answer the user's question based ONLY on the provided context from the papers. "
-                "If the context doesn't contain enough information to answer the question, "
-                "say so clearly. Cite the papers when appropriate. "
-                "Take into account the conversation history to provide coherent and contextual answers."
-            )
-        }
-    ]
-
-    # Add conversation history (limit to last 10 messages to avoid token limits)
-    for msg in conversation_history[-10:]:
-        messages.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
-
-    # Add current question with context
-    messages.append({
-        "role": "user",
-        "content": f"Context from papers:\n\n{context}\n\nQuestion: {question}"
-    })
+    messages = _build_messages(question, context, conversation_history)
 
     # 5. Call Mammouth AI for generation
-    response = await client.chat.completions.create(
+    response = await call_with_retry(
+        "chat",
+        client.chat.completions.create,
         model=settings.OPENAI_CHAT_MODEL,
         messages=messages,
         temperature=0.7,
@@ -115,6 +90,168 @@ async def generate_rag_answer_with_context(
     }
 
 
+async def stream_rag_answer_with_context(
+    db: AsyncSession,
+    question: str,
+    conversation_history: List[Dict[str, str]] = None,
+    max_sources: int = 5,
+    paper_ids: list = None,
+    search_mode: str = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of generate_rag_answer_with_context
+
+    Yields events in this order:
+        {"type": "sources", "sources": [...]}
+        {"type": "token", "content": "..."} for each generated fragment
+        {"type": "done", "answer", "sources", "cost_usd", "response_time_ms",
+         "prompt_tokens", "completion_tokens"}
+    """
+    if conversation_history is None:
+        conversation_history = []
+
+    start_time = time.time()
+
+    query_embedding = await generate_embedding(question, db=db)
+    search_results = await _retrieve(db, question, query_embedding, max_sources, paper_ids, search_mode)
+
+    deduplicated_sources = _deduplicate_sources(search_results)
+    yield {"type": "sources", "sources": deduplicated_sources}
+
+    messages = _build_messages(question, _build_context(search_results), conversation_history)
+
+    stream_kwargs = {}
+    if settings.OPENAI_STREAM_INCLUDE_USAGE:
+        # Usage is sent in a last chunk by providers that support it
+        stream_kwargs["extra_body"] = {"stream_options": {"include_usage": True}}
+
+    # Only opening the stream is retried: tokens already sent cannot be taken back
+    stream = await call_with_retry(
+        "chat",
+        client.chat.completions.create,
+        model=settings.OPENAI_CHAT_MODEL,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=1000,
+        stream=True,
+        **stream_kwargs
+    )
+
+    answer_parts = []
+    usage = None
+    async for chunk in stream:
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            answer_parts.append(content)
+            yield {"type": "token", "content": content}
+
+    answer = "".join(answer_parts)
+
+    if usage is not None:
+        prompt_tokens = usage.prompt_tokens
+        completion_tokens = usage.completion_tokens
+    else:
+        # Usage not requested, or not sent by the provider: estimate from the text
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        completion_tokens = estimate_tokens(answer) if answer else 0
+
+    yield {
+        "type": "done",
+        "answer": answer,
+        "sources": deduplicated_sources,
+        "cost_usd": calculate_cost(prompt_tokens, completion_tokens),
+        "response_time_ms": int((time.time() - start_time) * 1000),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens
+    }
+
+
+async def _retrieve(
+    db: AsyncSession,
+    question: str,
+    query_embedding: np.ndarray,
+    max_sources: int,
+    paper_ids: list,
+    search_mode: str = None
+) -> List[Dict[str, Any]]:
+    """
+    Retrieves the chunks used as context, with vector or hybrid search
+
+    The transaction is committed afterwards, so that the connection goes back
+    to the pool instead of idling in transaction through the LLM call
+    """
+    if (search_mode or settings.SEARCH_MODE) == "hybrid":
+        if not settings.HYBRID_SEARCH_ENABLED:
+            raise ValueError("Hybrid search is not enabled on this server (HYBRID_SEARCH_ENABLED)")
+        search_results, _ = await hybrid_search(
+            db=db,
+            query_text=question,
+            query_embedding=query_embedding,
+            top_k=max_sources,
+            paper_ids=paper_ids
+        )
+    else:
+        search_results = await vector_search(
+            db=db,
+            query_embedding=query_embedding,
+            top_k=max_sources,
+            paper_ids=paper_ids
+        )
+
+    await db.commit()
+    return search_results
+
+
+def _build_messages(
+    question: str,
+    context: str,
+    conversation_history: List[Dict[str, str]]
+) -> List[Dict[str, str]]:
+    """
+    Build the chat messages: system prompt, conversation history, then the
+    question with the retrieved context
+
+    Args:
+        question: User's question
+        context: Formatted context from _build_context
+        conversation_history: Previous messages [{"role": ..., "content": ...}]
+
+    Returns:
+        Messages for the chat completion API
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You are a helpful assistant specialized in analyzing scientific papers. "
+                "Answer the user's question based ONLY on the provided context from the papers. "
+                "If the context doesn't contain enough information to answer the question, "
+                "say so clearly. Cite the papers when appropriate. "
+                "Take into account the conversation history to provide coherent and contextual answers."
+            )
+        }
+    ]
+
+    # Add conversation history (limit to the last messages to avoid token limits)
+    for msg in conversation_history[-settings.CHAT_HISTORY_WINDOW:]:
+        messages.append({
+            "role": msg["role"],
+            "content": msg["content"]
+        })
+
+    # Add current question with context
+    messages.append({
+        "role": "user",
+        "content": f"Context from papers:\n\n{context}\n\nQuestion: {question}"
+    })
+
+    return messages
+
+
 def _build_context(search_results: List[Dict[str, Any]]) -> str:
     """
     Build a formatted context string from search results
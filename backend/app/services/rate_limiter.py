@@ -0,0 +1,109 @@
+"""
+Adaptive concurrency limiter for provider API calls
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Bounds the number of concurrent requests, adjusting the bound with AIMD
+
+    - Additive increase: +1 slot per window of `limit` fast successful requests
+    - Multiplicative decrease: limit * decrease_factor when a request is
+      throttled (HTTP 429) or slower than latency_target_s
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        maximum: int,
+        minimum: int = 1,
+        latency_target_s: float = 10.0,
+        decrease_factor: float = 0.5,
+        decrease_cooldown_s: float = 1.0
+    ):
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target_s = latency_target_s
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown_s = decrease_cooldown_s
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Waits for a free slot and holds it for the duration of the block
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self, latency_s: float):
+        """
+        Records a successful request (call from inside the slot)
+        """
+        if latency_s > self.latency_target_s:
+            self._decrease()
+            return
+        self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+
+    def on_throttle(self):
+        """
+        Records a throttled request (call from inside the slot)
+        """
+        self._decrease()
+
+    def _decrease(self):
+        # Requests in flight during one congestion event only count once
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown_s:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+
+
+class TokenBucket:
+    """
+    Per-minute token budget, refilled continuously
+
+    acquire() waits until the requested amount is available, so callers are
+    spread over the minute instead of bursting into the provider's TPM limit
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: int):
+        """
+        Takes `amount` tokens from the budget, waiting for the refill if needed
+
+        A request larger than the whole budget waits for a full bucket
+        """
+        amount = min(float(amount), self.capacity)
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
@@ -0,0 +1,159 @@
+"""
+Resilient calls to the OpenAI-compatible provider
+
+Every provider call goes through call_with_retry: transient errors (429,
+5xx, timeouts, connection errors) are retried with exponential backoff and
+full jitter, honouring the Retry-After header when the provider sends one.
+The OpenAI clients are created with max_retries=0 so that this is the only
+retry layer.
+"""
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+from openai import APIConnectionError, APIStatusError, RateLimitError
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# In-process counters per operation, exposed by /api/monitoring/providers
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _operation_stats(operation: str) -> Dict[str, float]:
+    return _stats.setdefault(operation, {
+        "calls": 0,
+        "successes": 0,
+        "failures": 0,
+        "retries": 0,
+        "throttled": 0,
+        "total_latency_ms": 0.0
+    })
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Whether a provider error is transient
+    """
+    if isinstance(error, APIConnectionError):  # Includes APITimeoutError
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Delay requested by the provider (retry-after-ms or Retry-After header), in seconds
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def compute_backoff(attempt: int, error: Exception) -> float:
+    """
+    Delay before retry number `attempt` (1-based)
+
+    Retry-After wins when present; otherwise full jitter over
+    base * 2^(attempt - 1), capped at PROVIDER_RETRY_MAX_DELAY_S
+    """
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        return min(retry_after, settings.PROVIDER_RETRY_MAX_DELAY_S)
+    ceiling = min(
+        settings.PROVIDER_RETRY_MAX_DELAY_S,
+        settings.PROVIDER_RETRY_BASE_DELAY_S * 2 ** (attempt - 1)
+    )
+    return random.uniform(0, ceiling)
+
+
+async def call_with_retry(
+    operation: str,
+    func: Callable[..., Awaitable[Any]],
+    *args,
+    max_attempts: int = None,
+    **kwargs
+) -> Any:
+    """
+    Awaits func(*args, **kwargs), retrying transient provider errors
+
+    Args:
+        operation: Name used for the counters (e.g. "embeddings", "chat")
+        func: Coroutine function performing one provider call
+        max_attempts: Total attempts (default: settings.PROVIDER_MAX_ATTEMPTS)
+
+    Returns:
+        The result of func
+
+    Raises:
+        The last error once the attempts are exhausted, or immediately
+        for non-retryable errors
+    """
+    if max_attempts is None:
+        max_attempts = settings.PROVIDER_MAX_ATTEMPTS
+    stats = _operation_stats(operation)
+
+    attempt = 1
+    while True:
+        stats["calls"] += 1
+        start = time.monotonic()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            stats["total_latency_ms"] += (time.monotonic() - start) * 1000
+            if isinstance(e, RateLimitError):
+                stats["throttled"] += 1
+            if attempt >= max_attempts or not is_retryable_error(e):
+                stats["failures"] += 1
+                raise
+            delay = compute_backoff(attempt, e)
+            stats["retries"] += 1
+            logger.warning(
+                f"{operation} call failed (attempt {attempt}/{max_attempts}): {str(e)}; "
+                f"retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+
+        stats["total_latency_ms"] += (time.monotonic() - start) * 1000
+        stats["successes"] += 1
+        return result
+
+
+def get_provider_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the per-operation counters and the average latency per call
+    """
+    return {
+        operation: {
+            **stats,
+            "avg_latency_ms": round(stats["total_latency_ms"] / stats["calls"], 1) if stats["calls"] else 0.0
+        }
+        for operation, stats in _stats.items()
+    }
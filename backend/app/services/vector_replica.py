@@ -0,0 +1,404 @@
+"""
+In-process NumPy replica of the chunk embeddings
+
+For corpora that fit in RAM, vector_search can rank all embeddings with one
+matrix-vector product instead of querying pgvector. Postgres stays the
+source of truth: the replica follows it incrementally by diffing the set of
+papers (a paper and its chunks are committed in the same transaction), and
+is snapshotted to .npy files that other processes memory-map, sharing the
+pages through the OS cache.
+
+Mapped snapshots are never copied: papers added by a sync go to a new
+in-memory segment and deleted papers are skipped by searches until the next
+snapshot. One process (the holder of the writer lock) writes and prunes the
+snapshots; the others map each new snapshot on their next sync.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+try:
+    import fcntl
+except ImportError:  # Windows: no writer lock, single-process deployments only
+    fcntl = None
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Chunk, Paper
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+CURRENT_FILE = "CURRENT"
+WRITER_LOCK_FILE = "writer.lock"
+# Superseded snapshots are kept this long: a process that has just read
+# CURRENT can still map the snapshot it points to
+SNAPSHOT_GRACE_S = 60.0
+
+
+class Segment(NamedTuple):
+    """
+    Rows stored together: a memory-mapped snapshot, or the papers added by
+    one sync. Never modified after creation.
+    """
+    ids: np.ndarray  # int64 chunk ids
+    paper_ids: np.ndarray  # int64 paper id of each row
+    matrix: np.ndarray  # float32 (n, dimensions), rows normalized to unit length
+
+
+class ReplicaState(NamedTuple):
+    """
+    Immutable content of the replica; replaced as a whole on every change so
+    that searches never see a half-applied update
+    """
+    segments: Tuple[Segment, ...]
+    papers: frozenset  # Paper ids covered by the replica
+    removed: frozenset  # Deleted papers whose rows are still in the segments (skipped by searches)
+
+
+def empty_state() -> ReplicaState:
+    return ReplicaState(segments=(), papers=frozenset(), removed=frozenset())
+
+
+def live_rows(segment: Segment, removed: frozenset) -> Optional[np.ndarray]:
+    """
+    Mask of the rows of segment that belong to papers not removed, or None
+    when no row is removed
+    """
+    if not removed:
+        return None
+    return ~np.isin(segment.paper_ids, list(removed))
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scales rows to unit length (zero rows are left as is)
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class VectorReplica:
+    """
+    Float32 matrix of all chunk embeddings plus their chunk and paper ids
+    """
+
+    def __init__(self, directory: Path, dimensions: int):
+        self.directory = Path(directory)
+        self.dimensions = dimensions
+        self.state = empty_state()
+        self.ready = False
+        self._lock = threading.Lock()  # Serializes updates, searches do not take it
+        self._last_sync = 0.0
+        self._last_snapshot = time.monotonic()
+        self._changed_since_snapshot = False
+        self._snapshot = None  # Name of the mapped snapshot
+        self._writer_lock = None  # Open lock file while this process is the snapshot writer
+
+    @property
+    def size(self) -> int:
+        state = self.state
+        size = 0
+        for segment in state.segments:
+            live = live_rows(segment, state.removed)
+            size += len(segment.ids) if live is None else int(live.sum())
+        return size
+
+    def needs_sync(self) -> bool:
+        return not self.ready or time.monotonic() - self._last_sync >= settings.VECTOR_REPLICA_SYNC_INTERVAL_S
+
+    def sync(self, db: Session) -> bool:
+        """
+        Applies the papers added and deleted in Postgres since the last sync
+
+        Returns:
+            True if the replica changed
+        """
+        with self._lock:
+            if not self.needs_sync():
+                return False
+
+            is_writer = self._acquire_writer_lock()
+            if not is_writer:
+                # Start from the latest snapshot of the writer: the diff below catches up with it
+                self._load_current_snapshot_locked(only_if_new=True)
+
+            state = self.state
+            current = frozenset(db.execute(select(Paper.id)).scalars().all())
+            added = current - state.papers
+            removed = state.papers - current
+
+            if removed:
+                state = self._without_papers(state, removed)
+            if added:
+                state = self._with_papers(db, state, added)
+
+            changed = bool(added or removed)
+            self.state = state._replace(papers=current)
+            self.ready = True
+            self._last_sync = time.monotonic()
+
+            if changed:
+                logger.info(f"Vector replica synced: +{len(added)} / -{len(removed)} papers, {self.size} chunks")
+                self._changed_since_snapshot = True
+            if is_writer and self._changed_since_snapshot and (
+                time.monotonic() - self._last_snapshot >= settings.VECTOR_REPLICA_SNAPSHOT_INTERVAL_S
+            ):
+                self._save_snapshot_locked()
+            return changed
+
+    def remove_paper(self, paper_id: int):
+        """
+        Drops the chunks of a deleted paper right away (the next sync of other
+        processes removes them there)
+        """
+        with self._lock:
+            if paper_id in self.state.papers:
+                self.state = self._without_papers(self.state, {paper_id})
+                self._changed_since_snapshot = True
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        paper_ids: Optional[List[int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact cosine ranking over the replica
+
+        Returns:
+            (chunk ids, cosine distances) of the top_k rows, closest first
+        """
+        state = self.state
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        # Top k of each segment, then of their union
+        all_ids = [np.empty(0, dtype=np.int64)]
+        all_distances = [np.empty(0, dtype=np.float32)]
+        for segment in state.segments:
+            live = live_rows(segment, state.removed)
+            if paper_ids:
+                # Only the selected rows are read from the matrix
+                mask = np.isin(segment.paper_ids, paper_ids)
+                if live is not None:
+                    mask &= live
+                ids, distances = segment.ids[mask], 1.0 - segment.matrix[mask] @ query
+            else:
+                ids, distances = segment.ids, 1.0 - segment.matrix @ query
+                if live is not None:
+                    ids, distances = ids[live], distances[live]
+            ids, distances = _top_k(ids, distances, top_k)
+            all_ids.append(ids)
+            all_distances.append(distances)
+
+        return _top_k(np.concatenate(all_ids), np.concatenate(all_distances), top_k)
+
+    def _without_papers(self, state: ReplicaState, paper_ids) -> ReplicaState:
+        # Rows stay in their segments until the next snapshot: no copy of the matrix
+        return state._replace(
+            papers=state.papers - frozenset(paper_ids),
+            removed=state.removed | frozenset(paper_ids)
+        )
+
+    def _with_papers(self, db: Session, state: ReplicaState, paper_ids) -> ReplicaState:
+        # Filtered on the papers read by the sync, the first load included: chunks of
+        # papers committed or deleted since then are left to the next sync
+        query = (
+            select(Chunk.id, Chunk.paper_id, Chunk.embedding)
+            .where(Chunk.embedding.isnot(None), Chunk.paper_id.in_(list(paper_ids)))
+            .order_by(Chunk.id)
+            .execution_options(yield_per=10000)
+        )
+
+        ids = []
+        row_paper_ids = []
+        blocks = []
+        for partition in db.execute(query).partitions():
+            ids.extend(row.id for row in partition)
+            row_paper_ids.extend(row.paper_id for row in partition)
+            blocks.append(np.array([row.embedding for row in partition], dtype=np.float32))
+        if not ids:
+            return state
+
+        segment = Segment(
+            ids=np.array(ids, dtype=np.int64),
+            paper_ids=np.array(row_paper_ids, dtype=np.int64),
+            matrix=normalize_rows(np.concatenate(blocks).reshape(-1, self.dimensions))
+        )
+        # Appended as a new segment: the existing ones (mapped snapshot included) are not copied
+        return state._replace(
+            segments=state.segments + (segment,),
+            papers=state.papers | frozenset(paper_ids)
+        )
+
+    def save_snapshot(self) -> bool:
+        """
+        Writes a snapshot if this process is the snapshot writer
+
+        Returns:
+            True if a snapshot was written
+        """
+        with self._lock:
+            if not self._acquire_writer_lock():
+                return False
+            self._save_snapshot_locked()
+            return True
+
+    def _acquire_writer_lock(self) -> bool:
+        """
+        Takes the writer lock of the snapshot directory if no other process
+        holds it; it is held until this process exits
+        """
+        if fcntl is None:
+            return True
+        if self._writer_lock is not None:
+            return True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.directory / WRITER_LOCK_FILE, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._writer_lock = lock_file
+        return True
+
+    def _save_snapshot_locked(self):
+        """
+        Writes the live rows to a new snapshot directory, points CURRENT to
+        it (atomic rename, so readers never load a partial snapshot), then
+        maps it in place of the segments
+        """
+        state = self.state
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"snapshot-{time.time_ns()}"
+        target = self.directory / name
+        target.mkdir()
+
+        lives = [live_rows(segment, state.removed) for segment in state.segments]
+        ids = [segment.ids if live is None else segment.ids[live] for segment, live in zip(state.segments, lives)]
+        paper_ids = [
+            segment.paper_ids if live is None else segment.paper_ids[live]
+            for segment, live in zip(state.segments, lives)
+        ]
+        np.save(target / "ids.npy", np.concatenate(ids) if ids else np.empty(0, dtype=np.int64))
+        np.save(target / "paper_ids.npy", np.concatenate(paper_ids) if paper_ids else np.empty(0, dtype=np.int64))
+        np.save(target / "papers.npy", np.array(sorted(state.papers), dtype=np.int64))
+
+        # Filled segment by segment: the whole matrix is never held in memory twice
+        matrix = np.lib.format.open_memmap(
+            target / "matrix.npy", mode="w+", dtype=np.float32, shape=(sum(len(i) for i in ids), self.dimensions)
+        )
+        start = 0
+        for segment, live in zip(state.segments, lives):
+            rows = segment.matrix if live is None else segment.matrix[live]
+            matrix[start:start + len(rows)] = rows
+            start += len(rows)
+        matrix.flush()
+        del matrix
+
+        pointer = self.directory / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+        pointer.write_text(name)
+        os.replace(pointer, self.directory / CURRENT_FILE)
+
+        snapshot = self._read_snapshot(target)
+        if snapshot is not None:
+            self.state = snapshot
+            self._snapshot = name
+        self._last_snapshot = time.monotonic()
+        self._changed_since_snapshot = False
+        self._remove_old_snapshots(keep=name)
+
+    def _remove_old_snapshots(self, keep: str):
+        # Processes that mapped an older snapshot keep their pages until they unmap them
+        expired_before = time.time() - SNAPSHOT_GRACE_S
+        for path in self.directory.glob("snapshot-*"):
+            if path.name != keep and path.stat().st_mtime < expired_before:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def load_snapshot(self) -> bool:
+        """
+        Memory-maps the current snapshot, if any; the next sync catches up
+        with the changes made since it was written
+
+        Returns:
+            True if a snapshot was loaded
+        """
+        with self._lock:
+            return self._load_current_snapshot_locked()
+
+    def _load_current_snapshot_locked(self, only_if_new: bool = False) -> bool:
+        pointer = self.directory / CURRENT_FILE
+        try:
+            name = pointer.read_text().strip()
+        except OSError:
+            return False
+        if only_if_new and name == self._snapshot:
+            return False
+
+        target = self.directory / name
+        state = self._read_snapshot(target)
+        if state is None:
+            return False
+
+        self.state = state
+        self._snapshot = name
+        self._last_snapshot = time.monotonic()
+        logger.info(f"Vector replica loaded from {target} ({self.size} chunks)")
+        return True
+
+    def _read_snapshot(self, target: Path) -> Optional[ReplicaState]:
+        try:
+            matrix = np.load(target / "matrix.npy", mmap_mode="r")
+            if matrix.shape[1] != self.dimensions:
+                logger.warning(f"Ignoring vector replica snapshot with {matrix.shape[1]} dimensions")
+                return None
+            segment = Segment(
+                ids=np.load(target / "ids.npy", mmap_mode="r"),
+                paper_ids=np.load(target / "paper_ids.npy", mmap_mode="r"),
+                matrix=matrix
+            )
+            papers = frozenset(np.load(target / "papers.npy").tolist())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load vector replica snapshot: {str(e)}")
+            return None
+        return ReplicaState(segments=(segment,), papers=papers, removed=frozenset())
+
+
+def _top_k(ids: np.ndarray, distances: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The top_k rows of smallest distance, closest first
+    """
+    if len(ids) == 0:
+        return ids, distances.astype(np.float32, copy=False)
+    k = min(top_k, len(ids))
+    top = np.argpartition(distances, k - 1)[:k]
+    top = top[np.argsort(distances[top], kind="stable")]
+    return ids[top], distances[top]
+
+
+_replica: Optional[VectorReplica] = None
+_replica_lock = threading.Lock()
+
+
+def get_vector_replica() -> VectorReplica:
+    """
+    Returns the process-wide replica, loading the latest snapshot on first use
+    """
+    global _replica
+    with _replica_lock:
+        if _replica is None:
+            directory = Path(settings.VECTOR_REPLICA_DIR)
+            if not directory.is_absolute():
+                directory = BACKEND_DIR / directory
+            _replica = VectorReplica(directory, settings.OPENAI_EMBEDDING_DIMENSIONS)
+            _replica.load_snapshot()
+        return _replica
@@ -1,31 +1,177 @@
 """
 Vector search service with pgvector
 """
-from typing import List
+import io
+import logging
+import struct
+import time
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+from sqlalchemy import select, text, func, cast
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from pgvector.utils import to_db_binary
+from app.config import settings
+from app.database import SessionLocal, Vector
+from app.executors import run_blocking_io
 from app.models import Chunk, Paper
+from app.services.vector_replica import get_vector_replica
+
+logger = logging.getLogger(__name__)
+
+# Columns written by bulk_insert_chunks; id, created_at and the generated columns are filled by Postgres
+COPY_CHUNKS_SQL = (
+    "COPY chunks (paper_id, content, section_name, chunk_index, embedding) "
+    "FROM STDIN WITH (FORMAT BINARY)"
+)
+# Header of the binary COPY format: signature, flags, header extension length
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack(">h", -1)
+
+
+async def apply_search_tuning(
+    db: AsyncSession,
+    top_k: int,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    iterative_scan: bool = False
+):
+    """
+    Sets the ANN index search parameters for the current transaction
+
+    HNSW returns at most ef_search candidates, so ef_search is raised to top_k
+    when lower. Nothing is executed when the server defaults apply.
+
+    Args:
+        db: Database session
+        top_k: Number of results the search must return
+        ef_search: hnsw.ef_search (default: settings.HNSW_EF_SEARCH, 0 = server default)
+        probes: ivfflat.probes (default: settings.IVFFLAT_PROBES, 0 = server default)
+        iterative_scan: Let the index keep scanning until enough rows pass
+            the WHERE clause (pgvector >= 0.8)
+    """
+    if ef_search is None:
+        ef_search = settings.HNSW_EF_SEARCH
+    if probes is None:
+        probes = settings.IVFFLAT_PROBES
+
+    # pgvector's default hnsw.ef_search is 40
+    if top_k > (ef_search or 40):
+        ef_search = top_k
+
+    parameters = {}
+    if ef_search:
+        parameters["hnsw.ef_search"] = ef_search
+    if probes:
+        parameters["ivfflat.probes"] = probes
+    if iterative_scan:
+        parameters["hnsw.iterative_scan"] = "relaxed_order"
+        parameters["ivfflat.iterative_scan"] = "relaxed_order"
+    if not parameters:
+        return
+
+    # set_config(..., true) is transaction-local: pooled connections are not affected
+    assignments = ", ".join(
+        f"set_config('{name}', :value_{i}, true)" for i, name in enumerate(parameters)
+    )
+    await db.execute(
+        text(f"SELECT {assignments}"),
+        {f"value_{i}": str(value) for i, value in enumerate(parameters.values())}
+    )
 
 
 async def vector_search(
-    db: Session,
-    query_embedding: List[float],
+    db: AsyncSession,
+    query_embedding: Union[List[float], np.ndarray],
     top_k: int = 5,
-    paper_ids: List[int] = None
+    paper_ids: List[int] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    overfetch: Optional[int] = None
 ) -> List[dict]:
     """
     Searches for chunks most similar to a given embedding
 
+    With settings.VECTOR_REPLICA_ENABLED, the in-process replica ranks all
+    embeddings exactly (paper_ids included) and only the top_k rows are read
+    from Postgres. Otherwise, without paper_ids, the ANN index is used directly. With paper_ids, an ANN
+    index only sees the filter after picking its candidates, so the search is
+    planned from the number of chunks selected by the filter:
+    - few chunks: their embeddings are ranked exactly, without the ANN index
+    - more chunks: iterative index scan, then an exact scan of the filtered
+      rows if the index still returned fewer than top_k rows
+
+    With settings.VECTOR_BINARY_RERANK, the searches that would go through the
+    ANN index use a two-stage search instead (see _binary_rerank_query).
+
     Args:
         db: Database session
         query_embedding: Question embedding
         top_k: Number of results to return
         paper_ids: Optional list of paper IDs to filter
+        ef_search: HNSW search breadth for this query (default: settings.HNSW_EF_SEARCH)
+        probes: IVFFlat lists probed for this query (default: settings.IVFFLAT_PROBES)
+        overfetch: Binary prefilter candidates per result (default: settings.VECTOR_BINARY_OVERFETCH)
 
     Returns:
         List of chunks with their similarity score
     """
-    # Build the query with pgvector cosine similarity
+    # Converted once: bound as is by the binary codec, ranked as is by the replica
+    query_embedding = np.asarray(query_embedding, dtype=np.float32)
+
+    if settings.VECTOR_REPLICA_ENABLED:
+        replica = get_vector_replica()
+        if replica.needs_sync():
+            await run_blocking_io(_sync_replica, replica)
+        # Matrix product over the whole replica: off the event loop (NumPy releases the GIL)
+        chunk_ids, distances = await run_blocking_io(replica.search, query_embedding, top_k, paper_ids)
+        return await _load_results(db, dict(zip(chunk_ids.tolist(), distances.tolist())))
+
+    if overfetch is None:
+        overfetch = settings.VECTOR_BINARY_OVERFETCH
+
+    if not paper_ids:
+        if settings.VECTOR_BINARY_RERANK:
+            results = (await db.execute(_binary_rerank_query(query_embedding, top_k, overfetch))).fetchall()
+            return [_format_result(row, row.distance) for row in results]
+        await apply_search_tuning(db, top_k, ef_search, probes)
+        results = (await db.execute(_search_query(query_embedding, top_k))).fetchall()
+        return [_format_result(row, row.distance) for row in results]
+
+    nb_chunks = (await db.execute(
+        select(func.count(Chunk.id))
+        .where(Chunk.paper_id.in_(paper_ids), Chunk.embedding.isnot(None))
+    )).scalar() or 0
+
+    if nb_chunks == 0:
+        return []
+
+    if nb_chunks <= settings.VECTOR_EXACT_SEARCH_MAX_CHUNKS:
+        return await _exact_search(db, query_embedding, top_k, paper_ids)
+
+    if settings.VECTOR_BINARY_RERANK:
+        # The filter is applied during the Hamming scan: no candidate is lost to it
+        results = (await db.execute(_binary_rerank_query(query_embedding, top_k, overfetch, paper_ids))).fetchall()
+        return [_format_result(row, row.distance) for row in results]
+
+    await apply_search_tuning(db, top_k, ef_search, probes, iterative_scan=settings.VECTOR_ITERATIVE_SCAN)
+    results = (await db.execute(_search_query(query_embedding, top_k, paper_ids))).fetchall()
+
+    if len(results) < min(top_k, nb_chunks):
+        # The index ran out of candidates before top_k of them matched the
+        # filter: rank the filtered rows with a query the ANN index cannot
+        # serve (a planner setting would not reach a cached generic plan)
+        return await _exact_search(db, query_embedding, top_k, paper_ids)
+
+    # Iterative scans in relaxed order may return rows slightly out of order
+    results = sorted(results, key=lambda row: row.distance)
+    return [_format_result(row, row.distance) for row in results]
+
+
+def _search_query(query_embedding: List[float], top_k: int, paper_ids: List[int] = None):
+    """
+    Builds the query ordering chunks by cosine distance (pgvector)
+    """
     query = (
         select(
             Chunk.id,
@@ -46,22 +192,211 @@ async def vector_search(
         query = query.filter(Chunk.paper_id.in_(paper_ids))
 
     # Order by similarity (lower distance = more similar) and limit results
-    query = query.order_by("distance").limit(top_k)
-
-    # Execute the query
-    results = db.execute(query).fetchall()
-
-    # Format the results
-    return [
-        {
-            "chunk_id": row.id,
-            "content": row.content,
-            "section_name": row.section_name,
-            "paper_id": row.paper_id,
-            "paper_title": row.title,
-            "authors": row.authors,
-            "year": row.year,
-            "similarity_score": 1 - row.distance  # Convert distance to similarity score
-        }
-        for row in results
-    ]
+    return query.order_by("distance").limit(top_k)
+
+
+def _binary_rerank_query(
+    query_embedding: List[float],
+    top_k: int,
+    overfetch: int,
+    paper_ids: List[int] = None
+):
+    """
+    Builds the two-stage query: Hamming-distance scan, then exact cosine rerank
+
+    Stage one ranks chunks by the Hamming distance (<~>) between
+    chunks.embedding_bits (1 bit per dimension: the sign) and the quantized
+    question, scanning 192 bytes per chunk instead of 6 KB, and keeps
+    top_k * overfetch candidates. Stage two ranks the candidates by the cosine
+    distance of their full-precision embeddings. Needs pgvector >= 0.7 and
+    migrations/add_chunk_embedding_bits.sql.
+    """
+    query_bits = func.binary_quantize(cast(query_embedding, Vector(settings.OPENAI_EMBEDDING_DIMENSIONS)))
+    candidates = (
+        select(Chunk.id, Chunk.embedding)
+        .where(Chunk.embedding_bits.isnot(None))
+        .order_by(Chunk.embedding_bits.op("<~>")(query_bits))
+        .limit(top_k * max(1, overfetch))
+    )
+    if paper_ids:
+        candidates = candidates.where(Chunk.paper_id.in_(paper_ids))
+    candidates = candidates.subquery("candidates")
+
+    distance = candidates.c.embedding.cosine_distance(query_embedding).label("distance")
+    return (
+        select(
+            Chunk.id,
+            Chunk.content,
+            Chunk.section_name,
+            Chunk.paper_id,
+            Paper.title,
+            Paper.authors,
+            Paper.year,
+            distance
+        )
+        .select_from(candidates)
+        .join(Chunk, Chunk.id == candidates.c.id)
+        .join(Paper, Chunk.paper_id == Paper.id)
+        .order_by(distance)
+        .limit(top_k)
+    )
+
+
+async def _exact_search(db: AsyncSession, query_embedding: List[float], top_k: int, paper_ids: List[int]) -> List[dict]:
+    """
+    Ranks the embeddings of the selected papers exactly, in Postgres
+
+    The MATERIALIZED CTE is read through ix_chunks_paper_id and its ORDER BY
+    cannot use the ANN index: every selected chunk is ranked, and only the
+    top_k rows are returned with their content and paper metadata.
+    """
+    selected = (
+        select(Chunk.id, Chunk.embedding)
+        .where(Chunk.paper_id.in_(paper_ids), Chunk.embedding.isnot(None))
+        .cte("selected")
+        .prefix_with("MATERIALIZED")
+    )
+    distance = selected.c.embedding.cosine_distance(query_embedding).label("distance")
+    ranked = (
+        select(selected.c.id, distance)
+        .order_by(distance)
+        .limit(top_k)
+        .subquery("ranked")
+    )
+    results = (await db.execute(
+        select(
+            Chunk.id,
+            Chunk.content,
+            Chunk.section_name,
+            Chunk.paper_id,
+            Paper.title,
+            Paper.authors,
+            Paper.year,
+            ranked.c.distance
+        )
+        .select_from(ranked)
+        .join(Chunk, Chunk.id == ranked.c.id)
+        .join(Paper, Chunk.paper_id == Paper.id)
+        .order_by(ranked.c.distance)
+    )).fetchall()
+    return [_format_result(row, row.distance) for row in results]
+
+
+async def _load_results(db: AsyncSession, distance_by_id: Dict[int, float]) -> List[dict]:
+    """
+    Loads content and paper metadata of ranked chunks, closest first
+    """
+    if not distance_by_id:
+        return []
+
+    rows = (await db.execute(
+        select(
+            Chunk.id,
+            Chunk.content,
+            Chunk.section_name,
+            Chunk.paper_id,
+            Paper.title,
+            Paper.authors,
+            Paper.year
+        )
+        .join(Paper, Chunk.paper_id == Paper.id)
+        .where(Chunk.id.in_(list(distance_by_id)))
+    )).fetchall()
+
+    rows = sorted(rows, key=lambda row: distance_by_id[row.id])
+    return [_format_result(row, distance_by_id[row.id]) for row in rows]
+
+
+def _sync_replica(replica):
+    """
+    Catches the replica up with Postgres (blocking, run in the I/O pool with
+    a sync session: the diff loads whole papers of embeddings)
+    """
+    with SessionLocal() as db:
+        replica.sync(db)
+
+
+def _format_result(row, distance: float) -> Dict[str, Any]:
+    return {
+        "chunk_id": row.id,
+        "content": row.content,
+        "section_name": row.section_name,
+        "paper_id": row.paper_id,
+        "paper_title": row.title,
+        "authors": row.authors,
+        "year": row.year,
+        "similarity_score": 1 - distance  # Convert distance to similarity score
+    }
+
+
+def bulk_insert_chunks(db: Session, paper_id: int, chunks: List[dict], embeddings: List) -> Dict[str, Any]:
+    """
+    Writes the chunks of a paper with a single COPY ... FROM STDIN in binary
+    format, in the transaction of the session (blocking, sync session)
+
+    Embeddings are sent in pgvector's binary representation (float32), so
+    neither side formats or parses 1536-number text literals, and all rows
+    go in one round-trip instead of one INSERT per chunk.
+
+    Args:
+        db: Sync database session (psycopg2)
+        paper_id: Paper the chunks belong to
+        chunks: Chunks with content, section_name and chunk_index
+        embeddings: Embedding of each chunk (None for no embedding)
+
+    Returns:
+        Insert statistics: rows, bytes sent, duration and throughput
+    """
+    start = time.perf_counter()
+    buffer = _encode_copy_rows(paper_id, chunks, embeddings)
+    nb_bytes = buffer.getbuffer().nbytes
+
+    # Raw psycopg2 cursor of the session's connection: the COPY joins its transaction
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(COPY_CHUNKS_SQL, buffer)
+    finally:
+        cursor.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows": len(chunks),
+        "bytes": nb_bytes,
+        "duration_ms": round(elapsed * 1000, 1),
+        "rows_per_s": round(len(chunks) / elapsed) if elapsed > 0 else None
+    }
+    logger.info(f"Inserted {stats['rows']} chunks of paper {paper_id} by COPY: {stats}")
+    return stats
+
+
+def _encode_copy_rows(paper_id: int, chunks: List[dict], embeddings: List) -> io.BytesIO:
+    """
+    Encodes chunk rows in the binary COPY format (big-endian, each field
+    prefixed with its length, -1 for NULL)
+    """
+    buffer = io.BytesIO()
+    buffer.write(COPY_BINARY_HEADER)
+    null = struct.pack(">i", -1)
+    paper_field = struct.pack(">ii", 4, paper_id)
+
+    for chunk, embedding in zip(chunks, embeddings):
+        buffer.write(struct.pack(">h", 5))
+        buffer.write(paper_field)
+        for value in (chunk["content"], chunk.get("section_name")):
+            if value is None:
+                buffer.write(null)
+            else:
+                data = value.encode("utf-8")
+                buffer.write(struct.pack(">i", len(data)))
+                buffer.write(data)
+        buffer.write(struct.pack(">ii", 4, chunk["chunk_index"]))
+        if embedding is None:
+            buffer.write(null)
+        else:
+            data = to_db_binary(embedding)
+            buffer.write(struct.pack(">i", len(data)))
+            buffer.write(data)
+
+    buffer.write(COPY_BINARY_TRAILER)
+    buffer.seek(0)
+    return buffer
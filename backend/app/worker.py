@@ -0,0 +1,197 @@
+"""
+Background ingestion worker
+
+Polls the ingestion_jobs table and runs the ingestion pipeline for each
+claimed job. Several workers (processes or nodes) can share the same queue.
+
+Usage:
+    python -m app.worker                  # one worker process
+    python -m app.worker --processes 4    # four worker processes on this node
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.executors import run_blocking_io, shutdown_executors
+from app.models import IngestionJob
+from app.services.embedding_cache import maybe_evict
+from app.services.ingestion import ingest_pdf
+from app.services.job_queue import claim_next_job, complete_job, fail_job, renew_lease
+from app.services.openai_client import close_openai_client
+
+logger = logging.getLogger(__name__)
+
+
+def _renew_lease(job_id: int, worker_id: str) -> bool:
+    """
+    Refreshes the lease of a running job in a session of its own (blocking)
+    """
+    with SessionLocal() as db:
+        return renew_lease(db, job_id, worker_id)
+
+
+async def _keep_lease(job_id: int, worker_id: str):
+    """
+    Renews the lease of a running job every settings.INGESTION_LEASE_RENEWAL_S
+    until cancelled, so that long ingestions are not reclaimed by another worker
+
+    Returns when the lease is lost: the job was reclaimed or changed meanwhile
+    """
+    while True:
+        await asyncio.sleep(settings.INGESTION_LEASE_RENEWAL_S)
+        try:
+            if not await run_blocking_io(_renew_lease, job_id, worker_id):
+                logger.warning(f"Job {job_id} is no longer held by worker {worker_id}")
+                return
+        except Exception as e:
+            logger.error(f"Error while renewing the lease of job {job_id}: {str(e)}")
+
+
+async def process_job(db: Session, job: IngestionJob, worker_id: str):
+    """
+    Runs the ingestion pipeline for a claimed job and records the outcome
+
+    The lease of the job is renewed in the background while the pipeline runs.
+    If it is lost, the pipeline is cancelled and nothing is written: the job
+    belongs to the worker that reclaimed it.
+
+    Args:
+        db: Database session holding the job
+        job: Job claimed by this worker
+        worker_id: Identifier of this worker
+    """
+    job_id, pdf_path = job.id, job.pdf_path
+    logger.info(f"Processing job {job_id} ({job.filename}), attempt {job.attempts}/{job.max_attempts}")
+
+    ingestion = asyncio.ensure_future(ingest_pdf(db, pdf_path, job.filename, job.content_hash))
+    lease = asyncio.create_task(_keep_lease(job_id, worker_id))
+    try:
+        await asyncio.wait({ingestion, lease}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        lease.cancel()
+
+    if not ingestion.done():
+        ingestion.cancel()
+        await asyncio.wait({ingestion})  # Let the pipeline unwind, its outcome is not recorded
+        db.rollback()
+        logger.warning(f"Job {job_id} abandoned: its lease was lost")
+        return
+
+    try:
+        paper = ingestion.result()
+    except ValueError as e:
+        # The PDF itself is unusable: retrying would fail the same way
+        logger.warning(f"Job {job_id} failed permanently: {str(e)}")
+        written = fail_job(db, job, worker_id, str(e), retryable=False)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+        written = fail_job(db, job, worker_id, str(e))
+    else:
+        duplicate = paper.pdf_path != pdf_path
+        written = complete_job(db, job, worker_id, paper.id, pdf_path=paper.pdf_path if duplicate else None)
+        if written:
+            if duplicate:
+                # Duplicate of an already indexed file: keep only the paper's copy
+                Path(pdf_path).unlink(missing_ok=True)
+            logger.info(f"Job {job_id} done (paper {paper.id})")
+
+    if not written:
+        logger.warning(f"Outcome of job {job_id} not recorded: it was reclaimed by another worker")
+
+
+async def run_worker(worker_id: str, stop: asyncio.Event):
+    """
+    Claims and processes jobs until stop is set
+
+    The job in progress always runs to completion before the worker exits.
+    """
+    logger.info(f"Worker {worker_id} started")
+
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            if settings.EMBEDDING_CACHE_ENABLED:
+                # Cache eviction runs here, between jobs, instead of on the request path
+                maybe_evict(db)
+            job = claim_next_job(db, worker_id)
+            if job is not None:
+                await process_job(db, job, worker_id)
+                continue
+        except Exception as e:
+            # Database not reachable yet, tables not created yet, etc.
+            logger.error(f"Error while polling the job queue: {str(e)}")
+        finally:
+            db.close()
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.INGESTION_POLL_INTERVAL_S)
+        except asyncio.TimeoutError:
+            pass
+
+    logger.info(f"Worker {worker_id} stopped")
+
+
+async def _serve():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        await run_worker(worker_id, stop)
+    finally:
+        shutdown_executors()
+        await close_openai_client()
+
+
+def _worker_main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    asyncio.run(_serve())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PaperChat ingestion worker")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Number of worker processes to run on this node (default: 1)"
+    )
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _worker_main()
+        return
+
+    # Not daemonic: each worker owns a CPU process pool of its own
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker_main, name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward_signal(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: the worker finishes its current job
+
+    signal.signal(signal.SIGTERM, forward_signal)
+    signal.signal(signal.SIGINT, forward_signal)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
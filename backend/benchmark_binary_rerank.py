@@ -0,0 +1,85 @@
+"""
+Recall benchmark of the binary prefilter + rerank search against exact search
+
+Queries are the embeddings of randomly sampled chunks. For each over-fetch
+factor, recall@k is the share of the exact top_k (cosine, sequential scan)
+also returned by the two-stage search.
+
+Usage:
+    python benchmark_binary_rerank.py --queries 50 --top-k 10 --overfetch 1 2 5 10 20
+"""
+import argparse
+import statistics
+import time
+from sqlalchemy import select, func, text
+from app.database import SessionLocal
+from app.models import Chunk
+from app.services.vector_store import _binary_rerank_query, _search_query
+
+
+def sample_queries(db, nb_queries: int):
+    return [
+        list(row.embedding)
+        for row in db.execute(
+            select(Chunk.embedding)
+            .where(Chunk.embedding.isnot(None))
+            .order_by(func.random())
+            .limit(nb_queries)
+        )
+    ]
+
+
+def exact_top_k(db, query_embedding, top_k: int):
+    # Transaction-local: the ANN index must not be used for the ground truth
+    db.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+    ids = [row.id for row in db.execute(_search_query(query_embedding, top_k))]
+    db.rollback()
+    return ids
+
+
+def timed_ids(db, query):
+    start = time.perf_counter()
+    ids = [row.id for row in db.execute(query)]
+    return ids, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, nargs="+", default=[1, 2, 5, 10, 20])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        queries = sample_queries(db, args.queries)
+        if not queries:
+            print("No embedded chunks to benchmark")
+            return
+
+        print(f"{len(queries)} queries, top_k={args.top_k}")
+        ground_truth = []
+        exact_ms = []
+        for query in queries:
+            start = time.perf_counter()
+            ground_truth.append(set(exact_top_k(db, query, args.top_k)))
+            exact_ms.append((time.perf_counter() - start) * 1000)
+        print(f"{'exact':>12}  recall@k 1.000  median {statistics.median(exact_ms):8.1f} ms")
+
+        for overfetch in args.overfetch:
+            recalls = []
+            latencies = []
+            for query, expected in zip(queries, ground_truth):
+                ids, ms = timed_ids(db, _binary_rerank_query(query, args.top_k, overfetch))
+                recalls.append(len(expected.intersection(ids)) / len(expected) if expected else 1.0)
+                latencies.append(ms)
+            print(
+                f"{'x' + str(overfetch):>12}  recall@k {statistics.mean(recalls):.3f}  "
+                f"median {statistics.median(latencies):8.1f} ms"
+            )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import sys
 import time
 from pathlib import Path
 from sqlalchemy import text
+from app.config import settings
 from app.database import engine, Base
 
 def wait_for_db(max_retries=30, retry_interval=1):
@@ -37,8 +38,11 @@ def create_tables():
         print(f"✗ Error creating tables: {e}")
         return False
 
-def run_migration(sql_file: str):
-    """Exécuter un fichier de migration SQL"""
+def run_migration(sql_file: str, autocommit: bool = False):
+    """Exécuter un fichier de migration SQL
+
+    autocommit: exécuter hors transaction (requis par CREATE INDEX CONCURRENTLY)
+    """
     sql_path = Path(__file__).parent / "migrations" / sql_file
 
     if not sql_path.exists():
@@ -51,6 +55,9 @@ def run_migration(sql_file: str):
             sql_content = f.read()
 
         with engine.connect() as connection:
+            if autocommit:
+                connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+
             # Diviser le SQL par points-virgules et exécuter chaque instruction
             statements = [s.strip() for s in sql_content.split(';') if s.strip()]
 
@@ -58,7 +65,8 @@ def run_migration(sql_file: str):
                 print(f"  Executing statement {i}/{len(statements)}...")
                 connection.execute(text(statement))
 
-            connection.commit()
+            if not autocommit:
+                connection.commit()
 
         print("✓ Migration completed successfully!")
         return True
@@ -67,6 +75,74 @@ def run_migration(sql_file: str):
         print(f"✗ Error during migration: {e}")
         return False
 
+def drop_invalid_index(index_name: str):
+    """Supprimer un index laissé invalide par un CREATE INDEX CONCURRENTLY interrompu
+
+    Sinon IF NOT EXISTS le considère comme existant et il n'est jamais reconstruit
+    """
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        invalid = connection.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": index_name}).first()
+        if invalid:
+            print(f"  Dropping invalid index {index_name}...")
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+
+def create_vector_index():
+    """Construire l'index vectoriel choisi par settings.VECTOR_INDEX_TYPE"""
+    index_type = settings.VECTOR_INDEX_TYPE.lower()
+    if index_type == "none":
+        print("\nVector index disabled (VECTOR_INDEX_TYPE=none)")
+        return True
+    if index_type not in ("hnsw", "ivfflat"):
+        print(f"✗ Unknown VECTOR_INDEX_TYPE: {settings.VECTOR_INDEX_TYPE}")
+        return False
+
+    try:
+        drop_invalid_index(f"ix_chunks_embedding_{index_type}")
+    except Exception as e:
+        print(f"✗ Error checking vector index: {e}")
+        return False
+
+    return run_migration(f"create_vector_index_{index_type}.sql", autocommit=True)
+
+
+def add_search_vector():
+    """Ajouter chunks.search_vector et son index si settings.HYBRID_SEARCH_ENABLED
+
+    Comme pour embedding_bits, ajouter la colonne générée réécrit la table
+    chunks sous un verrou ACCESS EXCLUSIVE (to_tsvector calculé pour chaque
+    ligne) : la migration n'est lancée que lorsque la recherche hybride est activée.
+    """
+    if not settings.HYBRID_SEARCH_ENABLED:
+        print("\nHybrid search disabled (HYBRID_SEARCH_ENABLED=false), skipping chunks.search_vector")
+        return True
+
+    try:
+        drop_invalid_index("ix_chunks_search_vector")
+    except Exception as e:
+        print(f"✗ Error checking full-text index: {e}")
+        return False
+
+    return run_migration("add_chunk_search_vector.sql", autocommit=True)
+
+
+def add_embedding_bits():
+    """Ajouter chunks.embedding_bits si settings.VECTOR_BINARY_RERANK l'utilise
+
+    Ajouter la colonne générée réécrit la table chunks sous un verrou ACCESS
+    EXCLUSIVE (lectures et écritures bloquées pendant la réécriture) : la
+    migration n'est lancée que lorsque la recherche binaire est activée.
+    """
+    if not settings.VECTOR_BINARY_RERANK:
+        print("\nBinary rerank disabled (VECTOR_BINARY_RERANK=false), skipping chunks.embedding_bits")
+        return True
+    return run_migration("add_chunk_embedding_bits.sql")
+
+
 def main():
     """Initialisation complète de la base de données"""
     print("=" * 60)
@@ -85,6 +161,62 @@ def main():
     if not run_migration("create_conversations.sql"):
         sys.exit(1)
 
+    if not run_migration("add_content_hash.sql"):
+        sys.exit(1)
+
+    if not run_migration("add_conversation_summary.sql"):
+        sys.exit(1)
+
+    if not run_migration("add_paper_nb_chunks.sql"):
+        sys.exit(1)
+
+    if not create_vector_index():
+        sys.exit(1)
+
+    try:
+        drop_invalid_index("ix_chunks_paper_id")
+    except Exception as e:
+        print(f"✗ Error checking chunk paper index: {e}")
+        sys.exit(1)
+
+    if not run_migration("add_chunk_paper_id_index.sql", autocommit=True):
+        sys.exit(1)
+
+    if not add_search_vector():
+        sys.exit(1)
+
+    if not add_embedding_bits():
+        sys.exit(1)
+
+    try:
+        drop_invalid_index("ix_messages_conversation_created_at_id")
+    except Exception as e:
+        print(f"✗ Error checking message history index: {e}")
+        sys.exit(1)
+
+    if not run_migration("add_message_history_index.sql", autocommit=True):
+        sys.exit(1)
+
+    try:
+        drop_invalid_index("ix_conversations_updated_at_id")
+        drop_invalid_index("ix_papers_created_at_id")
+    except Exception as e:
+        print(f"✗ Error checking pagination indexes: {e}")
+        sys.exit(1)
+
+    if not run_migration("add_keyset_indexes.sql", autocommit=True):
+        sys.exit(1)
+
+    try:
+        for index_name in ("ix_papers_title_trgm", "ix_papers_authors_trgm", "ix_papers_keywords_trgm"):
+            drop_invalid_index(index_name)
+    except Exception as e:
+        print(f"✗ Error checking paper search indexes: {e}")
+        sys.exit(1)
+
+    if not run_migration("add_paper_search_indexes.sql", autocommit=True):
+        sys.exit(1)
+
     print("\n" + "=" * 60)
     print("✓ Database initialization completed successfully!")
     print("=" * 60)
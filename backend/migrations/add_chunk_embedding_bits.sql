@@ -0,0 +1,6 @@
+-- Sign-quantized embeddings for the binary prefilter of vector_search (settings.VECTOR_BINARY_RERANK).
+-- Generated column (pgvector >= 0.7): Postgres computes it on insert, existing rows are filled when the column is added.
+-- Adding it rewrites chunks under an ACCESS EXCLUSIVE lock (reads and writes blocked until done): init_db.py only runs it
+-- with VECTOR_BINARY_RERANK enabled, plan it for a maintenance window on large tables.
+-- No index: stage one is a sequential Hamming scan over 192 bytes per chunk.
+ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding_bits bit(1536) GENERATED ALWAYS AS (binary_quantize(embedding)::bit(1536)) STORED
@@ -0,0 +1,3 @@
+-- Chunks of a paper: searches scoped by paper_ids (count and exact scan of the selected chunks) and paper deletions (ON DELETE CASCADE).
+-- Run outside a transaction (CREATE INDEX CONCURRENTLY).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_paper_id ON chunks (paper_id)
@@ -0,0 +1,7 @@
+-- Full-text search on chunks (lexical leg of hybrid search, see app/services/hybrid_search.py).
+-- Generated column: Postgres computes it on insert, existing rows are filled when the column is added.
+-- Adding it rewrites chunks under an ACCESS EXCLUSIVE lock (reads and writes blocked until done): init_db.py only runs it
+-- with HYBRID_SEARCH_ENABLED, plan it for a maintenance window on large tables.
+-- Run outside a transaction (CREATE INDEX CONCURRENTLY).
+ALTER TABLE chunks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(section_name, '') || ' ' || content)) STORED;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_search_vector ON chunks USING gin (search_vector)
@@ -0,0 +1,6 @@
+-- SHA-256 of uploaded PDFs, used to skip re-indexing a file that is already in the library
+ALTER TABLE papers ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_papers_content_hash ON papers(content_hash);
+
+ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_content_hash ON ingestion_jobs(content_hash);
@@ -0,0 +1,17 @@
+-- Message count and last message preview stored on conversations (conversation list in one query).
+-- Maintained by app/api/chat.py when messages are written. The backfill only touches conversations
+-- that still have a zero count, so re-running this migration is cheap.
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_preview VARCHAR;
+
+UPDATE conversations c
+SET message_count = s.message_count,
+    last_message_preview = CASE WHEN length(s.last_content) > 100 THEN left(s.last_content, 100) || '...' ELSE s.last_content END
+FROM (
+    SELECT conversation_id,
+           count(*) AS message_count,
+           (array_agg(content ORDER BY created_at DESC, id DESC))[1] AS last_content
+    FROM messages
+    GROUP BY conversation_id
+) s
+WHERE s.conversation_id = c.id AND c.message_count = 0
@@ -0,0 +1,5 @@
+-- Keyset pagination of the conversation and paper lists (see app/services/pagination.py).
+-- Run outside a transaction (CREATE INDEX CONCURRENTLY).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_updated_at_id ON conversations (updated_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_created_at_id ON papers (created_at, id)
@@ -0,0 +1,7 @@
+-- Latest messages of a conversation (chat history window, see app/api/chat.py,
+-- and message pages, see app/api/conversations.py), id breaking created_at ties.
+-- Run outside a transaction (CREATE INDEX CONCURRENTLY).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_conversation_created_at_id ON messages (conversation_id, created_at, id);
+
+-- Superseded by the index above
+DROP INDEX CONCURRENTLY IF EXISTS ix_messages_conversation_created_at
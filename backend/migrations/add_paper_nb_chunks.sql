@@ -0,0 +1,13 @@
+-- Number of chunks stored on papers (paper endpoints no longer load chunks to count them).
+-- Set by app/services/ingestion.py with the chunks of the paper. The backfill only touches papers
+-- that still have a zero count, so re-running this migration is cheap.
+ALTER TABLE papers ADD COLUMN IF NOT EXISTS nb_chunks INTEGER NOT NULL DEFAULT 0;
+
+UPDATE papers p
+SET nb_chunks = s.nb_chunks
+FROM (
+    SELECT paper_id, count(*) AS nb_chunks
+    FROM chunks
+    GROUP BY paper_id
+) s
+WHERE s.paper_id = p.id AND p.nb_chunks = 0
@@ -0,0 +1,20 @@
+-- Search of the paper list (see app/api/papers.py): trigram indexes for fuzzy title matches
+-- and case-insensitive substring matches in authors and keywords.
+-- array_to_string is only STABLE, so the lowercased text of the arrays is computed by an IMMUTABLE wrapper that can be indexed.
+-- Run outside a transaction (CREATE INDEX CONCURRENTLY).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION array_search_text(text[]) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$ SELECT lower(array_to_string($1, ' ')) $$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_title_trgm ON papers USING gin (title gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_authors_trgm ON papers USING gin (array_search_text(authors) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_papers_keywords_trgm ON papers USING gin (array_search_text(keywords) gin_trgm_ops);
+
+-- Array containment indexes of the former exact author and keyword matches
+DROP INDEX CONCURRENTLY IF EXISTS ix_papers_authors;
+
+DROP INDEX CONCURRENTLY IF EXISTS ix_papers_keywords
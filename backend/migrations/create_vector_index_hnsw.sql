@@ -0,0 +1,7 @@
+-- HNSW index for cosine similarity search on chunk embeddings (vector_search orders by cosine_distance,
+-- so the operator class must be vector_cosine_ops or the index is not used).
+-- Built CONCURRENTLY so that uploads and questions keep working during the build: run outside a transaction.
+-- Query-time recall/speed trade-off: hnsw.ef_search (settings.HNSW_EF_SEARCH)
+SET maintenance_work_mem = '512MB';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_embedding_hnsw ON chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+ANALYZE chunks
@@ -0,0 +1,291 @@
+"""
+Unit tests for the chat endpoints
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from app.schemas import ChatRequest
+
+
+def parse_sse(payload):
+    """Split an SSE payload into (event, data) pairs"""
+    events = []
+    for block in payload.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def collect(generator):
+    return "".join([chunk async for chunk in generator])
+
+
+class TestStreamAnswer:
+    """Test cases for _stream_answer"""
+
+    @pytest.fixture
+    def mock_db(self):
+        db = AsyncMock()
+        db.add = Mock()
+        return db
+
+    @pytest.fixture
+    def done_event(self):
+        return {
+            "type": "done",
+            "answer": "Hello world",
+            "sources": [{
+                "paper_title": "AI Paper",
+                "paper_year": 2024,
+                "section_name": "Introduction",
+                "content": "text",
+                "relevance_score": 0.9
+            }],
+            "cost_usd": 0.0001,
+            "response_time_ms": 250,
+            "prompt_tokens": 100,
+            "completion_tokens": 2
+        }
+
+    @pytest.mark.asyncio
+    @patch('app.api.chat.stream_rag_answer_with_context')
+    @patch('app.api.chat.AsyncSessionLocal')
+    async def test_stream_emits_events_and_persists_at_end(
+        self, mock_session_local, mock_stream, mock_db, done_event
+    ):
+        """Test the SSE sequence and that messages are written after the last token"""
+        mock_session_local.return_value = mock_db
+
+        async def rag_events(**kwargs):
+            yield {"type": "sources", "sources": done_event["sources"]}
+            yield {"type": "token", "content": "Hello"}
+            # Only the read transaction was ended, nothing written yet
+            assert mock_db.commit.call_count == 1
+            assert not mock_db.add.called
+            yield {"type": "token", "content": " world"}
+            yield done_event
+
+        mock_stream.side_effect = rag_events
+
+        from app.api.chat import _stream_answer
+
+        with patch('app.api.chat._load_history', new_callable=AsyncMock, return_value=[]), \
+             patch('app.api.chat._reserve_conversation_id', new_callable=AsyncMock, return_value=7):
+            with patch('app.api.chat.Message') as mock_message, patch('app.api.chat.QueryLog') as mock_query_log:
+                payload = await collect(_stream_answer(ChatRequest(question="Hi?")))
+
+        events = parse_sse(payload)
+        assert [name for name, _ in events] == ["conversation", "sources", "token", "token", "done"]
+        assert events[0][1] == {"conversation_id": 7}
+        assert events[2][1] == {"content": "Hello"}
+        assert events[4][1]["cost_usd"] == 0.0001
+        assert events[4][1]["completion_tokens"] == 2
+
+        assert mock_db.commit.call_count == 2
+        conversation = mock_db.add.call_args_list[0][0][0]
+        assert conversation.id == 7  # Reserved id, sent in the first event
+        assert mock_message.call_args_list[0][1]["conversation_id"] == 7
+        assistant_kwargs = mock_message.call_args_list[-1][1]
+        assert assistant_kwargs["role"] == "assistant"
+        assert assistant_kwargs["content"] == "Hello world"
+        assert mock_query_log.call_args[1]["answer"] == "Hello world"
+        assert mock_db.close.called
+
+    @pytest.mark.asyncio
+    @patch('app.api.chat.stream_rag_answer_with_context')
+    @patch('app.api.chat.AsyncSessionLocal')
+    async def test_stream_error_event_and_rollback(
+        self, mock_session_local, mock_stream, mock_db
+    ):
+        """Test that a failure mid-stream emits an error event and saves nothing"""
+        mock_session_local.return_value = mock_db
+
+        async def rag_events(**kwargs):
+            yield {"type": "sources", "sources": []}
+            raise Exception("provider down")
+
+        mock_stream.side_effect = rag_events
+
+        from app.api.chat import _stream_answer
+
+        with patch('app.api.chat._load_history', new_callable=AsyncMock, return_value=[]):
+            with patch('app.api.chat.Message'):
+                payload = await collect(_stream_answer(ChatRequest(question="Hi?", conversation_id=1)))
+
+        events = parse_sse(payload)
+        assert events[-1][0] == "error"
+        assert "provider down" in events[-1][1]["detail"]
+        assert not mock_db.add.called
+        assert mock_db.rollback.called
+        assert mock_db.close.called
+
+    @pytest.mark.asyncio
+    async def test_stream_unknown_conversation_returns_404(self, mock_db):
+        """Test that an unknown conversation is rejected before streaming starts"""
+        mock_db.scalar.return_value = None
+
+        from app.api.chat import ask_question_stream
+        from fastapi import HTTPException
+
+        with pytest.raises(HTTPException) as exc_info:
+            await ask_question_stream(ChatRequest(question="Hi?", conversation_id=99), mock_db)
+
+        assert exc_info.value.status_code == 404
+
+
+class TestAskQuestion:
+    """Test cases for the transactions of ask_question"""
+
+    @pytest.mark.asyncio
+    @patch('app.api.chat.generate_rag_answer_with_context', new_callable=AsyncMock)
+    async def test_no_transaction_spans_the_rag_call(self, mock_rag):
+        """Test that the history transaction ends before the RAG call and writes come after it"""
+        db = AsyncMock()
+        db.add = Mock()
+        calls = []
+        db.commit.side_effect = lambda: calls.append("commit")
+        db.add.side_effect = lambda obj: calls.append(f"add {type(obj).__name__}")
+
+        async def rag(**kwargs):
+            calls.append("rag")
+            return {
+                "answer": "Answer",
+                "sources": [],
+                "cost_usd": 0.001,
+                "response_time_ms": 100,
+                "prompt_tokens": 10,
+                "completion_tokens": 5
+            }
+
+        mock_rag.side_effect = rag
+
+        from app.api.chat import ask_question
+
+        with patch('app.api.chat._load_history', new_callable=AsyncMock, return_value=[]) as mock_history:
+            response = await ask_question(ChatRequest(question="Hi?", conversation_id=3), db)
+
+        assert response.conversation_id == 3
+        mock_history.assert_awaited_once_with(db, 3)
+        assert calls == ["commit", "rag", "add Message", "add Message", "add QueryLog", "commit"]
+
+    @pytest.mark.asyncio
+    @patch('app.api.chat.generate_rag_answer_with_context', new_callable=AsyncMock)
+    async def test_failed_answer_creates_nothing(self, mock_rag):
+        """Test that a new conversation is only created with its answer"""
+        db = AsyncMock()
+        db.add = Mock()
+        mock_rag.side_effect = Exception("provider down")
+
+        from app.api.chat import ask_question
+        from fastapi import HTTPException
+
+        with pytest.raises(HTTPException) as exc_info:
+            await ask_question(ChatRequest(question="Hi?"), db)
+
+        assert exc_info.value.status_code == 500
+        assert not db.add.called
+        assert db.rollback.called
+
+
+class TestLoadHistory:
+    """Test cases for the history window of a conversation"""
+
+    @pytest.mark.asyncio
+    async def test_new_conversation(self):
+        """Test that a new conversation has no history and runs no query"""
+        from app.api.chat import _load_history
+
+        db = AsyncMock()
+
+        assert await _load_history(db, None) == []
+        assert not db.execute.called
+
+    @pytest.mark.asyncio
+    async def test_window_query_oldest_first(self):
+        """Test that only role/content of the last messages are selected, returned oldest first"""
+        from app.api.chat import _load_history
+
+        db = AsyncMock()
+        db.scalar.return_value = 4
+        db.execute.return_value = Mock()
+        db.execute.return_value.all.return_value = [
+            Mock(role="assistant", content="Second answer"),
+            Mock(role="user", content="Second question")
+        ]
+
+        with patch('app.api.chat.settings.CHAT_HISTORY_WINDOW', 2):
+            history = await _load_history(db, 4)
+
+        assert history == [
+            {"role": "user", "content": "Second question"},
+            {"role": "assistant", "content": "Second answer"}
+        ]
+        query = db.execute.call_args[0][0]
+        sql = str(query)
+        assert "messages.sources" not in sql
+        assert "ORDER BY messages.created_at DESC, messages.id DESC" in sql
+        assert 2 in query.compile().params.values()
+
+    @pytest.mark.asyncio
+    async def test_unknown_conversation(self):
+        """Test that an unknown conversation is a 404"""
+        from app.api.chat import _load_history
+        from fastapi import HTTPException
+
+        db = AsyncMock()
+        db.scalar.return_value = None
+
+        with pytest.raises(HTTPException) as exc_info:
+            await _load_history(db, 99)
+
+        assert exc_info.value.status_code == 404
+
+
+class TestSaveExchange:
+    """Test cases for the conversation summary maintained with each answer"""
+
+    @staticmethod
+    def result(answer):
+        return {
+            "answer": answer,
+            "sources": [],
+            "cost_usd": 0.0,
+            "response_time_ms": 10,
+            "prompt_tokens": 1,
+            "completion_tokens": 1
+        }
+
+    @pytest.mark.asyncio
+    async def test_new_conversation_starts_with_summary(self):
+        """Test that a new conversation is created with its count and preview"""
+        from app.api.chat import _save_exchange
+
+        db = AsyncMock()
+        db.add = Mock()
+
+        await _save_exchange(db, ChatRequest(question="Hi?"), self.result("a" * 150), conversation_id=12)
+
+        conversation = db.add.call_args_list[0][0][0]
+        assert conversation.id == 12
+        assert conversation.message_count == 2
+        assert conversation.last_message_preview == "a" * 100 + "..."
+        assert not db.execute.called
+
+    @pytest.mark.asyncio
+    async def test_existing_conversation_counter_incremented(self):
+        """Test that answers in an existing conversation increment its count in SQL"""
+        from app.api.chat import _save_exchange
+
+        db = AsyncMock()
+        db.add = Mock()
+
+        conversation_id = await _save_exchange(db, ChatRequest(question="Hi?", conversation_id=5), self.result("Short"))
+
+        assert conversation_id == 5
+        statement = db.execute.call_args[0][0]
+        sql = str(statement)
+        assert sql.startswith("UPDATE conversations")
+        assert "message_count=(conversations.message_count +" in sql
+        params = statement.compile().params
+        assert params["last_message_preview"] == "Short"
+        assert 2 in params.values()
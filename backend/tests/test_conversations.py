@@ -0,0 +1,129 @@
+"""
+Unit tests for the conversations API
+"""
+import pytest
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Response
+from unittest.mock import AsyncMock, Mock
+from app.api.conversations import get_conversation, list_conversations, list_messages
+from app.services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def make_message(message_id, created_at):
+    return Mock(
+        id=message_id, conversation_id=1, role="user", content=f"Message {message_id}",
+        sources=None, cost_usd=0.0, response_time_ms=0, created_at=created_at
+    )
+
+
+class TestListConversations:
+    """Test cases for list_conversations"""
+
+    @pytest.mark.asyncio
+    async def test_single_query_per_page(self):
+        """Test that counts and previews come from the conversation rows"""
+        now = datetime.now()
+        conversations = [
+            Mock(id=2, title="Second", created_at=now, updated_at=now,
+                 message_count=4, last_message_preview="Latest answer"),
+            Mock(id=1, title="First", created_at=now, updated_at=now,
+                 message_count=0, last_message_preview=None)
+        ]
+        db = AsyncMock()
+        db.scalars.return_value = Mock()
+        db.scalars.return_value.all.return_value = conversations
+
+        response = Response()
+        result = await list_conversations(response=response, cursor=None, limit=20, db=db)
+
+        assert [(item.id, item.message_count, item.last_message_preview) for item in result] == [
+            (2, 4, "Latest answer"),
+            (1, 0, None)
+        ]
+        db.scalars.assert_awaited_once()
+        assert not db.scalar.called
+        assert not db.execute.called
+        assert NEXT_CURSOR_HEADER not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_next_cursor_header(self):
+        """Test that a full page returns the cursor of its last row"""
+        now = datetime.now()
+        conversations = [
+            Mock(id=i, title=None, created_at=now, updated_at=now - timedelta(minutes=i),
+                 message_count=2, last_message_preview="Hi")
+            for i in (3, 2, 1)
+        ]
+        db = AsyncMock()
+        db.scalars.return_value = Mock()
+        db.scalars.return_value.all.return_value = conversations
+        response = Response()
+
+        result = await list_conversations(response=response, cursor=None, limit=2, db=db)
+
+        assert [item.id for item in result] == [3, 2]
+        assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == (now - timedelta(minutes=2), 2)
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self):
+        """Test that an invalid cursor is rejected with 400"""
+        db = AsyncMock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await list_conversations(response=Response(), cursor="not-a-cursor", limit=20, db=db)
+
+        assert exc_info.value.status_code == 400
+        assert not db.scalars.called
+
+
+class TestConversationMessages:
+    """Test cases for get_conversation and list_messages"""
+
+    @pytest.mark.asyncio
+    async def test_get_conversation_returns_latest_page_oldest_first(self):
+        """Test that the latest messages are returned chronologically with the cursor of earlier ones"""
+        now = datetime.now()
+        db = AsyncMock()
+        db.get.return_value = Mock(id=1, title="Chat", created_at=now, updated_at=now)
+        db.scalars.return_value = Mock()
+        db.scalars.return_value.all.return_value = [
+            make_message(i, now + timedelta(seconds=i)) for i in (5, 4, 3)
+        ]
+
+        result = await get_conversation(conversation_id=1, messages_limit=2, db=db)
+
+        assert [msg.id for msg in result.messages] == [4, 5]
+        assert decode_cursor(result.next_messages_cursor) == (now + timedelta(seconds=4), 4)
+
+    @pytest.mark.asyncio
+    async def test_list_messages_before_cursor(self):
+        """Test that the page after a cursor has no next cursor when it is the last"""
+        now = datetime.now()
+        db = AsyncMock()
+        db.scalar.return_value = 1
+        db.scalars.return_value = Mock()
+        db.scalars.return_value.all.return_value = [
+            make_message(i, now + timedelta(seconds=i)) for i in (3, 2)
+        ]
+        response = Response()
+
+        result = await list_messages(
+            conversation_id=1, response=response,
+            cursor=encode_cursor(now + timedelta(seconds=4), 4), limit=2, db=db
+        )
+
+        assert [msg.id for msg in result] == [2, 3]
+        assert NEXT_CURSOR_HEADER not in response.headers
+        compiled = str(db.scalars.call_args[0][0])
+        assert "(messages.created_at, messages.id) <" in compiled
+
+    @pytest.mark.asyncio
+    async def test_list_messages_unknown_conversation(self):
+        """Test that an unknown conversation returns 404"""
+        db = AsyncMock()
+        db.scalar.return_value = None
+
+        with pytest.raises(HTTPException) as exc_info:
+            await list_messages(conversation_id=99, response=Response(), cursor=None, limit=50, db=db)
+
+        assert exc_info.value.status_code == 404
@@ -0,0 +1,77 @@
+"""
+Unit tests for the database engines and the pgvector column type
+"""
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from sqlalchemy.dialects.postgresql.psycopg2 import dialect as psycopg2_dialect
+from app.database import Vector, _register_vector_codec
+from app.models import Chunk
+from app.services.vector_store import _search_query
+
+
+class TestVectorType:
+    """Test cases for the binary-capable Vector type"""
+
+    def test_asyncpg_binds_float32_arrays(self):
+        """Test that asyncpg receives float32 arrays for its binary codec"""
+        process = Vector(3).bind_processor(asyncpg_dialect())
+
+        value = process([0.5, 1, -2.25])
+
+        assert isinstance(value, np.ndarray)
+        assert value.dtype == np.float32
+        assert value.tolist() == [0.5, 1.0, -2.25]
+        assert process(None) is None
+
+    def test_asyncpg_rejects_wrong_dimensions(self):
+        """Test that the dimension check of the text format is kept"""
+        process = Vector(3).bind_processor(asyncpg_dialect())
+
+        with pytest.raises(ValueError):
+            process(np.zeros(4, dtype=np.float32))
+
+    def test_psycopg2_keeps_text_format(self):
+        """Test that psycopg2 still gets pgvector's text literal"""
+        process = Vector(2).bind_processor(psycopg2_dialect())
+
+        assert process(np.array([1.0, 2.0], dtype=np.float32)) == "[1.0,2.0]"
+
+    def test_result_arrays_pass_through(self):
+        """Test that vectors decoded by the codec are returned as is"""
+        process = Vector(2).result_processor(asyncpg_dialect(), None)
+        value = np.array([1.0, 2.0], dtype=np.float32)
+
+        assert process(value) is value
+
+
+class TestVectorCodec:
+    """Test cases for the codec registration on new connections"""
+
+    def test_registers_binary_codec_on_connect(self):
+        """Test that the asyncpg connection gets pgvector's codec"""
+        dbapi_connection = Mock()
+
+        with patch('app.database.register_vector', new_callable=Mock, return_value="registration") as mock_register:
+            _register_vector_codec(dbapi_connection, None)
+
+        mock_register.assert_called_once_with(dbapi_connection.driver_connection)
+        dbapi_connection.await_.assert_called_once_with("registration")
+
+
+class TestPreparedSearch:
+    """Test cases for the statement reuse of the hot vector query"""
+
+    def test_search_sql_does_not_depend_on_vector_or_top_k(self):
+        """Test that the query vector and top_k are bound parameters (one prepared statement)"""
+        dialect = asyncpg_dialect()
+        first = _search_query(np.full(1536, 0.1, dtype=np.float32), 5).compile(dialect=dialect)
+        second = _search_query(np.full(1536, -0.3, dtype=np.float32), 20).compile(dialect=dialect)
+
+        assert str(first) == str(second)
+        assert "0.1" not in str(first)
+
+    def test_embedding_column_uses_binary_type(self):
+        """Test that chunk embeddings are bound with the binary-capable type"""
+        assert isinstance(Chunk.__table__.c.embedding.type, Vector)
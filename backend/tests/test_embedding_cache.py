@@ -0,0 +1,126 @@
+"""
+Unit tests for the embedding cache
+"""
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+from app.services import embedding_cache
+from app.services.embedding_cache import (
+    normalize_text,
+    hash_text,
+    lookup_embeddings,
+    store_embeddings,
+    evict_embeddings,
+    maybe_evict,
+    get_cache_stats
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    """Start every test with fresh counters"""
+    with patch.dict(embedding_cache._stats, {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}):
+        yield
+
+
+class TestCacheKeys:
+    """Test cases for text normalization and hashing"""
+
+    def test_normalize_text_collapses_whitespace(self):
+        """Test that whitespace differences do not change the text"""
+        assert normalize_text("  Deep\n\nlearning \t models ") == "Deep learning models"
+
+    def test_hash_text_ignores_whitespace(self):
+        """Test that re-extracted text with different spacing maps to the same key"""
+        assert hash_text("Deep learning\nmodels") == hash_text("Deep  learning models ")
+
+    def test_hash_text_is_case_sensitive(self):
+        """Test that case is kept (embeddings are case-sensitive)"""
+        assert hash_text("BERT") != hash_text("bert")
+
+
+class TestLookupEmbeddings:
+    """Test cases for lookup_embeddings function"""
+
+    def test_lookup_embeddings_hits_and_misses(self):
+        """Test that results are aligned with the input texts"""
+        mock_db = Mock()
+        row = Mock()
+        row.id = 1
+        row.text_hash = hash_text("cached text")
+        row.embedding = np.array([0.5] * 4, dtype=np.float32)
+        mock_db.execute.return_value.fetchall.return_value = [row]
+
+        result = lookup_embeddings(mock_db, ["new text", "cached text"], "model", 4)
+
+        assert result[0] is None
+        assert result[1].dtype == np.float32
+        assert result[1].tolist() == [0.5] * 4
+        # One SELECT and one UPDATE of the LRU timestamps
+        assert mock_db.execute.call_count == 2
+        mock_db.commit.assert_called_once()
+
+        stats = get_cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_lookup_embeddings_all_misses(self):
+        """Test that no UPDATE is sent when nothing is cached"""
+        mock_db = Mock()
+        mock_db.execute.return_value.fetchall.return_value = []
+
+        result = lookup_embeddings(mock_db, ["a", "b"], "model", 4)
+
+        assert result == [None, None]
+        mock_db.execute.assert_called_once()
+        assert not mock_db.commit.called
+
+
+class TestStoreEmbeddings:
+    """Test cases for store_embeddings and eviction"""
+
+    @patch('app.services.embedding_cache.evict_embeddings')
+    def test_store_embeddings_deduplicates_keys(self, mock_evict):
+        """Test that identical normalized texts are stored once, without eviction"""
+        mock_db = Mock()
+
+        store_embeddings(mock_db, ["same text", "same  text", "other"], [[0.1], [0.1], [0.2]], "model", 1)
+
+        mock_db.execute.assert_called_once()
+        mock_db.commit.assert_called_once()
+        assert get_cache_stats()["stores"] == 2
+        assert not mock_evict.called
+
+    @patch('app.services.embedding_cache.time.monotonic')
+    @patch('app.services.embedding_cache.evict_embeddings')
+    def test_maybe_evict_skips_first_call(self, mock_evict, mock_monotonic):
+        """Test that eviction runs one interval after the first call, then once per interval"""
+        mock_db = Mock()
+
+        with patch.object(embedding_cache, "_last_eviction", 0.0), \
+                patch('app.services.embedding_cache.settings.EMBEDDING_CACHE_EVICT_INTERVAL_S', 300):
+            mock_monotonic.return_value = 1000.0
+            assert maybe_evict(mock_db) is False
+            mock_monotonic.return_value = 1200.0
+            assert maybe_evict(mock_db) is False
+            mock_monotonic.return_value = 1300.0
+            assert maybe_evict(mock_db) is True
+            assert maybe_evict(mock_db) is False
+
+        mock_evict.assert_called_once_with(mock_db, embedding_cache.settings.EMBEDDING_CACHE_MAX_ENTRIES)
+
+    def test_evict_embeddings_counts_deleted_rows(self):
+        """Test that evicted rows are counted"""
+        mock_db = Mock()
+        mock_db.execute.return_value.rowcount = 7
+
+        deleted = evict_embeddings(mock_db, max_entries=100)
+
+        assert deleted == 7
+        assert get_cache_stats()["evictions"] == 7
+        mock_db.commit.assert_called_once()
+
+    def test_get_cache_stats_without_lookups(self):
+        """Test that the hit rate is 0 before any lookup"""
+        assert get_cache_stats()["hit_rate"] == 0.0
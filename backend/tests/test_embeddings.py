@@ -1,9 +1,19 @@
 """
 Unit tests for embeddings generation service
 """
+import asyncio
+import base64
+import httpx
+import numpy as np
 import pytest
+from openai import BadRequestError, RateLimitError
 from unittest.mock import Mock, patch, AsyncMock
-from app.services.embeddings import generate_embedding, generate_embeddings_batch
+from app.services.embeddings import decode_embedding, generate_embedding, generate_embeddings_batch, pack_batches
+
+
+def to_base64(values) -> str:
+    """Encodes values like the API does with encoding_format="base64" (little-endian float32)"""
+    return base64.b64encode(np.asarray(values, dtype="<f4").tobytes()).decode()
 
 
 class TestGenerateEmbedding:
@@ -16,7 +26,8 @@ class TestGenerateEmbedding:
         # Setup mock
         mock_response = Mock()
         mock_data = Mock()
-        mock_data.embedding = [0.1, 0.2, 0.3, 0.4, 0.5] * 307 + [0.1]  # 1536 dimensions
+        values = [0.1, 0.2, 0.3, 0.4, 0.5] * 307 + [0.1]  # 1536 dimensions
+        mock_data.embedding = to_base64(values)
         mock_response.data = [mock_data]
 
         mock_client.embeddings.create = AsyncMock(return_value=mock_response)
@@ -25,12 +36,14 @@ class TestGenerateEmbedding:
         result = await generate_embedding("Test text for embedding")
 
         # Assert
-        assert len(result) == 1536
-        assert isinstance(result, list)
-        assert all(isinstance(x, float) for x in result)
+        assert isinstance(result, np.ndarray)
+        assert result.dtype == np.float32
+        assert result.shape == (1536,)
+        assert result == pytest.approx(values)
         mock_client.embeddings.create.assert_called_once_with(
             model="text-embedding-3-small",
-            input="Test text for embedding"
+            input="Test text for embedding",
+            encoding_format="base64"
         )
 
     @pytest.mark.asyncio
@@ -52,7 +65,8 @@ class TestGenerateEmbedding:
         assert len(result) == 1536
         mock_client.embeddings.create.assert_called_once_with(
             model="text-embedding-3-large",
-            input="Test text"
+            input="Test text",
+            encoding_format="base64"
         )
 
     @pytest.mark.asyncio
@@ -131,10 +145,33 @@ class TestGenerateEmbedding:
         assert len(result) == 1536
         mock_client.embeddings.create.assert_called_once_with(
             model="text-embedding-3-small",
-            input=text
+            input=text,
+            encoding_format="base64"
         )
 
 
+class TestDecodeEmbedding:
+    """Test cases for decode_embedding"""
+
+    def test_base64_is_viewed_without_conversion(self):
+        """Test that a base64 payload becomes a float32 view of the decoded bytes"""
+        values = np.linspace(-1, 1, 1536, dtype=np.float32)
+
+        result = decode_embedding(to_base64(values))
+
+        assert result.dtype == np.float32
+        assert np.array_equal(result, values)
+        assert isinstance(result.base, bytes)  # No copy after base64 decoding
+        assert not result.flags.writeable
+
+    def test_float_list_fallback(self):
+        """Test that providers ignoring encoding_format still yield float32 arrays"""
+        result = decode_embedding([0.25, -0.5])
+
+        assert result.dtype == np.float32
+        assert result.tolist() == [0.25, -0.5]
+
+
 class TestGenerateEmbeddingsBatch:
     """Test cases for generate_embeddings_batch function"""
 
@@ -161,12 +198,13 @@ class TestGenerateEmbeddingsBatch:
         # Assert
         assert len(result) == 3
         assert all(len(emb) == 1536 for emb in result)
-        assert result[0] == [0.1] * 1536
-        assert result[1] == [0.2] * 1536
-        assert result[2] == [0.3] * 1536
+        assert result[0] == pytest.approx([0.1] * 1536)
+        assert result[1] == pytest.approx([0.2] * 1536)
+        assert result[2] == pytest.approx([0.3] * 1536)
         mock_client.embeddings.create.assert_called_once_with(
             model="text-embedding-3-small",
-            input=texts
+            input=texts,
+            encoding_format="base64"
         )
 
     @pytest.mark.asyncio
@@ -231,7 +269,8 @@ class TestGenerateEmbeddingsBatch:
         assert len(result) == 1
         mock_client.embeddings.create.assert_called_once_with(
             model="text-embedding-3-large",
-            input=["Test text"]
+            input=["Test text"],
+            encoding_format="base64"
         )
 
     @pytest.mark.asyncio
@@ -262,9 +301,9 @@ class TestGenerateEmbeddingsBatch:
         assert len(result) == 150
         assert all(len(emb) == 1536 for emb in result)
         # First 100 should have 0.1
-        assert all(emb == [0.1] * 1536 for emb in result[:100])
+        assert all(emb == pytest.approx([0.1] * 1536) for emb in result[:100])
         # Last 50 should have 0.2
-        assert all(emb == [0.2] * 1536 for emb in result[100:])
+        assert all(emb == pytest.approx([0.2] * 1536) for emb in result[100:])
         # Should be called twice (2 batches)
         assert mock_client.embeddings.create.call_count == 2
 
@@ -325,7 +364,7 @@ class TestGenerateEmbeddingsBatch:
         # Assert - embeddings should be in same order
         assert len(result) == 5
         for i in range(5):
-            assert result[i] == [float(i)] * 1536
+            assert result[i] == pytest.approx([float(i)] * 1536)
 
     @pytest.mark.asyncio
     @patch('app.services.embeddings.client')
@@ -350,3 +389,249 @@ class TestGenerateEmbeddingsBatch:
         # Assert
         assert len(result) == 2
         assert all(len(emb) == 1536 for emb in result)
+
+
+class TestEmbeddingCacheIntegration:
+    """Test cases for the cache path of the embedding functions"""
+
+    @pytest.mark.asyncio
+    @patch('app.services.embeddings.store_embeddings')
+    @patch('app.services.embeddings.lookup_embeddings')
+    @patch('app.services.embeddings.client')
+    async def test_generate_embedding_cache_hit(self, mock_client, mock_lookup, mock_store):
+        """Test that a cached embedding skips the API call"""
+        mock_lookup.return_value = [[0.9] * 1536]
+        mock_client.embeddings.create = AsyncMock()
+
+        result = await generate_embedding("Cached question", db=Mock())
+
+        assert result == [0.9] * 1536
+        assert not mock_client.embeddings.create.called
+        assert not mock_store.called
+
+    @pytest.mark.asyncio
+    @patch('app.services.embeddings.store_embeddings')
+    @patch('app.services.embeddings.lookup_embeddings')
+    @patch('app.services.embeddings.client')
+    async def test_generate_embeddings_batch_only_sends_misses(self, mock_client, mock_lookup, mock_store):
+        """Test that only uncached, deduplicated texts are sent and results keep input order"""
+        mock_lookup.return_value = [None, [0.5] * 1536, None, None]
+        mock_response = Mock()
+        mock_response.data = [Mock(embedding=[0.1] * 1536), Mock(embedding=[0.2] * 1536)]
+        mock_client.embeddings.create = AsyncMock(return_value=mock_response)
+
+        texts = ["Text A", "Cached text", "Text B", "Text  A"]
+        result = await generate_embeddings_batch(texts, db=Mock())
+
+        mock_client.embeddings.create.assert_called_once_with(
+            model="text-embedding-3-small",
+            input=["Text A", "Text B"],
+            encoding_format="base64"
+        )
+        assert result[0] == pytest.approx([0.1] * 1536)
+        assert result[1] == pytest.approx([0.5] * 1536)
+        assert result[2] == pytest.approx([0.2] * 1536)
+        assert result[3] == pytest.approx([0.1] * 1536)
+
+        stored_texts = mock_store.call_args[0][1]
+        assert stored_texts == ["Text A", "Text B"]
+
+    @pytest.mark.asyncio
+    @patch('app.services.embeddings.lookup_embeddings')
+    @patch('app.services.embeddings.client')
+    async def test_generate_embeddings_batch_cache_failure_falls_back_to_api(self, mock_client, mock_lookup):
+        """Test that an unavailable cache does not break embedding generation"""
+        mock_lookup.side_effect = Exception("cache table missing")
+        mock_response = Mock()
+        mock_response.data = [Mock(embedding=[0.3] * 1536)]
+        mock_client.embeddings.create = AsyncMock(return_value=mock_response)
+
+        with patch('app.services.embeddings.store_embeddings'):
+            result = await generate_embeddings_batch(["Text"], db=Mock())
+
+        assert len(result) == 1
+        assert result[0] == pytest.approx([0.3] * 1536)
+
+
+class TestConcurrentBatchDispatch:
+    """Test cases for the concurrent dispatch of embedding batches"""
+
+    @pytest.mark.asyncio
+    @patch('app.services.embeddings.client')
+    async def test_batches_run_concurrently_within_limit(self, mock_client):
+        """Test that batches overlap but never exceed the concurrency limit"""
+        running = 0
+        peak = 0
+
+        async def create(model, input, encoding_format):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return Mock(data=[Mock(embedding=[0.1] * 1536) for _ in input])
+
+        mock_client.embeddings.create = AsyncMock(side_effect=create)
+
+        with patch('app.services.embeddings.settings.EMBEDDING_MAX_CONCURRENCY', 3):
+            with patch('app.services.embeddings._controls_loop', None):
+                result = await generate_embeddings_batch([f"Text {i}" for i in range(20)], batch_size=2)
+
+        assert len(result) == 20
+        assert mock_client.embeddings.create.call_count == 10
+        assert 1 < peak <= 3
+
+    @pytest.mark.asyncio
+    @patch('app.services.embeddings.client')
+    async def test_results_keep_input_order_when_batches_finish_out_of_order(self, mock_client):
+        """Test that a batch completing last still lands at its position"""
+        async def create(model, input, encoding_format):
+            # The first batch is the slowest
+            await asyncio.sleep(0.03 if input[0] == "Text 0" else 0)
+            return Mock(data=[Mock(embedding=[float(text.split()[1])] * 1536) for text in input])
+
+        mock_client.embeddings.create = AsyncMock(side_effect=create)
+
+        texts = [f"Text {i}" for i in range(6)]
+        result = await generate_embeddings_batch(texts, batch_size=2)
+
+        for i in range(6):
+            assert result[i] == pytest.approx([float(i)] * 1536)
+
+    @pytest.mark.asyncio
+    @patch('app.services.resilience.asyncio.sleep', new_callable=AsyncMock)
+    @patch('app.services.embeddings.client')
+    async def test_rate_limit_reduces_concurrency_and_retries(self, mock_client, mock_sleep):
+        """Test that a 429 is reported to the limiter and the batch is retried"""
+        request = httpx.Request("POST", "https://api.example.com/v1/embeddings")
+        mock_client.embeddings.create = AsyncMock(side_effect=[
+            RateLimitError("Rate limit reached", response=httpx.Response(429, request=request), body=None),
+            Mock(data=[Mock(embedding=[0.1] * 1536), Mock(embedding=[0.2] * 1536)])
+        ])
+
+        from app.services.embeddings import get_embedding_limiter
+        limiter = get_embedding_limiter()
+        limiter.limit = 8.0
+        limiter._last_decrease = 0.0
+
+        result = await generate_embeddings_batch(["Text 1", "Text 2"])
+
+        assert len(result) == 2
+        assert result[0] == pytest.approx([0.1] * 1536)
+        assert result[1] == pytest.approx([0.2] * 1536)
+        assert mock_client.embeddings.create.call_count == 2
+        assert mock_sleep.called
+        assert limiter.limit < 8.0
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    @patch('app.services.resilience.asyncio.sleep', new_callable=AsyncMock)
+    @patch('app.services.embeddings.store_embeddings')
+    @patch('app.services.embeddings.lookup_embeddings')
+    @patch('app.services.embeddings.client')
+    async def test_completed_batches_are_cached_when_another_fails(
+        self, mock_client, mock_lookup, mock_store, mock_sleep
+    ):
+        """Test that batches completed before a failure are kept for the next attempt"""
+        mock_lookup.return_value = [None] * 4
+
+        async def create(model, input, encoding_format):
+            if input[0] == "Text 2":
+                raise Exception("Invalid input")
+            return Mock(data=[Mock(embedding=[0.1] * 1536) for _ in input])
+
+        mock_client.embeddings.create = AsyncMock(side_effect=create)
+
+        with pytest.raises(Exception, match="Failed to generate batch embeddings: Invalid input"):
+            await generate_embeddings_batch([f"Text {i}" for i in range(4)], batch_size=2, db=Mock())
+
+        mock_store.assert_called_once()
+        assert mock_store.call_args[0][1] == ["Text 0", "Text 1"]
+
+
+class TestTokenBudgetPacking:
+    """Test cases for token-aware batch packing"""
+
+    def test_pack_batches_respects_item_limit(self):
+        """Test that short texts are packed up to max_items"""
+        texts = [f"Text {i}" for i in range(250)]
+
+        batches = pack_batches(texts, max_items=100, max_tokens=100000)
+
+        assert [len(batch) for batch in batches] == [100, 100, 50]
+
+    def test_pack_batches_respects_token_limit(self):
+        """Test that long texts close a batch before the token budget is exceeded"""
+        long_text = "x" * 2997  # 1000 estimated tokens
+        texts = [long_text] * 5
+
+        batches = pack_batches(texts, max_items=100, max_tokens=2500)
+
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+
+    def test_pack_batches_oversized_text_alone(self):
+        """Test that a text above the budget gets its own batch"""
+        texts = ["short", "y" * 30000, "short again"]
+
+        batches = pack_batches(texts, max_items=100, max_tokens=1000)
+
+        assert batches == [["short"], ["y" * 30000], ["short again"]]
+
+    def test_pack_batches_keeps_order(self):
+        """Test that the concatenation of batches is the input"""
+        texts = [("z" * (i * 100)) + str(i) for i in range(40)]
+
+        batches = pack_batches(texts, max_items=7, max_tokens=3000)
+
+        assert [text for batch in batches for text in batch] == texts
+
+    @pytest.mark.asyncio
+    @patch('app.services.embeddings.client')
+    async def test_too_large_batch_is_split_and_retried(self, mock_client):
+        """Test that a batch rejected as too large is split in halves"""
+        request = httpx.Request("POST", "https://api.example.com/v1/embeddings")
+
+        async def create(model, input, encoding_format):
+            if len(input) > 2:
+                raise BadRequestError(
+                    "Requested 400000 tokens, max 300000 tokens per request: request too large",
+                    response=httpx.Response(400, request=request), body=None
+                )
+            return Mock(data=[Mock(embedding=[float(text.split()[1])] * 1536) for text in input])
+
+        mock_client.embeddings.create = AsyncMock(side_effect=create)
+
+        texts = [f"Text {i}" for i in range(5)]
+        result = await generate_embeddings_batch(texts)
+
+        for i in range(5):
+            assert result[i] == pytest.approx([float(i)] * 1536)
+
+    @pytest.mark.asyncio
+    @patch('app.services.embeddings.client')
+    async def test_other_bad_request_is_not_split(self, mock_client):
+        """Test that unrelated 400 errors fail without retries"""
+        request = httpx.Request("POST", "https://api.example.com/v1/embeddings")
+        mock_client.embeddings.create = AsyncMock(side_effect=BadRequestError(
+            "Invalid model", response=httpx.Response(400, request=request), body=None
+        ))
+
+        with pytest.raises(Exception, match="Failed to generate batch embeddings"):
+            await generate_embeddings_batch(["Text 1", "Text 2"])
+
+        assert mock_client.embeddings.create.call_count == 1
+
+    @pytest.mark.asyncio
+    @patch('app.services.embeddings.client')
+    async def test_batches_take_tokens_from_budget(self, mock_client):
+        """Test that each request takes its estimated tokens from the per-minute budget"""
+        mock_client.embeddings.create = AsyncMock(
+            return_value=Mock(data=[Mock(embedding=[0.1] * 1536)])
+        )
+
+        from app.services.embeddings import get_token_bucket
+        bucket = get_token_bucket()
+        with patch.object(bucket, 'acquire', new_callable=AsyncMock) as mock_acquire:
+            await generate_embeddings_batch(["x" * 299])
+
+        mock_acquire.assert_called_once_with(100)
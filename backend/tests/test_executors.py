@@ -0,0 +1,47 @@
+"""
+Unit tests for the executor layer
+"""
+import os
+import threading
+import pytest
+from app.executors import run_blocking_io, run_cpu_bound, shutdown_executors
+
+
+class TestExecutors:
+    """Test cases for run_blocking_io and run_cpu_bound"""
+
+    @pytest.fixture(autouse=True)
+    def shutdown_pools(self):
+        yield
+        shutdown_executors()
+
+    @pytest.mark.asyncio
+    async def test_run_blocking_io_runs_in_worker_thread(self):
+        """Test that blocking calls do not run on the event loop thread"""
+        thread_name = await run_blocking_io(lambda: threading.current_thread().name)
+
+        assert thread_name != threading.current_thread().name
+        assert thread_name.startswith("paperchat-io")
+
+    @pytest.mark.asyncio
+    async def test_run_blocking_io_passes_arguments(self):
+        """Test that positional and keyword arguments are forwarded"""
+        result = await run_blocking_io(lambda a, b=0: a + b, 2, b=3)
+
+        assert result == 5
+
+    @pytest.mark.asyncio
+    async def test_run_blocking_io_propagates_exceptions(self):
+        """Test that exceptions raised in the pool reach the caller"""
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            await run_blocking_io(fail)
+
+    @pytest.mark.asyncio
+    async def test_run_cpu_bound_runs_in_worker_process(self):
+        """Test that CPU-bound calls run in another process"""
+        pid = await run_cpu_bound(os.getpid)
+
+        assert pid != os.getpid()
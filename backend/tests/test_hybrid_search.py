@@ -0,0 +1,176 @@
+"""
+Unit tests for hybrid (full-text + vector) retrieval
+"""
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+from sqlalchemy.dialects import postgresql
+from app.services.hybrid_search import any_term_tsquery, hybrid_search, lexical_search, reciprocal_rank_fusion, RRF_K
+
+
+def chunk(chunk_id, similarity=0.5):
+    return {
+        "chunk_id": chunk_id,
+        "content": f"Chunk {chunk_id}",
+        "section_name": None,
+        "paper_id": 1,
+        "paper_title": "Paper",
+        "authors": [],
+        "year": 2024,
+        "similarity_score": similarity
+    }
+
+
+class TestReciprocalRankFusion:
+    """Test cases for reciprocal_rank_fusion"""
+
+    def test_scores(self):
+        """Test the 1 / (k + rank) sum over rankings"""
+        fused = reciprocal_rank_fusion([[chunk(1), chunk(2)], [chunk(2), chunk(3)]])
+
+        scores = {c["chunk_id"]: c["rrf_score"] for c in fused}
+        assert scores[2] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+        assert scores[1] == pytest.approx(1 / (RRF_K + 1))
+        assert scores[3] == pytest.approx(1 / (RRF_K + 2))
+        # Found by both legs: ranked first
+        assert [c["chunk_id"] for c in fused] == [2, 1, 3]
+
+    def test_lexical_only_match_is_kept(self):
+        """Test that an exact-term match missed by the vector leg still surfaces"""
+        vector = [chunk(i) for i in range(1, 6)]
+        lexical = [chunk(99)]
+
+        fused = reciprocal_rank_fusion([vector, lexical])
+
+        assert fused[0]["chunk_id"] in (1, 99)
+        assert 99 in [c["chunk_id"] for c in fused[:2]]
+
+    def test_empty_rankings(self):
+        """Test fusion of empty legs"""
+        assert reciprocal_rank_fusion([[], []]) == []
+
+
+class TestLexicalSearch:
+    """Test cases for lexical_search"""
+
+    @pytest.mark.asyncio
+    async def test_query(self):
+        """Test the full-text query and result format"""
+        row = Mock(id=5, content="BRCA1 expression", section_name="Results", paper_id=2,
+                   title="Genes", authors=["A"], year=2021, distance=0.4, rank=0.8)
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.fetchall.return_value = [row]
+
+        results = await lexical_search(db, "BRCA1", [0.1] * 1536, top_k=10, paper_ids=[2])
+
+        sql = str(db.execute.call_args[0][0])
+        assert "plainto_tsquery" in sql
+        assert "@@" in sql
+        assert "ts_rank_cd" in sql
+        assert "paper_id IN" in sql
+        # The distance is only computed for the ranked top_k rows
+        ranked_sql = sql[sql.index("FROM (SELECT"):sql.index(") AS ranked")]
+        assert "<=>" not in ranked_sql
+        assert "LIMIT" in ranked_sql
+        assert results[0]["chunk_id"] == 5
+        assert results[0]["similarity_score"] == pytest.approx(0.6)
+
+    @pytest.mark.asyncio
+    async def test_chunk_without_embedding(self):
+        """Test that a lexical match without embedding gets a zero similarity"""
+        row = Mock(id=5, content="x", section_name=None, paper_id=2,
+                   title="T", authors=[], year=None, distance=None, rank=0.1)
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.fetchall.return_value = [row]
+
+        assert (await lexical_search(db, "x", [0.1] * 1536, top_k=1))[0]["similarity_score"] == 0.0
+
+
+class TestAnyTermTsquery:
+    """Test cases for any_term_tsquery"""
+
+    def test_terms_are_ored(self):
+        """Test that the lexemes of plainto_tsquery are joined with OR"""
+        compiled = any_term_tsquery("BRCA1 expression in tumors").compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+
+        assert sql.startswith("CAST(replace(CAST(plainto_tsquery(")
+        assert sql.endswith("AS TSQUERY)")
+        assert list(compiled.params.values())[1:] == ["BRCA1 expression in tumors", " & ", " | "]
+
+
+class TestHybridSearch:
+    """Test cases for hybrid_search"""
+
+    @pytest.mark.asyncio
+    @patch('app.services.hybrid_search._lexical_search_in_session', new_callable=AsyncMock)
+    @patch('app.services.hybrid_search.vector_search', new_callable=AsyncMock)
+    async def test_fuses_both_legs(self, mock_vector_search, mock_lexical):
+        """Test candidate counts, fusion and per-leg timings"""
+        mock_vector_search.return_value = [chunk(1), chunk(2), chunk(3)]
+        mock_lexical.return_value = [chunk(3), chunk(4)]
+        db = Mock()
+
+        with patch('app.services.hybrid_search.settings.HYBRID_CANDIDATES_MULTIPLIER', 4):
+            results, stats = await hybrid_search(db, "gene BRCA1", [0.1] * 1536, top_k=2, paper_ids=[1])
+
+        assert [r["chunk_id"] for r in results] == [3, 1]
+        assert mock_vector_search.call_args[1]["top_k"] == 8
+        assert mock_vector_search.call_args[1]["paper_ids"] == [1]
+        assert mock_lexical.call_args[0] == (db, "gene BRCA1", [0.1] * 1536, 8, [1])
+        assert stats["lexical_candidates"] == 2
+        assert stats["vector_candidates"] == 3
+        assert stats["lexical_ms"] >= 0 and stats["vector_ms"] >= 0
+
+
+class TestRagSearchMode:
+    """Test cases for the search mode of the RAG pipeline"""
+
+    @pytest.mark.asyncio
+    @patch('app.services.rag.hybrid_search', new_callable=AsyncMock)
+    @patch('app.services.rag.vector_search', new_callable=AsyncMock)
+    @patch('app.services.rag.generate_embedding', new_callable=AsyncMock)
+    @patch('app.services.rag.client')
+    async def test_hybrid_mode(self, mock_client, mock_generate_embedding, mock_vector_search, mock_hybrid_search):
+        """Test that search_mode="hybrid" retrieves with hybrid_search"""
+        mock_generate_embedding.return_value = [0.1] * 1536
+        mock_hybrid_search.return_value = ([{**chunk(1), "rrf_score": 0.03}], {})
+        mock_response = Mock()
+        mock_response.choices = [Mock(message=Mock(content="Answer"))]
+        mock_response.usage = Mock(prompt_tokens=10, completion_tokens=5)
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+        from app.services.rag import generate_rag_answer_with_context
+
+        with patch('app.services.rag.settings.HYBRID_SEARCH_ENABLED', True):
+            result = await generate_rag_answer_with_context(
+                db=AsyncMock(), question="BRCA1?", search_mode="hybrid"
+            )
+
+        assert mock_hybrid_search.call_args[1]["query_text"] == "BRCA1?"
+        assert not mock_vector_search.called
+        assert len(result["sources"]) == 1
+
+    @pytest.mark.asyncio
+    @patch('app.services.rag.hybrid_search', new_callable=AsyncMock)
+    @patch('app.services.rag.generate_embedding', new_callable=AsyncMock)
+    async def test_hybrid_mode_not_enabled(self, mock_generate_embedding, mock_hybrid_search):
+        """Test that hybrid search is refused when chunks.search_vector was not added"""
+        mock_generate_embedding.return_value = [0.1] * 1536
+
+        from app.services.rag import generate_rag_answer_with_context
+
+        with patch('app.services.rag.settings.HYBRID_SEARCH_ENABLED', False):
+            with pytest.raises(ValueError, match="HYBRID_SEARCH_ENABLED"):
+                await generate_rag_answer_with_context(db=AsyncMock(), question="BRCA1?", search_mode="hybrid")
+
+        assert not mock_hybrid_search.called
+
+    def test_search_vector_not_created_with_the_table(self):
+        """Test that create_all leaves the generated column to the gated migration"""
+        from sqlalchemy import select
+        from app.models import Chunk
+
+        assert "search_vector" not in Chunk.__table__.c
+        assert "chunks.search_vector @@" in str(select(Chunk.id).where(Chunk.search_vector.op("@@")("x")))
@@ -0,0 +1,317 @@
+"""
+Unit tests for the paper ingestion pipeline
+"""
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+
+
+class TestIngestPdf:
+    """Test cases for ingest_pdf function"""
+
+    @pytest.fixture(autouse=True)
+    def inline_cpu_pool(self):
+        """Run CPU-bound steps inline (mocks cannot be pickled to the process pool)"""
+        async def run_inline(func, *args, **kwargs):
+            return func(*args, **kwargs)
+
+        with patch('app.services.ingestion.run_cpu_bound', side_effect=run_inline):
+            yield
+
+    @pytest.fixture
+    def mock_db(self):
+        """Mock database session"""
+        db = Mock()
+        db.add = Mock()
+        db.flush = Mock()
+        db.commit = Mock()
+        db.refresh = Mock()
+        db.rollback = Mock()
+        return db
+
+    @pytest.fixture
+    def sample_metadata(self):
+        """Sample metadata extracted from PDF"""
+        return {
+            "title": "Machine Learning in Healthcare",
+            "authors": ["John Doe", "Jane Smith"],
+            "year": 2023,
+            "abstract": "This paper explores machine learning applications in healthcare.",
+            "keywords": ["machine learning", "healthcare", "AI"],
+            "sections": {
+                "Introduction": 0,
+                "Methods": 500,
+                "Results": 1000,
+                "Conclusion": 1500
+            }
+        }
+
+    @pytest.fixture
+    def sample_chunks(self):
+        """Sample chunks from chunker"""
+        return [
+            {"content": "Introduction text here.", "section_name": "Introduction", "chunk_index": 0},
+            {"content": "Methods description here.", "section_name": "Methods", "chunk_index": 1},
+            {"content": "Results analysis here.", "section_name": "Results", "chunk_index": 2},
+            {"content": "Conclusion summary here.", "section_name": "Conclusion", "chunk_index": 3}
+        ]
+
+    @pytest.fixture
+    def sample_embeddings(self):
+        """Sample embeddings for chunks"""
+        return [
+            [0.1] * 1536,
+            [0.2] * 1536,
+            [0.3] * 1536,
+            [0.4] * 1536
+        ]
+
+    @pytest.mark.asyncio
+    @patch('app.services.ingestion.generate_embeddings_batch', new_callable=AsyncMock)
+    @patch('app.services.ingestion.chunk_text')
+    @patch('app.services.ingestion.extract_metadata_from_text', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_text_from_pdf')
+    async def test_ingest_pdf_success(
+        self,
+        mock_extract_text,
+        mock_extract_metadata,
+        mock_chunk_text,
+        mock_generate_embeddings,
+        mock_db,
+        sample_metadata,
+        sample_chunks,
+        sample_embeddings
+    ):
+        """Test successful paper processing"""
+        # Setup mocks
+        mock_extract_text.return_value = "Full text content from PDF..."
+        mock_extract_metadata.return_value = sample_metadata
+        mock_chunk_text.return_value = sample_chunks
+        mock_generate_embeddings.return_value = sample_embeddings
+
+        mock_paper = Mock()
+        mock_paper.id = 1
+
+        from app.services.ingestion import ingest_pdf
+
+        with patch('app.services.ingestion.models.Paper', return_value=mock_paper):
+            with patch('app.services.ingestion.bulk_insert_chunks'):
+                # Execute
+                result = await ingest_pdf(mock_db, "uploads/test_paper.pdf", "test_paper.pdf")
+
+                # Assert - verify all services were called
+                assert result is mock_paper
+                mock_extract_text.assert_called_once_with("uploads/test_paper.pdf")
+                assert mock_extract_metadata.called
+                mock_chunk_text.assert_called_once()
+                mock_generate_embeddings.assert_called_once()
+
+                # Assert - verify database operations
+                assert mock_db.add.called
+                assert mock_db.flush.called
+                assert mock_db.commit.called
+
+    @pytest.mark.asyncio
+    @patch('app.services.ingestion.extract_metadata_from_text', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_text_from_pdf')
+    async def test_ingest_pdf_empty_pdf(
+        self,
+        mock_extract_text,
+        mock_extract_metadata,
+        mock_db
+    ):
+        """Test handling of PDF with no extractable text"""
+        # Setup - PDF with no text
+        mock_extract_text.return_value = ""
+
+        from app.services.ingestion import ingest_pdf
+
+        # Execute & Assert
+        with pytest.raises(ValueError, match="No text could be extracted"):
+            await ingest_pdf(mock_db, "uploads/empty.pdf", "empty.pdf")
+
+        assert not mock_extract_metadata.called
+        assert not mock_db.add.called
+
+    @pytest.mark.asyncio
+    @patch('app.services.ingestion.chunk_text')
+    @patch('app.services.ingestion.extract_metadata_from_text', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_text_from_pdf')
+    async def test_ingest_pdf_no_chunks(
+        self,
+        mock_extract_text,
+        mock_extract_metadata,
+        mock_chunk_text,
+        mock_db,
+        sample_metadata
+    ):
+        """Test handling when chunking fails"""
+        # Setup
+        mock_extract_text.return_value = "Some text"
+        mock_extract_metadata.return_value = sample_metadata
+        mock_chunk_text.return_value = []  # No chunks created
+
+        from app.services.ingestion import ingest_pdf
+
+        # Execute & Assert
+        with pytest.raises(ValueError, match="Could not create chunks"):
+            await ingest_pdf(mock_db, "uploads/test_paper.pdf", "test_paper.pdf")
+
+    @pytest.mark.asyncio
+    @patch('app.services.ingestion.generate_embeddings_batch', new_callable=AsyncMock)
+    @patch('app.services.ingestion.chunk_text')
+    @patch('app.services.ingestion.extract_metadata_from_text', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_text_from_pdf')
+    async def test_ingest_pdf_embedding_failure(
+        self,
+        mock_extract_text,
+        mock_extract_metadata,
+        mock_chunk_text,
+        mock_generate_embeddings,
+        mock_db,
+        sample_metadata,
+        sample_chunks
+    ):
+        """Test handling of embedding generation failure"""
+        # Setup
+        mock_extract_text.return_value = "Some text"
+        mock_extract_metadata.return_value = sample_metadata
+        mock_chunk_text.return_value = sample_chunks
+        mock_generate_embeddings.side_effect = Exception("API rate limit exceeded")
+
+        from app.services.ingestion import ingest_pdf
+
+        # Execute & Assert - not a ValueError, so the worker will retry it
+        with pytest.raises(Exception, match="API rate limit exceeded"):
+            await ingest_pdf(mock_db, "uploads/test_paper.pdf", "test_paper.pdf")
+
+        assert not mock_db.commit.called
+
+    @pytest.mark.asyncio
+    @patch('app.services.ingestion.generate_embeddings_batch', new_callable=AsyncMock)
+    @patch('app.services.ingestion.chunk_text')
+    @patch('app.services.ingestion.extract_metadata_from_text', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_text_from_pdf')
+    async def test_ingest_pdf_database_failure_rolls_back(
+        self,
+        mock_extract_text,
+        mock_extract_metadata,
+        mock_chunk_text,
+        mock_generate_embeddings,
+        mock_db,
+        sample_metadata,
+        sample_chunks,
+        sample_embeddings
+    ):
+        """Test that a failed database write is rolled back"""
+        mock_extract_text.return_value = "Some text"
+        mock_extract_metadata.return_value = sample_metadata
+        mock_chunk_text.return_value = sample_chunks
+        mock_generate_embeddings.return_value = sample_embeddings
+        mock_db.commit.side_effect = Exception("connection lost")
+
+        from app.services.ingestion import ingest_pdf
+
+        with patch('app.services.ingestion.models.Paper'):
+            with patch('app.services.ingestion.bulk_insert_chunks'):
+                with pytest.raises(Exception, match="connection lost"):
+                    await ingest_pdf(mock_db, "uploads/test_paper.pdf", "test_paper.pdf")
+
+        assert mock_db.rollback.called
+
+    @pytest.mark.asyncio
+    @patch('app.services.ingestion.generate_embeddings_batch', new_callable=AsyncMock)
+    @patch('app.services.ingestion.chunk_text')
+    @patch('app.services.ingestion.extract_metadata_from_text', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_text_from_pdf')
+    async def test_ingest_pdf_minimal_metadata(
+        self,
+        mock_extract_text,
+        mock_extract_metadata,
+        mock_chunk_text,
+        mock_generate_embeddings,
+        mock_db,
+        sample_chunks
+    ):
+        """Test ingestion with minimal metadata (no title): filename is used"""
+        mock_extract_text.return_value = "Some text content"
+        mock_extract_metadata.return_value = {}
+        mock_chunk_text.return_value = sample_chunks
+        mock_generate_embeddings.return_value = [[0.1] * 1536] * len(sample_chunks)
+
+        from app.services.ingestion import ingest_pdf
+
+        with patch('app.services.ingestion.models.Paper') as mock_paper_class:
+            with patch('app.services.ingestion.bulk_insert_chunks'):
+                await ingest_pdf(mock_db, "uploads/test_paper.pdf", "test_paper.pdf")
+
+        kwargs = mock_paper_class.call_args[1]
+        assert kwargs["title"] == "test_paper.pdf"
+        assert kwargs["authors"] == []
+        assert kwargs["keywords"] == []
+        assert kwargs["year"] is None
+        assert mock_db.commit.called
+
+    @pytest.mark.asyncio
+    @patch('app.services.ingestion.generate_embeddings_batch', new_callable=AsyncMock)
+    @patch('app.services.ingestion.chunk_text')
+    @patch('app.services.ingestion.extract_metadata_from_text', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_text_from_pdf')
+    async def test_ingest_pdf_creates_correct_number_of_chunks(
+        self,
+        mock_extract_text,
+        mock_extract_metadata,
+        mock_chunk_text,
+        mock_generate_embeddings,
+        mock_db,
+        sample_metadata,
+        sample_chunks,
+        sample_embeddings
+    ):
+        """Test that all chunks are saved to database"""
+        # Setup
+        mock_extract_text.return_value = "Full text"
+        mock_extract_metadata.return_value = sample_metadata
+        mock_chunk_text.return_value = sample_chunks
+        mock_generate_embeddings.return_value = sample_embeddings
+
+        mock_paper = Mock()
+        mock_paper.id = 1
+
+        from app.services.ingestion import ingest_pdf
+
+        with patch('app.services.ingestion.models.Paper', return_value=mock_paper) as mock_paper_class:
+            with patch('app.services.ingestion.bulk_insert_chunks') as mock_bulk_insert:
+                # Execute
+                await ingest_pdf(mock_db, "uploads/test_paper.pdf", "test_paper.pdf")
+
+                # Assert - all chunks written in one bulk insert for the paper, and counted on it
+                mock_bulk_insert.assert_called_once_with(mock_db, 1, sample_chunks, sample_embeddings)
+                assert mock_paper_class.call_args.kwargs["nb_chunks"] == len(sample_chunks)
+                # Only the paper goes through the ORM
+                mock_db.add.assert_called_once_with(mock_paper)
+
+    @pytest.mark.asyncio
+    @patch('app.services.ingestion.generate_embeddings_batch', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_metadata_from_text', new_callable=AsyncMock)
+    @patch('app.services.ingestion.extract_text_from_pdf')
+    async def test_ingest_pdf_already_indexed(
+        self,
+        mock_extract_text,
+        mock_extract_metadata,
+        mock_generate_embeddings,
+        mock_db
+    ):
+        """Test that a file with a known content hash skips the whole pipeline"""
+        existing_paper = Mock()
+        existing_paper.id = 9
+        mock_db.query.return_value.filter.return_value.first.return_value = existing_paper
+
+        from app.services.ingestion import ingest_pdf
+
+        result = await ingest_pdf(mock_db, "uploads/dup.pdf", "dup.pdf", content_hash="abc123")
+
+        assert result is existing_paper
+        assert not mock_extract_text.called
+        assert not mock_extract_metadata.called
+        assert not mock_generate_embeddings.called
+        assert not mock_db.add.called
@@ -0,0 +1,200 @@
+"""
+Unit tests for the ingestion job queue
+"""
+import pytest
+from unittest.mock import Mock, patch
+from sqlalchemy.dialects import postgresql
+from app.services.job_queue import claim_next_job, complete_job, fail_job, renew_lease, retry_job, submit_upload
+
+
+class TestJobQueue:
+    """Test cases for job state transitions"""
+
+    @pytest.fixture
+    def mock_db(self):
+        """Mock database session, the job is held by the updating worker"""
+        db = Mock()
+        db.query.return_value.filter.return_value.update.return_value = 1
+        return db
+
+    @pytest.fixture
+    def running_job(self):
+        """Job claimed by a worker, first attempt"""
+        job = Mock()
+        job.status = "running"
+        job.attempts = 1
+        job.max_attempts = 3
+        job.error = None
+        job.paper_id = None
+        return job
+
+    @staticmethod
+    def written_values(mock_db):
+        update = mock_db.query.return_value.filter.return_value.update
+        return {column.key: value for column, value in update.call_args[0][0].items()}
+
+    def test_complete_job(self, mock_db, running_job):
+        """Test that a completed job is linked to its paper"""
+        assert complete_job(mock_db, running_job, "host:1", paper_id=7)
+
+        values = self.written_values(mock_db)
+        assert values["status"] == "done"
+        assert values["paper_id"] == 7
+        assert values["locked_at"] is None
+        assert "pdf_path" not in values
+        mock_db.commit.assert_called_once()
+
+    def test_result_only_written_by_lease_holder(self, mock_db, running_job):
+        """Test that the job is only updated while it runs on the same worker"""
+        mock_db.query.return_value.filter.return_value.update.return_value = 0
+
+        assert not complete_job(mock_db, running_job, "host:1", paper_id=7)
+        assert not fail_job(mock_db, running_job, "host:1", "API timeout")
+
+        criteria = " AND ".join(
+            str(c.compile(dialect=postgresql.dialect()))
+            for c in mock_db.query.return_value.filter.call_args[0]
+        )
+        assert "ingestion_jobs.status = " in criteria
+        assert "ingestion_jobs.worker_id = " in criteria
+
+    def test_fail_job_schedules_retry(self, mock_db, running_job):
+        """Test that a transient failure puts the job back in the queue"""
+        fail_job(mock_db, running_job, "host:1", "API timeout")
+
+        values = self.written_values(mock_db)
+        assert values["status"] == "pending"
+        assert values["error"] == "API timeout"
+        assert values["locked_at"] is None
+        mock_db.commit.assert_called_once()
+
+    def test_fail_job_last_attempt(self, mock_db, running_job):
+        """Test that a job is failed once its attempts are exhausted"""
+        running_job.attempts = 3
+
+        fail_job(mock_db, running_job, "host:1", "API timeout")
+
+        values = self.written_values(mock_db)
+        assert values["status"] == "failed"
+        assert values["error"] == "API timeout"
+
+    def test_fail_job_not_retryable(self, mock_db, running_job):
+        """Test that permanent failures are not retried"""
+        fail_job(mock_db, running_job, "host:1", "No text could be extracted from the PDF", retryable=False)
+
+        assert self.written_values(mock_db)["status"] == "failed"
+
+    def test_retry_job_resets_attempts(self, mock_db, running_job):
+        """Test that retrying a failed job gives it a fresh attempt budget"""
+        running_job.status = "failed"
+        running_job.attempts = 3
+        running_job.error = "API timeout"
+
+        result = retry_job(mock_db, running_job)
+
+        assert result is running_job
+        assert running_job.status == "pending"
+        assert running_job.attempts == 0
+        assert running_job.error is None
+        mock_db.commit.assert_called_once()
+
+    def test_retry_job_rejects_non_failed_job(self, mock_db, running_job):
+        """Test that only failed jobs can be retried"""
+        with pytest.raises(ValueError, match="Only failed jobs can be retried"):
+            retry_job(mock_db, running_job)
+
+        assert not mock_db.commit.called
+
+
+class TestLeases:
+    """Test cases for claiming stale jobs and renewing leases"""
+
+    @staticmethod
+    def compile(criteria):
+        return " AND ".join(str(c.compile(dialect=postgresql.dialect())) for c in criteria)
+
+    def test_claim_fails_exhausted_stale_jobs(self):
+        """Test that stale jobs are only reclaimed while attempts remain"""
+        db = Mock()
+        query = db.query.return_value
+        query.filter.return_value.order_by.return_value.with_for_update.return_value.first.return_value = None
+
+        assert claim_next_job(db, "host:1") is None
+
+        exhausted_filter, claim_filter = query.filter.call_args_list
+        assert "ingestion_jobs.attempts >= ingestion_jobs.max_attempts" in self.compile(exhausted_filter[0])
+        values = query.filter.return_value.update.call_args[0][0]
+        assert {column.key: value for column, value in values.items()}["status"] == "failed"
+        assert "ingestion_jobs.attempts < ingestion_jobs.max_attempts" in self.compile(claim_filter[0])
+
+    def test_renew_lease(self):
+        """Test that only the worker running the job renews its lease"""
+        db = Mock()
+        db.query.return_value.filter.return_value.update.return_value = 1
+
+        assert renew_lease(db, 4, "host:1")
+
+        criteria = self.compile(db.query.return_value.filter.call_args[0])
+        assert "ingestion_jobs.worker_id" in criteria
+        assert "ingestion_jobs.status" in criteria
+        db.commit.assert_called_once()
+
+    def test_renew_lease_lost(self):
+        """Test that a job reclaimed or finished meanwhile is reported"""
+        db = Mock()
+        db.query.return_value.filter.return_value.update.return_value = 0
+
+        assert not renew_lease(db, 4, "host:1")
+
+
+class TestSubmitUpload:
+    """Test cases for content-hash deduplication of uploads"""
+
+    def _mock_db(self, existing_paper=None, active_job=None):
+        db = Mock()
+        paper_query = Mock()
+        paper_query.filter.return_value.first.return_value = existing_paper
+        job_query = Mock()
+        job_query.filter.return_value.order_by.return_value.first.return_value = active_job
+        db.query.side_effect = lambda model: paper_query if model.__name__ == "Paper" else job_query
+        return db
+
+    @patch('app.services.job_queue.IngestionJob')
+    def test_submit_upload_links_existing_paper(self, mock_job_class):
+        """Test that an already indexed file yields a done job linked to the paper"""
+        paper = Mock()
+        paper.id = 3
+        paper.pdf_path = "uploads/original.pdf"
+        mock_job_class.__name__ = "IngestionJob"
+        db = self._mock_db(existing_paper=paper)
+
+        job, is_duplicate = submit_upload(db, "copy.pdf", "uploads/copy.pdf", "abc123")
+
+        assert is_duplicate
+        kwargs = mock_job_class.call_args[1]
+        assert kwargs["status"] == "done"
+        assert kwargs["paper_id"] == 3
+        assert kwargs["pdf_path"] == "uploads/original.pdf"
+        db.commit.assert_called_once()
+
+    def test_submit_upload_returns_active_job(self):
+        """Test that a file already in the queue is not queued twice"""
+        active_job = Mock()
+        db = self._mock_db(active_job=active_job)
+
+        job, is_duplicate = submit_upload(db, "copy.pdf", "uploads/copy.pdf", "abc123")
+
+        assert job is active_job
+        assert is_duplicate
+        assert not db.add.called
+
+    @patch('app.services.job_queue.enqueue_job')
+    def test_submit_upload_new_file(self, mock_enqueue_job):
+        """Test that a new file is queued"""
+        db = self._mock_db()
+
+        job, is_duplicate = submit_upload(db, "new.pdf", "uploads/new.pdf", "abc123")
+
+        assert not is_duplicate
+        assert job is mock_enqueue_job.return_value
+        mock_enqueue_job.assert_called_once_with(db, "new.pdf", "uploads/new.pdf", "abc123")
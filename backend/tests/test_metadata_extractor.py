@@ -11,8 +11,8 @@ class TestExtractMetadataFromText:
     """Test cases for extract_metadata_from_text function"""
 
     @pytest.mark.asyncio
-    @patch('app.services.metadata_extractor.AsyncOpenAI')
-    async def test_extract_metadata_success(self, mock_openai):
+    @patch('app.services.metadata_extractor.get_openai_client')
+    async def test_extract_metadata_success(self, mock_get_client):
         """Test successful metadata extraction"""
         # Setup mock response
         mock_response = {
@@ -34,7 +34,7 @@ class TestExtractMetadataFromText:
 
         mock_client = MagicMock()
         mock_client.chat.completions.create = AsyncMock(return_value=mock_completion)
-        mock_openai.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         # Execute
         text = "Deep Learning for Computer Vision\nAuthors: John Doe, Jane Smith\nYear: 2023"
@@ -49,8 +49,8 @@ class TestExtractMetadataFromText:
         assert "deep learning" in result["keywords"]
 
     @pytest.mark.asyncio
-    @patch('app.services.metadata_extractor.AsyncOpenAI')
-    async def test_extract_metadata_with_markdown_code_blocks(self, mock_openai):
+    @patch('app.services.metadata_extractor.get_openai_client')
+    async def test_extract_metadata_with_markdown_code_blocks(self, mock_get_client):
         """Test extraction when API returns JSON wrapped in markdown code blocks"""
         # Setup mock response with markdown code blocks
         mock_response = {
@@ -72,7 +72,7 @@ class TestExtractMetadataFromText:
 
         mock_client = MagicMock()
         mock_client.chat.completions.create = AsyncMock(return_value=mock_completion)
-        mock_openai.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         # Execute
         result = await extract_metadata_from_text("Some paper text")
@@ -83,8 +83,8 @@ class TestExtractMetadataFromText:
         assert result["year"] == 2024
 
     @pytest.mark.asyncio
-    @patch('app.services.metadata_extractor.AsyncOpenAI')
-    async def test_extract_metadata_partial_data(self, mock_openai):
+    @patch('app.services.metadata_extractor.get_openai_client')
+    async def test_extract_metadata_partial_data(self, mock_get_client):
         """Test extraction when some metadata fields are missing"""
         # Setup mock response with partial data
         mock_response = {
@@ -106,7 +106,7 @@ class TestExtractMetadataFromText:
 
         mock_client = MagicMock()
         mock_client.chat.completions.create = AsyncMock(return_value=mock_completion)
-        mock_openai.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         # Execute
         result = await extract_metadata_from_text("Incomplete paper text")
@@ -119,13 +119,13 @@ class TestExtractMetadataFromText:
         assert result["keywords"] == []
 
     @pytest.mark.asyncio
-    @patch('app.services.metadata_extractor.AsyncOpenAI')
-    async def test_extract_metadata_api_error(self, mock_openai):
+    @patch('app.services.metadata_extractor.get_openai_client')
+    async def test_extract_metadata_api_error(self, mock_get_client):
         """Test handling of API errors"""
         # Setup mock to raise an exception
         mock_client = MagicMock()
         mock_client.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
-        mock_openai.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         # Execute
         result = await extract_metadata_from_text("Some text")
@@ -140,8 +140,8 @@ class TestExtractMetadataFromText:
         assert "API Error" in result["error"]
 
     @pytest.mark.asyncio
-    @patch('app.services.metadata_extractor.AsyncOpenAI')
-    async def test_extract_metadata_invalid_json(self, mock_openai):
+    @patch('app.services.metadata_extractor.get_openai_client')
+    async def test_extract_metadata_invalid_json(self, mock_get_client):
         """Test handling of invalid JSON response"""
         # Setup mock with invalid JSON
         mock_message = Mock()
@@ -155,7 +155,7 @@ class TestExtractMetadataFromText:
 
         mock_client = MagicMock()
         mock_client.chat.completions.create = AsyncMock(return_value=mock_completion)
-        mock_openai.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         # Execute
         result = await extract_metadata_from_text("Some text")
@@ -169,8 +169,8 @@ class TestExtractMetadataFromText:
         assert "error" in result
 
     @pytest.mark.asyncio
-    @patch('app.services.metadata_extractor.AsyncOpenAI')
-    async def test_extract_metadata_api_call_parameters(self, mock_openai):
+    @patch('app.services.metadata_extractor.get_openai_client')
+    async def test_extract_metadata_api_call_parameters(self, mock_get_client):
         """Test that API is called with correct parameters"""
         # Setup mock
         mock_response = {
@@ -192,7 +192,7 @@ class TestExtractMetadataFromText:
 
         mock_client = MagicMock()
         mock_client.chat.completions.create = AsyncMock(return_value=mock_completion)
-        mock_openai.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         # Execute
         test_text = "Sample paper text for testing"
@@ -210,8 +210,8 @@ class TestExtractMetadataFromText:
         assert call_kwargs["messages"][1]["role"] == "user"
 
     @pytest.mark.asyncio
-    @patch('app.services.metadata_extractor.AsyncOpenAI')
-    async def test_extract_metadata_with_multiple_authors(self, mock_openai):
+    @patch('app.services.metadata_extractor.get_openai_client')
+    async def test_extract_metadata_with_multiple_authors(self, mock_get_client):
         """Test extraction with multiple authors"""
         # Setup mock response
         mock_response = {
@@ -233,7 +233,7 @@ class TestExtractMetadataFromText:
 
         mock_client = MagicMock()
         mock_client.chat.completions.create = AsyncMock(return_value=mock_completion)
-        mock_openai.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         # Execute
         result = await extract_metadata_from_text("Multi-author paper text")
@@ -0,0 +1,86 @@
+"""
+Unit tests for the shared provider client
+"""
+import pytest
+from unittest.mock import Mock, patch
+import app.services.openai_client as openai_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    """Start each test without a shared client and restore the module state afterwards"""
+    with patch.object(openai_client, '_http_client', None), patch.object(openai_client, '_client', None):
+        yield
+
+
+class TestOpenAIClientFactory:
+    """Test cases for the client factory"""
+
+    def test_client_is_shared(self):
+        """Test that every caller gets the same client and connection pool"""
+        client = openai_client.get_openai_client()
+
+        assert openai_client.get_openai_client() is client
+        assert client._client is openai_client.get_http_client()
+        assert client.max_retries == 0
+
+    def test_http_client_settings(self):
+        """Test that pool limits and timeouts come from the settings"""
+        with patch.object(openai_client.settings, 'PROVIDER_CONNECT_TIMEOUT_S', 3.0):
+            with patch.object(openai_client.settings, 'PROVIDER_READ_TIMEOUT_S', 90.0):
+                http_client = openai_client.get_http_client()
+
+        assert http_client.timeout.connect == 3.0
+        assert http_client.timeout.read == 90.0
+        pool = http_client._transport._pool
+        assert pool._max_connections == openai_client.settings.PROVIDER_MAX_CONNECTIONS
+        assert pool._max_keepalive_connections == openai_client.settings.PROVIDER_MAX_KEEPALIVE_CONNECTIONS
+
+    def test_http2_requires_h2(self):
+        """Test that HTTP/2 is only enabled when the h2 package is importable"""
+        with patch('app.services.openai_client.importlib.util.find_spec', return_value=None):
+            assert openai_client.http2_available() is False
+        with patch('app.services.openai_client.importlib.util.find_spec', return_value=Mock()):
+            assert openai_client.http2_available() is True
+            with patch.object(openai_client.settings, 'PROVIDER_HTTP2', False):
+                assert openai_client.http2_available() is False
+
+    @pytest.mark.asyncio
+    async def test_close_resets_client(self):
+        """Test that closing the client releases the pool and a new one is created next time"""
+        client = openai_client.get_openai_client()
+        http_client = openai_client.get_http_client()
+
+        await openai_client.close_openai_client()
+
+        assert http_client.is_closed
+        assert openai_client.get_openai_client() is not client
+
+
+class TestPoolStats:
+    """Test cases for get_pool_stats"""
+
+    def test_stats_before_first_use(self):
+        """Test that stats are available before any client exists"""
+        stats = openai_client.get_pool_stats()
+
+        assert stats["connections"] == 0
+        assert stats["queued_requests"] == 0
+        assert stats["max_connections"] == openai_client.settings.PROVIDER_MAX_CONNECTIONS
+
+    def test_stats_count_connections(self):
+        """Test counting of active, idle and queued entries of the pool"""
+        http_client = openai_client.get_http_client()
+        pool = http_client._transport._pool
+        idle = Mock(is_idle=Mock(return_value=True))
+        busy = Mock(is_idle=Mock(return_value=False))
+        queued = Mock(is_queued=Mock(return_value=True))
+
+        with patch.object(type(pool), 'connections', new=[idle, busy, busy]):
+            with patch.object(pool, '_requests', [queued]):
+                stats = openai_client.get_pool_stats()
+
+        assert stats["connections"] == 3
+        assert stats["idle_connections"] == 1
+        assert stats["active_connections"] == 2
+        assert stats["queued_requests"] == 1
@@ -0,0 +1,70 @@
+"""
+Unit tests for keyset pagination
+"""
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from app.models import Paper
+from app.services.pagination import decode_cursor, encode_cursor, keyset_query, split_page
+
+
+class TestCursor:
+    """Test cases for encode_cursor / decode_cursor"""
+
+    def test_round_trip(self):
+        """Test that a cursor decodes to its timestamp and id"""
+        timestamp = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+        cursor = encode_cursor(timestamp, 42)
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (timestamp, 42)
+
+    def test_score_round_trip(self):
+        """Test that float keys round-trip exactly"""
+        cursor = encode_cursor(0.1 + 0.2, 5)
+
+        assert decode_cursor(cursor, float) == (0.1 + 0.2, 5)
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+    @pytest.mark.parametrize("cursor", ["garbage", "", "WzFd", encode_cursor(datetime.now(), 1)[:-3]])
+    def test_invalid_cursor(self, cursor):
+        """Test that malformed cursors raise ValueError"""
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+class TestKeysetQuery:
+    """Test cases for keyset_query and split_page"""
+
+    def test_first_page(self):
+        """Test that the first page has no key condition and fetches one extra row"""
+        query = keyset_query(select(Paper), Paper.created_at, Paper.id, None, 10)
+        sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+        assert "WHERE" not in sql
+        assert "ORDER BY papers.created_at DESC, papers.id DESC" in sql
+        assert "LIMIT 11" in sql
+
+    def test_page_after_cursor(self):
+        """Test that the next page compares the (timestamp, id) row values"""
+        cursor = encode_cursor(datetime(2024, 5, 1, tzinfo=timezone.utc), 7)
+
+        query = keyset_query(select(Paper), Paper.created_at, Paper.id, cursor, 10)
+
+        assert "(papers.created_at, papers.id) < (" in str(query.compile(dialect=postgresql.dialect()))
+
+    def test_split_page(self):
+        """Test that the extra row only signals a next page"""
+        timestamp = datetime(2024, 5, 1)
+        rows = [(timestamp, 3), (timestamp, 2), (timestamp, 1)]
+
+        page, next_cursor = split_page(rows, 2, lambda row: row)
+        assert page == rows[:2]
+        assert decode_cursor(next_cursor) == (timestamp, 2)
+
+        page, next_cursor = split_page(rows, 3, lambda row: row)
+        assert page == rows
+        assert next_cursor is None
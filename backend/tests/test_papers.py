@@ -0,0 +1,157 @@
+"""
+Unit tests for the paper listing and search endpoints
+"""
+import pytest
+from datetime import datetime
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+from unittest.mock import AsyncMock, Mock
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from app.api.papers import get_paper, list_papers
+from app.models import Chunk
+from app.services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+def list_params(**overrides):
+    params = dict(response=Response(), cursor=None, limit=10, search=None, year=None, year_min=None, year_max=None)
+    params.update(overrides)
+    return params
+
+
+def compiled(query) -> str:
+    # Dialect of the API engine
+    return str(query.compile(dialect=asyncpg_dialect()))
+
+
+def make_paper(paper_id, nb_chunks=3):
+    return Mock(
+        id=paper_id, title=f"Paper {paper_id}", authors=["Doe"], year=2023, abstract=None,
+        keywords=[], nb_chunks=nb_chunks, created_at=datetime.now()
+    )
+
+
+class TestPaperEndpoints:
+    """Test cases for list_papers and get_paper"""
+
+    @pytest.mark.asyncio
+    async def test_list_papers_does_not_load_chunks(self):
+        """Test that chunk counts come from the paper rows"""
+        papers = [make_paper(2, nb_chunks=40), make_paper(1, nb_chunks=0)]
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.all.return_value = [Mock(Paper=paper, sort_key=paper.created_at) for paper in papers]
+
+        result = await list_papers(**list_params(), db=db)
+
+        assert [(paper.id, paper.nb_chunks) for paper in result] == [(2, 40), (1, 0)]
+        db.execute.assert_awaited_once()
+        query = db.execute.call_args[0][0]
+        assert not query._with_options
+        assert "FROM papers" in str(query) and "JOIN" not in str(query)
+
+    @pytest.mark.asyncio
+    async def test_get_paper_does_not_load_chunks(self):
+        """Test that get_paper reads the stored chunk count"""
+        db = AsyncMock()
+        db.get.return_value = make_paper(7, nb_chunks=12)
+
+        result = await get_paper(paper_id=7, db=db)
+
+        assert result.nb_chunks == 12
+        assert "options" not in db.get.call_args.kwargs
+
+    def test_chunk_embedding_is_deferred(self):
+        """Test that loading Chunk entities does not fetch their vectors"""
+        assert "chunks.embedding" not in str(select(Chunk))
+        assert "chunks.embedding" in str(select(Chunk.id, Chunk.embedding))
+
+
+class TestPaperSearch:
+    """Test cases for the search and year filters of list_papers"""
+
+    @pytest.mark.asyncio
+    async def test_search_filters_and_orders_by_relevance(self):
+        """Test that search matches title, authors and keywords, best match first"""
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.all.return_value = [
+            Mock(Paper=make_paper(4), sort_key=1.8), Mock(Paper=make_paper(9), sort_key=0.7), Mock(Paper=make_paper(1), sort_key=0.65)
+        ]
+        response = Response()
+
+        result = await list_papers(**list_params(response=response, search=" attention ", limit=2), db=db)
+
+        assert [paper.id for paper in result] == [4, 9]
+        assert decode_cursor(response.headers[NEXT_CURSOR_HEADER], float) == (0.7, 9)
+        sql = compiled(db.execute.call_args[0][0])
+        assert "papers.title %> " in sql
+        assert "array_search_text(papers.authors) LIKE '%' || " in sql
+        assert "array_search_text(papers.keywords) LIKE '%' || " in sql
+        assert "ORDER BY CAST(word_similarity(" in sql
+
+    @pytest.mark.asyncio
+    async def test_author_search_is_partial_and_case_insensitive(self):
+        """Test that authors and keywords are matched on a substring of their lowercased text"""
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.all.return_value = []
+
+        await list_papers(**list_params(search="VasWani"), db=db)
+
+        query = db.execute.call_args[0][0]
+        sql = compiled(query)
+        # Lowercased in the indexed expression (array_search_text) and in the pattern
+        assert "array_search_text(papers.authors) LIKE '%' || " in sql
+        assert "lower(" not in sql
+        params = query.compile(dialect=asyncpg_dialect()).params
+        assert "vaswani" in params.values()
+        assert "VasWani" in params.values()  # Title similarity keeps the search as typed
+
+    @pytest.mark.asyncio
+    async def test_search_escapes_like_wildcards(self):
+        """Test that % and _ in the search are matched literally"""
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.all.return_value = []
+
+        await list_papers(**list_params(search="100%_recall"), db=db)
+
+        query = db.execute.call_args[0][0]
+        assert "ESCAPE '/'" in compiled(query)
+        assert "100/%/_recall" in query.compile(dialect=asyncpg_dialect()).params.values()
+
+    @pytest.mark.asyncio
+    async def test_search_cursor_compares_relevance(self):
+        """Test that the next search page starts below the relevance of the cursor"""
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.all.return_value = []
+
+        await list_papers(**list_params(search="bert", cursor=encode_cursor(0.7, 9)), db=db)
+
+        sql = compiled(db.execute.call_args[0][0])
+        assert "AS FLOAT), papers.id) < (" in sql
+
+    @pytest.mark.asyncio
+    async def test_search_rejects_date_cursor(self):
+        """Test that a cursor of the unfiltered listing is rejected with search"""
+        db = AsyncMock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await list_papers(**list_params(search="bert", cursor=encode_cursor(datetime.now(), 3)), db=db)
+
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_year_range(self):
+        """Test that year_min and year_max bound the publication year"""
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.all.return_value = []
+
+        await list_papers(**list_params(year_min=2018, year_max=2021), db=db)
+
+        sql = compiled(db.execute.call_args[0][0])
+        assert "papers.year >= " in sql
+        assert "papers.year <= " in sql
+        assert "ORDER BY papers.created_at DESC, papers.id DESC" in sql
@@ -1,8 +1,13 @@
 """
 Unit tests for PDF text extraction service
 """
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch, MagicMock
-from app.services.pdf_extractor import extract_text_from_pdf
+from app.services.pdf_extractor import (
+    extract_text_from_pdf,
+    extract_pages_from_pdf,
+    _split_page_ranges
+)
 
 
 class TestExtractTextFromPdf:
@@ -106,3 +111,62 @@ class TestExtractTextFromPdf:
         expected = "Content page 1. Content page 2. Content page 3. Content page 4. Content page 5. "
         assert result == expected
         assert len(mock_reader.pages) == 5
+
+
+class TestExtractPagesFromPdf:
+    """Test cases for page-parallel extraction"""
+
+    def _mock_reader(self, nb_pages):
+        pages = []
+        for i in range(nb_pages):
+            mock_page = Mock()
+            mock_page.extract_text.return_value = f"Page {i}. "
+            pages.append(mock_page)
+
+        mock_reader = MagicMock()
+        mock_reader.pages = pages
+        return mock_reader
+
+    def test_split_page_ranges_balanced(self):
+        """Test that page ranges cover every page exactly once"""
+        ranges = _split_page_ranges(10, 3)
+
+        assert ranges == [(0, 4), (4, 7), (7, 10)]
+
+    def test_split_page_ranges_more_ranges_than_pages(self):
+        """Test that no empty range is produced"""
+        ranges = _split_page_ranges(2, 8)
+
+        assert ranges == [(0, 1), (1, 2)]
+
+    @patch('app.services.pdf_extractor.PdfReader')
+    def test_extract_pages_small_pdf_runs_in_process(self, mock_pdf_reader):
+        """Test that small PDFs do not use the process pool"""
+        mock_pdf_reader.return_value = self._mock_reader(3)
+
+        with patch('app.services.pdf_extractor.get_cpu_pool') as mock_pool:
+            result = extract_pages_from_pdf("small.pdf")
+
+        assert not mock_pool.called
+        assert result["workers"] == 1
+        assert result["nb_pages"] == 3
+        assert result["text"] == "Page 0. Page 1. Page 2. "
+
+    @patch('app.services.pdf_extractor.PdfReader')
+    def test_extract_pages_large_pdf_uses_pool_and_keeps_order(self, mock_pdf_reader):
+        """Test that large PDFs are split across the pool and joined in page order"""
+        mock_pdf_reader.return_value = self._mock_reader(40)
+
+        with ThreadPoolExecutor(max_workers=4) as pool, \
+                patch('app.services.pdf_extractor.get_cpu_pool', return_value=pool), \
+                patch('app.services.pdf_extractor.get_cpu_worker_count', return_value=4), \
+                patch('app.services.pdf_extractor.settings') as mock_settings:
+            mock_settings.PDF_PARALLEL_MIN_PAGES = 10
+
+            result = extract_pages_from_pdf("large.pdf")
+
+        assert result["workers"] == 4
+        assert result["text"] == "".join(f"Page {i}. " for i in range(40))
+        assert [page["page_number"] for page in result["pages"]] == list(range(40))
+        assert all(page["elapsed_ms"] >= 0 for page in result["pages"])
+        assert result["pages"][0]["nb_chars"] == len("Page 0. ")
@@ -3,7 +3,13 @@ Unit tests for RAG service
 """
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
-from app.services.rag import generate_rag_answer_with_context, calculate_cost, _build_context, _deduplicate_sources
+from app.services.rag import (
+    generate_rag_answer_with_context,
+    stream_rag_answer_with_context,
+    calculate_cost,
+    _build_context,
+    _deduplicate_sources
+)
 
 
 class TestGenerateRagAnswer:
@@ -18,7 +24,7 @@ class TestGenerateRagAnswer:
     ):
         """Test successful RAG answer generation"""
         # Setup mocks
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.return_value = [0.1] * 1536
 
         mock_search_results = [
@@ -82,7 +88,7 @@ class TestGenerateRagAnswer:
         assert result["completion_tokens"] == 50
 
         # Verify services were called correctly
-        mock_generate_embedding.assert_called_once_with("What is machine learning?")
+        mock_generate_embedding.assert_called_once_with("What is machine learning?", db=mock_db)
         mock_vector_search.assert_called_once_with(
             db=mock_db,
             query_embedding=[0.1] * 1536,
@@ -100,7 +106,7 @@ class TestGenerateRagAnswer:
     ):
         """Test RAG answer generation with paper IDs filter"""
         # Setup mocks
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.return_value = [0.1] * 1536
         mock_vector_search.return_value = []
 
@@ -136,7 +142,7 @@ class TestGenerateRagAnswer:
     ):
         """Test RAG answer generation with no search results"""
         # Setup mocks
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.return_value = [0.1] * 1536
         mock_vector_search.return_value = []
 
@@ -166,7 +172,7 @@ class TestGenerateRagAnswer:
     ):
         """Test handling of embedding generation failure"""
         # Setup mock to raise exception
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.side_effect = Exception("Embedding API failed")
 
         # Execute & Assert
@@ -187,7 +193,7 @@ class TestGenerateRagAnswer:
     ):
         """Test handling of LLM API failure"""
         # Setup mocks
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.return_value = [0.1] * 1536
         mock_vector_search.return_value = []
 
@@ -214,7 +220,7 @@ class TestGenerateRagAnswer:
     ):
         """Test that response time is measured correctly"""
         # Setup mocks
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.return_value = [0.1] * 1536
         mock_vector_search.return_value = []
 
@@ -244,7 +250,7 @@ class TestGenerateRagAnswer:
     ):
         """Test that cost is calculated correctly"""
         # Setup mocks
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.return_value = [0.1] * 1536
         mock_vector_search.return_value = []
 
@@ -275,7 +281,7 @@ class TestGenerateRagAnswer:
     ):
         """Test that context is built correctly from search results"""
         # Setup mocks
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.return_value = [0.1] * 1536
 
         mock_search_results = [
@@ -330,7 +336,7 @@ class TestGenerateRagAnswer:
     ):
         """Test that sources are formatted correctly"""
         # Setup mocks
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_generate_embedding.return_value = [0.1] * 1536
 
         mock_search_results = [
@@ -370,6 +376,146 @@ class TestGenerateRagAnswer:
         assert source["relevance_score"] == 0.88
 
 
+    @pytest.mark.asyncio
+    @patch('app.services.rag.generate_embedding')
+    @patch('app.services.rag.vector_search')
+    @patch('app.services.rag.client')
+    async def test_retrieval_transaction_ends_before_llm_call(
+        self, mock_client, mock_vector_search, mock_generate_embedding
+    ):
+        """Test that no transaction is left open while waiting on the chat completion"""
+        mock_db = AsyncMock()
+        mock_generate_embedding.return_value = [0.1] * 1536
+        mock_vector_search.return_value = []
+        commits_at_llm_call = []
+
+        async def create(**kwargs):
+            commits_at_llm_call.append(mock_db.commit.await_count)
+            response = Mock()
+            response.choices = [Mock(message=Mock(content="Answer"))]
+            response.usage = Mock(prompt_tokens=10, completion_tokens=5)
+            return response
+
+        mock_client.chat.completions.create = create
+
+        await generate_rag_answer_with_context(db=mock_db, question="Question?")
+
+        assert commits_at_llm_call == [1]
+
+
+class TestStreamRagAnswer:
+    """Test cases for stream_rag_answer_with_context"""
+
+    @pytest.fixture
+    def search_results(self):
+        return [
+            {
+                "chunk_id": 1,
+                "content": "Machine learning is a subset of AI.",
+                "section_name": "Introduction",
+                "paper_id": 1,
+                "paper_title": "AI Paper",
+                "authors": ["John Doe"],
+                "year": 2024,
+                "similarity_score": 0.95
+            }
+        ]
+
+    @staticmethod
+    def make_stream(chunks):
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        return stream()
+
+    @staticmethod
+    def token_chunk(content):
+        return Mock(choices=[Mock(delta=Mock(content=content))], usage=None)
+
+    @pytest.mark.asyncio
+    @patch('app.services.rag.generate_embedding')
+    @patch('app.services.rag.vector_search')
+    @patch('app.services.rag.client')
+    async def test_stream_events_order(
+        self, mock_client, mock_vector_search, mock_generate_embedding, search_results
+    ):
+        """Test that sources come first, then tokens, then a final event with usage"""
+        mock_generate_embedding.return_value = [0.1] * 1536
+        mock_vector_search.return_value = search_results
+        usage_chunk = Mock(choices=[], usage=Mock(prompt_tokens=120, completion_tokens=3))
+        mock_client.chat.completions.create = AsyncMock(return_value=self.make_stream([
+            self.token_chunk("Machine "),
+            self.token_chunk(None),
+            self.token_chunk("learning"),
+            self.token_chunk("."),
+            usage_chunk
+        ]))
+
+        events = [event async for event in stream_rag_answer_with_context(
+            db=AsyncMock(), question="What is machine learning?"
+        )]
+
+        assert [event["type"] for event in events] == ["sources", "token", "token", "token", "done"]
+        assert events[0]["sources"][0]["paper_title"] == "AI Paper"
+        assert "".join(event["content"] for event in events[1:4]) == "Machine learning."
+        done = events[-1]
+        assert done["answer"] == "Machine learning."
+        assert done["prompt_tokens"] == 120
+        assert done["completion_tokens"] == 3
+        assert done["cost_usd"] == calculate_cost(120, 3)
+        assert done["response_time_ms"] >= 0
+        kwargs = mock_client.chat.completions.create.call_args[1]
+        assert kwargs["stream"] is True
+        assert kwargs["extra_body"] == {"stream_options": {"include_usage": True}}
+
+    @pytest.mark.asyncio
+    @patch('app.services.rag.generate_embedding')
+    @patch('app.services.rag.vector_search')
+    @patch('app.services.rag.client')
+    async def test_stream_estimates_usage_when_missing(
+        self, mock_client, mock_vector_search, mock_generate_embedding, search_results
+    ):
+        """Test the token estimate for providers that send no usage in streams"""
+        mock_generate_embedding.return_value = [0.1] * 1536
+        mock_vector_search.return_value = search_results
+        mock_client.chat.completions.create = AsyncMock(return_value=self.make_stream([
+            self.token_chunk("An answer")
+        ]))
+
+        events = [event async for event in stream_rag_answer_with_context(
+            db=AsyncMock(), question="Question?"
+        )]
+
+        done = events[-1]
+        assert done["prompt_tokens"] > 0
+        assert done["completion_tokens"] > 0
+        assert done["cost_usd"] > 0
+
+    @pytest.mark.asyncio
+    @patch('app.services.rag.settings.OPENAI_STREAM_INCLUDE_USAGE', False)
+    @patch('app.services.rag.generate_embedding')
+    @patch('app.services.rag.vector_search')
+    @patch('app.services.rag.client')
+    async def test_stream_without_usage_option(
+        self, mock_client, mock_vector_search, mock_generate_embedding, search_results
+    ):
+        """Test that stream_options is not sent when disabled, and usage is estimated"""
+        mock_generate_embedding.return_value = [0.1] * 1536
+        mock_vector_search.return_value = search_results
+        mock_client.chat.completions.create = AsyncMock(return_value=self.make_stream([
+            self.token_chunk("An answer")
+        ]))
+
+        events = [event async for event in stream_rag_answer_with_context(
+            db=AsyncMock(), question="Question?"
+        )]
+
+        assert "extra_body" not in mock_client.chat.completions.create.call_args[1]
+        done = events[-1]
+        assert done["prompt_tokens"] > 0
+        assert done["completion_tokens"] > 0
+
+
 class TestCalculateCost:
     """Test cases for calculate_cost function"""
 
@@ -0,0 +1,141 @@
+"""
+Unit tests for the adaptive concurrency limiter
+"""
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.services.rate_limiter import AdaptiveConcurrencyLimiter, TokenBucket
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test cases for AdaptiveConcurrencyLimiter"""
+
+    def test_initial_limit_is_clamped(self):
+        """Test that the initial limit stays within [minimum, maximum]"""
+        assert AdaptiveConcurrencyLimiter(initial=50, maximum=8).limit == 8
+        assert AdaptiveConcurrencyLimiter(initial=0, maximum=8).limit == 1
+
+    def test_additive_increase(self):
+        """Test that a full window of fast successes adds about one slot"""
+        limiter = AdaptiveConcurrencyLimiter(initial=4, maximum=16, latency_target_s=1.0)
+
+        for _ in range(4):
+            limiter.on_success(0.1)
+
+        assert 4.9 < limiter.limit < 5.0
+
+    def test_increase_capped_at_maximum(self):
+        """Test that the limit never exceeds the maximum"""
+        limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=2, latency_target_s=1.0)
+
+        for _ in range(10):
+            limiter.on_success(0.1)
+
+        assert limiter.limit == 2
+
+    def test_throttle_halves_limit(self):
+        """Test multiplicative decrease on a 429"""
+        limiter = AdaptiveConcurrencyLimiter(initial=8, maximum=16)
+
+        limiter.on_throttle()
+
+        assert limiter.limit == 4
+
+    def test_slow_request_decreases_limit(self):
+        """Test that a request slower than the target is treated as congestion"""
+        limiter = AdaptiveConcurrencyLimiter(initial=8, maximum=16, latency_target_s=1.0)
+
+        limiter.on_success(5.0)
+
+        assert limiter.limit == 4
+
+    def test_decrease_once_per_congestion_event(self):
+        """Test that simultaneous 429s only decrease the limit once"""
+        limiter = AdaptiveConcurrencyLimiter(initial=8, maximum=16, decrease_cooldown_s=60)
+
+        limiter.on_throttle()
+        limiter.on_throttle()
+        limiter.on_throttle()
+
+        assert limiter.limit == 4
+
+    def test_decrease_stops_at_minimum(self):
+        """Test that the limit never goes below the minimum"""
+        limiter = AdaptiveConcurrencyLimiter(initial=1, maximum=16, decrease_cooldown_s=0)
+
+        limiter.on_throttle()
+
+        assert limiter.limit == 1
+
+    @pytest.mark.asyncio
+    async def test_slot_bounds_concurrency(self):
+        """Test that no more than `limit` blocks run at the same time"""
+        limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=2)
+        running = 0
+        peak = 0
+
+        async def work():
+            nonlocal running, peak
+            async with limiter.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(work() for _ in range(6)))
+
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_slot_released_on_error(self):
+        """Test that a failing block releases its slot"""
+        limiter = AdaptiveConcurrencyLimiter(initial=1, maximum=1)
+
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                raise RuntimeError("boom")
+
+        assert limiter.in_flight == 0
+        async with limiter.slot():
+            assert limiter.in_flight == 1
+
+
+class TestTokenBucket:
+    """Test cases for TokenBucket"""
+
+    @pytest.mark.asyncio
+    async def test_acquire_within_budget_does_not_wait(self):
+        """Test that requests within the budget pass immediately"""
+        bucket = TokenBucket(tokens_per_minute=6000)
+
+        with patch('app.services.rate_limiter.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+            await bucket.acquire(2000)
+            await bucket.acquire(4000)
+
+        assert not mock_sleep.called
+        assert bucket.tokens < 1
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits_for_refill(self):
+        """Test that an exhausted budget waits for the missing tokens to refill"""
+        bucket = TokenBucket(tokens_per_minute=6000)
+        await bucket.acquire(6000)
+
+        async def fake_sleep(delay):
+            bucket._updated -= delay
+
+        with patch('app.services.rate_limiter.asyncio.sleep', side_effect=fake_sleep) as mock_sleep:
+            await bucket.acquire(1000)
+
+        # 1000 tokens at 100 tokens/s
+        assert mock_sleep.call_args_list[0][0][0] == pytest.approx(10, rel=0.01)
+
+    @pytest.mark.asyncio
+    async def test_acquire_larger_than_capacity_is_clamped(self):
+        """Test that an oversized request does not wait forever"""
+        bucket = TokenBucket(tokens_per_minute=600)
+
+        await bucket.acquire(10000)
+
+        assert bucket.tokens < 1
@@ -0,0 +1,125 @@
+"""
+Unit tests for the resilient provider call layer
+"""
+import httpx
+import pytest
+from unittest.mock import patch, AsyncMock
+from openai import APIConnectionError, BadRequestError, InternalServerError, RateLimitError
+from app.services.resilience import (
+    call_with_retry,
+    compute_backoff,
+    get_provider_stats,
+    get_retry_after,
+    is_retryable_error
+)
+
+REQUEST = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+
+
+def make_error(error_class, status_code, headers=None):
+    response = httpx.Response(status_code, request=REQUEST, headers=headers or {})
+    return error_class("provider error", response=response, body=None)
+
+
+class TestRetryPolicy:
+    """Test cases for error classification and backoff"""
+
+    def test_retryable_errors(self):
+        """Test that throttling, server and connection errors are retried"""
+        assert is_retryable_error(make_error(RateLimitError, 429))
+        assert is_retryable_error(make_error(InternalServerError, 503))
+        assert is_retryable_error(APIConnectionError(request=REQUEST))
+
+    def test_non_retryable_errors(self):
+        """Test that client errors and unknown exceptions are not retried"""
+        assert not is_retryable_error(make_error(BadRequestError, 400))
+        assert not is_retryable_error(ValueError("bad"))
+
+    def test_retry_after_seconds(self):
+        """Test parsing of a Retry-After header in seconds"""
+        assert get_retry_after(make_error(RateLimitError, 429, {"retry-after": "7"})) == 7.0
+
+    def test_retry_after_ms_wins(self):
+        """Test that retry-after-ms is preferred over Retry-After"""
+        error = make_error(RateLimitError, 429, {"retry-after-ms": "1500", "retry-after": "7"})
+        assert get_retry_after(error) == 1.5
+
+    def test_retry_after_http_date(self):
+        """Test parsing of a Retry-After header as an HTTP date"""
+        error = make_error(RateLimitError, 429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        assert get_retry_after(error) == 0.0
+
+    def test_no_retry_after(self):
+        """Test that a missing header returns None"""
+        assert get_retry_after(make_error(RateLimitError, 429)) is None
+        assert get_retry_after(ValueError("bad")) is None
+
+    def test_backoff_uses_retry_after(self):
+        """Test that the provider's delay is used when present"""
+        assert compute_backoff(1, make_error(RateLimitError, 429, {"retry-after": "3"})) == 3.0
+
+    def test_backoff_is_capped(self):
+        """Test that neither Retry-After nor the exponential delay exceed the maximum"""
+        with patch('app.services.resilience.settings.PROVIDER_RETRY_MAX_DELAY_S', 10.0):
+            assert compute_backoff(1, make_error(RateLimitError, 429, {"retry-after": "3600"})) == 10.0
+            for _ in range(20):
+                assert 0 <= compute_backoff(12, make_error(InternalServerError, 500)) <= 10.0
+
+    def test_backoff_grows_exponentially(self):
+        """Test the full-jitter ceiling base * 2^(attempt - 1)"""
+        with patch('app.services.resilience.random.uniform', side_effect=lambda low, high: high):
+            with patch('app.services.resilience.settings.PROVIDER_RETRY_BASE_DELAY_S', 1.0):
+                assert compute_backoff(1, make_error(InternalServerError, 500)) == 1.0
+                assert compute_backoff(3, make_error(InternalServerError, 500)) == 4.0
+
+
+class TestCallWithRetry:
+    """Test cases for call_with_retry"""
+
+    @pytest.mark.asyncio
+    @patch('app.services.resilience.asyncio.sleep', new_callable=AsyncMock)
+    async def test_success_after_transient_errors(self, mock_sleep):
+        """Test that transient errors are retried until success"""
+        func = AsyncMock(side_effect=[
+            make_error(RateLimitError, 429, {"retry-after": "2"}),
+            make_error(InternalServerError, 502),
+            "ok"
+        ])
+
+        result = await call_with_retry("test-success", func, "a", key="b")
+
+        assert result == "ok"
+        assert func.call_count == 3
+        func.assert_called_with("a", key="b")
+        assert mock_sleep.call_args_list[0][0][0] == 2.0
+        stats = get_provider_stats()["test-success"]
+        assert stats["calls"] == 3
+        assert stats["retries"] == 2
+        assert stats["throttled"] == 1
+        assert stats["successes"] == 1
+        assert stats["failures"] == 0
+
+    @pytest.mark.asyncio
+    @patch('app.services.resilience.asyncio.sleep', new_callable=AsyncMock)
+    async def test_gives_up_after_max_attempts(self, mock_sleep):
+        """Test that the last error is raised once attempts are exhausted"""
+        func = AsyncMock(side_effect=make_error(InternalServerError, 500))
+
+        with pytest.raises(InternalServerError):
+            await call_with_retry("test-exhausted", func, max_attempts=3)
+
+        assert func.call_count == 3
+        assert mock_sleep.call_count == 2
+        assert get_provider_stats()["test-exhausted"]["failures"] == 1
+
+    @pytest.mark.asyncio
+    @patch('app.services.resilience.asyncio.sleep', new_callable=AsyncMock)
+    async def test_non_retryable_error_raised_immediately(self, mock_sleep):
+        """Test that a 400 is not retried"""
+        func = AsyncMock(side_effect=make_error(BadRequestError, 400))
+
+        with pytest.raises(BadRequestError):
+            await call_with_retry("test-bad-request", func)
+
+        assert func.call_count == 1
+        assert not mock_sleep.called
@@ -1,8 +1,9 @@
 """
 Unit tests for upload_paper endpoint
 """
+import hashlib
 import pytest
-from unittest.mock import Mock, patch, AsyncMock
+from unittest.mock import AsyncMock, Mock, patch
 from fastapi import UploadFile
 from io import BytesIO
 
@@ -12,13 +13,10 @@ class TestUploadPaperEndpoint:
 
     @pytest.fixture
     def mock_db(self):
-        """Mock database session"""
-        db = Mock()
+        """Mock async database session (run_sync calls the function with the session)"""
+        db = AsyncMock()
         db.add = Mock()
-        db.flush = Mock()
-        db.commit = Mock()
-        db.refresh = Mock()
-        db.rollback = Mock()
+        db.run_sync.side_effect = lambda func, *args, **kwargs: func(db, *args, **kwargs)
         return db
 
     @pytest.fixture
@@ -30,228 +28,130 @@ class TestUploadPaperEndpoint:
         return file
 
     @pytest.fixture
-    def sample_metadata(self):
-        """Sample metadata extracted from PDF"""
-        return {
-            "title": "Machine Learning in Healthcare",
-            "authors": ["John Doe", "Jane Smith"],
-            "year": 2023,
-            "abstract": "This paper explores machine learning applications in healthcare.",
-            "keywords": ["machine learning", "healthcare", "AI"],
-            "sections": {
-                "Introduction": 0,
-                "Methods": 500,
-                "Results": 1000,
-                "Conclusion": 1500
-            }
-        }
-
-    @pytest.fixture
-    def sample_chunks(self):
-        """Sample chunks from chunker"""
-        return [
-            {"content": "Introduction text here.", "section_name": "Introduction", "chunk_index": 0},
-            {"content": "Methods description here.", "section_name": "Methods", "chunk_index": 1},
-            {"content": "Results analysis here.", "section_name": "Results", "chunk_index": 2},
-            {"content": "Conclusion summary here.", "section_name": "Conclusion", "chunk_index": 3}
-        ]
-
-    @pytest.fixture
-    def sample_embeddings(self):
-        """Sample embeddings for chunks"""
-        return [
-            [0.1] * 1536,
-            [0.2] * 1536,
-            [0.3] * 1536,
-            [0.4] * 1536
-        ]
+    def mock_job(self):
+        """Mock queued ingestion job"""
+        job = Mock()
+        job.id = 42
+        job.filename = "test_paper.pdf"
+        job.status = "pending"
+        return job
 
     @pytest.mark.asyncio
-    @patch('app.api.papers.generate_embeddings_batch', new_callable=AsyncMock)
-    @patch('app.api.papers.chunk_text')
-    @patch('app.api.papers.extract_metadata_from_text', new_callable=AsyncMock)
-    @patch('app.api.papers.extract_text_from_pdf')
+    @patch('app.api.papers.submit_upload')
     @patch('app.api.papers.open')
-    @patch('app.api.papers.shutil.copyfileobj')
-    async def test_upload_paper_success(
+    async def test_upload_paper_enqueues_job(
         self,
-        mock_copyfileobj,
         mock_open,
-        mock_extract_text,
-        mock_extract_metadata,
-        mock_chunk_text,
-        mock_generate_embeddings,
+        mock_submit_upload,
         mock_pdf_file,
         mock_db,
-        sample_metadata,
-        sample_chunks,
-        sample_embeddings
+        mock_job
     ):
-        """Test successful paper upload and processing"""
-        # Setup mocks
-        mock_extract_text.return_value = "Full text content from PDF..."
-        mock_extract_metadata.return_value = sample_metadata
-        mock_chunk_text.return_value = sample_chunks
-        mock_generate_embeddings.return_value = sample_embeddings
-
-        # Mock paper model
-        mock_paper = Mock()
-        mock_paper.id = 1
-        mock_paper.title = sample_metadata["title"]
-        mock_paper.authors = sample_metadata["authors"]
-        mock_paper.year = sample_metadata["year"]
-        mock_paper.abstract = sample_metadata["abstract"]
-        mock_paper.keywords = sample_metadata["keywords"]
-        mock_paper.created_at = "2024-01-01T00:00:00"
+        """Test that upload saves the file and queues an ingestion job"""
+        mock_submit_upload.return_value = (mock_job, False)
 
-        # Import inside test to use mocked dependencies
         from app.api.papers import upload_paper
 
-        with patch('app.api.papers.models.Paper', return_value=mock_paper):
-            with patch('app.api.papers.models.Chunk'):
-                # Execute
-                await upload_paper(mock_pdf_file, mock_db)
-
-                # Assert - verify all services were called
-                assert mock_extract_text.called
-                assert mock_extract_metadata.called
-                mock_chunk_text.assert_called_once()
-                mock_generate_embeddings.assert_called_once()
+        # Execute
+        result = await upload_paper(mock_pdf_file, mock_db)
 
-                # Assert - verify database operations
-                assert mock_db.add.called
-                assert mock_db.flush.called
-                assert mock_db.commit.called
+        # Assert - file saved, job queued and returned
+        assert result is mock_job
+        mock_open.return_value.__enter__.return_value.write.assert_called_with(b"fake pdf content")
+        mock_submit_upload.assert_called_once()
+        args = mock_submit_upload.call_args[0]
+        assert args[0] is mock_db
+        assert args[1] == "test_paper.pdf"
+        assert args[2].endswith("_test_paper.pdf")
+        assert args[3] == hashlib.sha256(b"fake pdf content").hexdigest()
 
     @pytest.mark.asyncio
-    @patch('app.api.papers.extract_text_from_pdf')
+    @patch('app.api.papers.os.remove')
+    @patch('app.api.papers.submit_upload')
     @patch('app.api.papers.open')
-    @patch('app.api.papers.shutil.copyfileobj')
-    async def test_upload_paper_invalid_file_type(
+    async def test_upload_paper_duplicate_discards_new_copy(
         self,
-        mock_copyfileobj,
         mock_open,
-        mock_extract_text,
-        mock_db
+        mock_submit_upload,
+        mock_remove,
+        mock_pdf_file,
+        mock_db,
+        mock_job
     ):
-        """Test rejection of non-PDF files"""
-        # Create mock non-PDF file
-        file = Mock(spec=UploadFile)
-        file.filename = "document.docx"
-        file.file = BytesIO(b"fake content")
+        """Test that a duplicate upload returns the existing job and deletes the new file"""
+        mock_job.status = "done"
+        mock_job.paper_id = 3
+        mock_submit_upload.return_value = (mock_job, True)
 
         from app.api.papers import upload_paper
-        from fastapi import HTTPException
 
-        # Execute & Assert
-        with pytest.raises(HTTPException) as exc_info:
-            await upload_paper(file, mock_db)
+        result = await upload_paper(mock_pdf_file, mock_db)
 
-        assert exc_info.value.status_code == 400
-        assert "Only PDF files are allowed" in str(exc_info.value.detail)
+        assert result is mock_job
+        mock_remove.assert_called_once()
+        assert str(mock_remove.call_args[0][0]).endswith("_test_paper.pdf")
 
     @pytest.mark.asyncio
-    @patch('app.api.papers.Path.exists')
-    @patch('app.api.papers.extract_text_from_pdf')
+    @patch('app.api.papers.submit_upload')
     @patch('app.api.papers.open')
-    @patch('app.api.papers.shutil.copyfileobj')
-    @patch('app.api.papers.os.remove')
-    async def test_upload_paper_empty_pdf(
+    async def test_upload_paper_does_not_run_pipeline(
         self,
-        mock_remove,
-        mock_copyfileobj,
         mock_open,
-        mock_extract_text,
-        mock_exists,
+        mock_submit_upload,
         mock_pdf_file,
-        mock_db
+        mock_db,
+        mock_job
     ):
-        """Test handling of PDF with no extractable text"""
-        # Setup - PDF with no text
-        mock_extract_text.return_value = ""
-        mock_exists.return_value = True  # File exists for cleanup
+        """Test that no extraction or embedding work happens in the request"""
+        mock_submit_upload.return_value = (mock_job, False)
 
         from app.api.papers import upload_paper
-        from fastapi import HTTPException
 
-        # Execute & Assert
-        with pytest.raises(HTTPException) as exc_info:
+        with patch('app.services.ingestion.ingest_pdf') as mock_ingest:
             await upload_paper(mock_pdf_file, mock_db)
 
-        assert exc_info.value.status_code == 400
-        assert "No text could be extracted" in str(exc_info.value.detail)
-        # Verify cleanup was attempted
-        assert mock_remove.called
+        assert not mock_ingest.called
 
     @pytest.mark.asyncio
-    @patch('app.api.papers.Path.exists')
-    @patch('app.api.papers.chunk_text')
-    @patch('app.api.papers.extract_metadata_from_text', new_callable=AsyncMock)
-    @patch('app.api.papers.extract_text_from_pdf')
     @patch('app.api.papers.open')
-    @patch('app.api.papers.shutil.copyfileobj')
-    @patch('app.api.papers.os.remove')
-    async def test_upload_paper_no_chunks(
+    async def test_upload_paper_invalid_file_type(
         self,
-        mock_remove,
-        mock_copyfileobj,
         mock_open,
-        mock_extract_text,
-        mock_extract_metadata,
-        mock_chunk_text,
-        mock_exists,
-        mock_pdf_file,
-        mock_db,
-        sample_metadata
+        mock_db
     ):
-        """Test handling when chunking fails"""
-        # Setup
-        mock_extract_text.return_value = "Some text"
-        mock_extract_metadata.return_value = sample_metadata
-        mock_chunk_text.return_value = []  # No chunks created
-        mock_exists.return_value = True  # File exists for cleanup
+        """Test rejection of non-PDF files"""
+        # Create mock non-PDF file
+        file = Mock(spec=UploadFile)
+        file.filename = "document.docx"
+        file.file = BytesIO(b"fake content")
 
         from app.api.papers import upload_paper
         from fastapi import HTTPException
 
         # Execute & Assert
         with pytest.raises(HTTPException) as exc_info:
-            await upload_paper(mock_pdf_file, mock_db)
+            await upload_paper(file, mock_db)
 
         assert exc_info.value.status_code == 400
-        assert "Could not create chunks" in str(exc_info.value.detail)
-        assert mock_remove.called
+        assert "Only PDF files are allowed" in str(exc_info.value.detail)
+        assert not mock_open.called
 
     @pytest.mark.asyncio
     @patch('app.api.papers.Path.exists')
-    @patch('app.api.papers.generate_embeddings_batch', new_callable=AsyncMock)
-    @patch('app.api.papers.chunk_text')
-    @patch('app.api.papers.extract_metadata_from_text', new_callable=AsyncMock)
-    @patch('app.api.papers.extract_text_from_pdf')
+    @patch('app.api.papers.submit_upload')
     @patch('app.api.papers.open')
-    @patch('app.api.papers.shutil.copyfileobj')
     @patch('app.api.papers.os.remove')
-    async def test_upload_paper_embedding_failure(
+    async def test_upload_paper_enqueue_failure(
         self,
         mock_remove,
-        mock_copyfileobj,
         mock_open,
-        mock_extract_text,
-        mock_extract_metadata,
-        mock_chunk_text,
-        mock_generate_embeddings,
+        mock_submit_upload,
         mock_exists,
         mock_pdf_file,
-        mock_db,
-        sample_metadata,
-        sample_chunks
+        mock_db
     ):
-        """Test handling of embedding generation failure"""
-        # Setup
-        mock_extract_text.return_value = "Some text"
-        mock_extract_metadata.return_value = sample_metadata
-        mock_chunk_text.return_value = sample_chunks
-        mock_generate_embeddings.side_effect = Exception("API rate limit exceeded")
+        """Test handling of a database failure while queuing the job"""
+        mock_submit_upload.side_effect = Exception("database unavailable")
         mock_exists.return_value = True  # File exists for cleanup
 
         from app.api.papers import upload_paper
@@ -262,133 +162,19 @@ class TestUploadPaperEndpoint:
             await upload_paper(mock_pdf_file, mock_db)
 
         assert exc_info.value.status_code == 500
-        assert "Error processing PDF" in str(exc_info.value.detail)
+        assert "Error saving PDF" in str(exc_info.value.detail)
         assert mock_remove.called
         assert mock_db.rollback.called
 
     @pytest.mark.asyncio
-    @patch('app.api.papers.chunk_text')
-    @patch('app.api.papers.extract_metadata_from_text', new_callable=AsyncMock)
-    @patch('app.api.papers.extract_text_from_pdf')
-    @patch('app.api.papers.open')
-    @patch('app.api.papers.shutil.copyfileobj')
-    async def test_upload_paper_minimal_metadata(
-        self,
-        mock_copyfileobj,
-        mock_open,
-        mock_extract_text,
-        mock_extract_metadata,
-        mock_chunk_text,
-        mock_pdf_file,
-        mock_db,
-        sample_chunks
-    ):
-        """Test upload with minimal metadata (title only)"""
-        # Setup - minimal metadata
-        minimal_metadata = {
-            "title": "Untitled Paper"
-        }
-        mock_extract_text.return_value = "Some text content"
-        mock_extract_metadata.return_value = minimal_metadata
-        mock_chunk_text.return_value = sample_chunks
-
-        # Mock embeddings
-        with patch('app.api.papers.generate_embeddings_batch', new_callable=AsyncMock) as mock_embeddings:
-            mock_embeddings.return_value = [[0.1] * 1536] * len(sample_chunks)
-
-            mock_paper = Mock()
-            mock_paper.id = 1
-            mock_paper.title = "Untitled Paper"
-            mock_paper.authors = []
-            mock_paper.year = None
-            mock_paper.abstract = None
-            mock_paper.keywords = []
-            mock_paper.created_at = "2024-01-01T00:00:00"
-
-            from app.api.papers import upload_paper
-
-            with patch('app.api.papers.models.Paper', return_value=mock_paper):
-                with patch('app.api.papers.models.Chunk'):
-                    # Execute
-                    await upload_paper(mock_pdf_file, mock_db)
-
-                    # Assert - paper created with defaults
-                    assert mock_db.add.called
-                    assert mock_db.commit.called
-
-    @pytest.mark.asyncio
-    @patch('app.api.papers.generate_embeddings_batch', new_callable=AsyncMock)
-    @patch('app.api.papers.chunk_text')
-    @patch('app.api.papers.extract_metadata_from_text', new_callable=AsyncMock)
-    @patch('app.api.papers.extract_text_from_pdf')
-    @patch('app.api.papers.open')
-    @patch('app.api.papers.shutil.copyfileobj')
-    async def test_upload_paper_creates_correct_number_of_chunks(
-        self,
-        mock_copyfileobj,
-        mock_open,
-        mock_extract_text,
-        mock_extract_metadata,
-        mock_chunk_text,
-        mock_generate_embeddings,
-        mock_pdf_file,
-        mock_db,
-        sample_metadata,
-        sample_chunks,
-        sample_embeddings
-    ):
-        """Test that all chunks are saved to database"""
-        # Setup
-        mock_extract_text.return_value = "Full text"
-        mock_extract_metadata.return_value = sample_metadata
-        mock_chunk_text.return_value = sample_chunks
-        mock_generate_embeddings.return_value = sample_embeddings
-
-        mock_paper = Mock()
-        mock_paper.id = 1
-        mock_paper.title = sample_metadata["title"]
-        mock_paper.authors = sample_metadata["authors"]
-        mock_paper.year = sample_metadata["year"]
-        mock_paper.abstract = sample_metadata["abstract"]
-        mock_paper.keywords = sample_metadata["keywords"]
-        mock_paper.created_at = "2024-01-01T00:00:00"
-
-        chunk_records = []
-
-        def mock_chunk_init(*args, **kwargs):
-            chunk = Mock()
-            chunk.paper_id = kwargs.get('paper_id')
-            chunk.content = kwargs.get('content')
-            chunk.section_name = kwargs.get('section_name')
-            chunk.chunk_index = kwargs.get('chunk_index')
-            chunk.embedding = kwargs.get('embedding')
-            chunk_records.append(chunk)
-            return chunk
-
-        from app.api.papers import upload_paper
-
-        with patch('app.api.papers.models.Paper', return_value=mock_paper):
-            with patch('app.api.papers.models.Chunk', side_effect=mock_chunk_init):
-                # Execute
-                await upload_paper(mock_pdf_file, mock_db)
-
-                # Assert - correct number of chunks created
-                assert len(chunk_records) == len(sample_chunks)
-                # Verify each chunk has an embedding
-                for chunk in chunk_records:
-                    assert chunk.embedding is not None
-                    assert len(chunk.embedding) == 1536
-
-    @pytest.mark.asyncio
-    @patch('app.api.papers.extract_text_from_pdf')
+    @patch('app.api.papers.submit_upload')
     @patch('app.api.papers.open')
-    @patch('app.api.papers.shutil.copyfileobj')
     async def test_upload_paper_with_special_characters_in_filename(
         self,
-        mock_copyfileobj,
         mock_open,
-        mock_extract_text,
-        mock_db
+        mock_submit_upload,
+        mock_db,
+        mock_job
     ):
         """Test upload with special characters in filename"""
         # Create file with special characters
@@ -396,29 +182,11 @@ class TestUploadPaperEndpoint:
         file.filename = "paper (2023) [v2] - final.pdf"
         file.file = BytesIO(b"fake content")
 
-        mock_extract_text.return_value = "Some text"
-
-        with patch('app.api.papers.extract_metadata_from_text', new_callable=AsyncMock) as mock_metadata:
-            with patch('app.api.papers.chunk_text') as mock_chunk:
-                with patch('app.api.papers.generate_embeddings_batch', new_callable=AsyncMock):
-                    mock_metadata.return_value = {"title": "Test"}
-                    mock_chunk.return_value = [
-                        {"content": "text", "section_name": None, "chunk_index": 0}
-                    ]
+        mock_submit_upload.return_value = (mock_job, False)
 
-                    mock_paper = Mock()
-                    mock_paper.id = 1
-                    mock_paper.title = "Test"
-                    mock_paper.authors = []
-                    mock_paper.year = None
-                    mock_paper.abstract = None
-                    mock_paper.keywords = []
-                    mock_paper.created_at = "2024-01-01T00:00:00"
-
-                    from app.api.papers import upload_paper
+        from app.api.papers import upload_paper
 
-                    with patch('app.api.papers.models.Paper', return_value=mock_paper):
-                        with patch('app.api.papers.models.Chunk'):
-                            # Should not raise an exception
-                            result = await upload_paper(file, mock_db)
-                            assert result is not None
+        # Should not raise an exception
+        result = await upload_paper(file, mock_db)
+        assert result is not None
+        assert mock_submit_upload.call_args[0][1] == "paper (2023) [v2] - final.pdf"
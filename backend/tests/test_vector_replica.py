@@ -0,0 +1,296 @@
+"""
+Unit tests for the in-process vector replica
+"""
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from app.services.vector_replica import VectorReplica
+
+
+def live_ids(replica):
+    """Chunk ids a search can return, sorted"""
+    return sorted(replica.search([1.0, 0.0, 0.0], top_k=1000)[0].tolist())
+
+
+def papers_result(paper_ids):
+    result = Mock()
+    result.scalars.return_value.all.return_value = paper_ids
+    return result
+
+
+def chunks_result(rows):
+    result = Mock()
+    result.partitions.return_value = iter([rows]) if rows else iter([])
+    return result
+
+
+def chunk_row(chunk_id, paper_id, embedding):
+    return Mock(id=chunk_id, paper_id=paper_id, embedding=np.asarray(embedding, dtype=np.float32))
+
+
+@pytest.fixture
+def replica(tmp_path):
+    with patch('app.services.vector_replica.settings.VECTOR_REPLICA_SYNC_INTERVAL_S', 0):
+        yield VectorReplica(tmp_path / "replica", dimensions=3)
+
+
+class TestVectorReplicaSync:
+    """Test cases for following Postgres incrementally"""
+
+    def test_first_sync_loads_everything(self, replica):
+        """Test the initial full load"""
+        db = Mock()
+        db.execute.side_effect = [
+            papers_result([1, 2]),
+            chunks_result([
+                chunk_row(10, 1, [1, 0, 0]),
+                chunk_row(11, 1, [0, 2, 0]),
+                chunk_row(20, 2, [0, 0, 3])
+            ])
+        ]
+
+        assert replica.sync(db) is True
+
+        assert replica.ready
+        assert replica.size == 3
+        assert live_ids(replica) == [10, 11, 20]
+        # Rows are stored normalized
+        assert np.linalg.norm(replica.state.segments[0].matrix, axis=1) == pytest.approx([1, 1, 1])
+        # Even the first load only reads the chunks of the papers it recorded
+        assert "paper_id IN" in str(db.execute.call_args_list[1][0][0])
+
+    def test_incremental_add_and_remove(self, replica):
+        """Test that only new papers are loaded and deleted papers are dropped"""
+        db = Mock()
+        db.execute.side_effect = [
+            papers_result([1, 2]),
+            chunks_result([chunk_row(10, 1, [1, 0, 0]), chunk_row(20, 2, [0, 1, 0])]),
+            papers_result([2, 3]),
+            chunks_result([chunk_row(30, 3, [0, 0, 1])])
+        ]
+
+        replica.sync(db)
+        assert replica.sync(db) is True
+
+        assert live_ids(replica) == [20, 30]
+        assert replica.size == 2
+        assert replica.state.papers == frozenset({2, 3})
+        # New papers go to a new segment, deleted ones are masked: no segment is rebuilt
+        assert len(replica.state.segments) == 2
+        assert "paper_id IN" in str(db.execute.call_args_list[3][0][0])
+
+    def test_no_change(self, replica):
+        """Test that an unchanged paper set only costs one query"""
+        db = Mock()
+        db.execute.side_effect = [
+            papers_result([1]),
+            chunks_result([chunk_row(10, 1, [1, 0, 0])]),
+            papers_result([1])
+        ]
+
+        replica.sync(db)
+        assert replica.sync(db) is False
+        assert db.execute.call_count == 3
+
+    def test_sync_throttled(self, tmp_path):
+        """Test that syncs are skipped within the sync interval"""
+        replica = VectorReplica(tmp_path, dimensions=3)
+        db = Mock()
+        db.execute.side_effect = [papers_result([]), papers_result([])]
+
+        with patch('app.services.vector_replica.settings.VECTOR_REPLICA_SYNC_INTERVAL_S', 60):
+            replica.sync(db)
+            assert not replica.needs_sync()
+            replica.sync(db)
+
+        assert db.execute.call_count == 1
+
+    def test_remove_paper(self, replica):
+        """Test immediate removal after a delete in this process"""
+        db = Mock()
+        db.execute.side_effect = [
+            papers_result([1, 2]),
+            chunks_result([chunk_row(10, 1, [1, 0, 0]), chunk_row(20, 2, [0, 1, 0])])
+        ]
+        replica.sync(db)
+
+        segments = replica.state.segments
+
+        replica.remove_paper(1)
+
+        assert live_ids(replica) == [20]
+        assert 1 not in replica.state.papers
+        assert replica.state.segments is segments
+
+
+class TestVectorReplicaSearch:
+    """Test cases for replica search"""
+
+    @pytest.fixture
+    def loaded(self, replica):
+        rng = np.random.default_rng(0)
+        embeddings = rng.normal(size=(200, 3))
+        rows = [chunk_row(i, i % 4, embeddings[i]) for i in range(200)]
+        db = Mock()
+        db.execute.side_effect = [papers_result([0, 1, 2, 3]), chunks_result(rows)]
+        replica.sync(db)
+        return replica, embeddings
+
+    def test_matches_exact_cosine_ranking(self, loaded):
+        """Test that results equal a brute-force cosine ranking"""
+        replica, embeddings = loaded
+        query = np.array([0.3, -1.0, 0.5])
+
+        ids, distances = replica.search(query.tolist(), top_k=10)
+
+        cosine = embeddings @ query / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query))
+        expected = np.argsort(1 - cosine)[:10]
+        assert ids.tolist() == expected.tolist()
+        assert distances == pytest.approx(1 - cosine[expected], abs=1e-5)
+
+    def test_paper_filter_returns_top_k(self, loaded):
+        """Test that a paper filter still returns top_k rows from those papers"""
+        replica, _ = loaded
+
+        ids, _ = replica.search([1.0, 0.0, 0.0], top_k=15, paper_ids=[2])
+
+        assert len(ids) == 15
+        assert all(chunk_id % 4 == 2 for chunk_id in ids.tolist())
+
+    def test_empty_replica(self, replica):
+        """Test searching before anything was loaded"""
+        ids, distances = replica.search([1.0, 0.0, 0.0], top_k=5)
+
+        assert len(ids) == 0 and len(distances) == 0
+
+
+class TestVectorReplicaSnapshot:
+    """Test cases for memory-mapped snapshots"""
+
+    def test_snapshot_round_trip(self, replica, tmp_path):
+        """Test that another process can map the snapshot and catch up from it"""
+        db = Mock()
+        db.execute.side_effect = [
+            papers_result([1]),
+            chunks_result([chunk_row(10, 1, [1, 0, 0]), chunk_row(11, 1, [0, 1, 0])])
+        ]
+        replica.sync(db)
+        replica.save_snapshot()
+
+        other = VectorReplica(tmp_path / "replica", dimensions=3)
+        assert other.load_snapshot() is True
+
+        assert isinstance(other.state.segments[0].matrix, np.memmap)
+        assert live_ids(other) == [10, 11]
+        assert other.state.papers == frozenset({1})
+        assert other.search([0.0, 1.0, 0.0], top_k=1)[0].tolist() == [11]
+
+    def test_old_snapshots_are_removed(self, replica):
+        """Test that superseded snapshots are removed after the grace period"""
+        for _ in range(3):
+            replica.save_snapshot()
+        assert len(list(replica.directory.glob("snapshot-*"))) == 3
+
+        with patch('app.services.vector_replica.SNAPSHOT_GRACE_S', -1):
+            replica.save_snapshot()
+
+        assert len(list(replica.directory.glob("snapshot-*"))) == 1
+        current = (replica.directory / "CURRENT").read_text()
+        assert (replica.directory / current).exists()
+
+    def test_snapshot_is_written_without_removed_rows_and_mapped(self, replica):
+        """Test that the writer compacts its segments into the snapshot and maps it"""
+        db = Mock()
+        db.execute.side_effect = [
+            papers_result([1, 2]),
+            chunks_result([chunk_row(10, 1, [1, 0, 0]), chunk_row(20, 2, [0, 1, 0])]),
+            papers_result([2, 3]),
+            chunks_result([chunk_row(30, 3, [0, 0, 1])])
+        ]
+        replica.sync(db)
+        replica.sync(db)
+
+        assert replica.save_snapshot() is True
+
+        assert len(replica.state.segments) == 1
+        assert isinstance(replica.state.segments[0].matrix, np.memmap)
+        assert replica.state.segments[0].ids.tolist() == [20, 30]
+        assert replica.state.removed == frozenset()
+
+    def test_single_writer(self, replica, tmp_path):
+        """Test that only one process writes snapshots to a directory"""
+        assert replica.save_snapshot() is True
+        other = VectorReplica(tmp_path / "replica", dimensions=3)
+
+        assert other.save_snapshot() is False
+        assert len(list(replica.directory.glob("snapshot-*"))) == 1
+
+    def test_reader_follows_writer_snapshots(self, replica, tmp_path):
+        """Test that a reader maps the new snapshot of the writer, then appends to it"""
+        replica.save_snapshot()
+        reader = VectorReplica(tmp_path / "replica", dimensions=3)
+        reader.load_snapshot()
+        db = Mock()
+        db.execute.side_effect = [
+            papers_result([1]),
+            chunks_result([chunk_row(10, 1, [1, 0, 0])])
+        ]
+        replica.sync(db)
+        replica.save_snapshot()
+
+        db.execute.side_effect = [papers_result([1, 2]), chunks_result([chunk_row(20, 2, [0, 1, 0])])]
+        with patch('app.services.vector_replica.settings.VECTOR_REPLICA_SYNC_INTERVAL_S', 0):
+            reader.sync(db)
+
+        mapped, added = reader.state.segments
+        assert isinstance(mapped.matrix, np.memmap)
+        assert mapped.ids.tolist() == [10]
+        assert added.ids.tolist() == [20]
+        # Only the paper missing from the snapshot was loaded
+        assert "paper_id IN" in str(db.execute.call_args_list[-1][0][0])
+
+    def test_no_snapshot(self, tmp_path):
+        """Test starting without a snapshot"""
+        assert VectorReplica(tmp_path, dimensions=3).load_snapshot() is False
+
+    def test_wrong_dimensions_ignored(self, replica, tmp_path):
+        """Test that a snapshot from another embedding model is not used"""
+        replica.save_snapshot()
+
+        assert VectorReplica(tmp_path / "replica", dimensions=1536).load_snapshot() is False
+
+
+class TestVectorSearchWithReplica:
+    """Test cases for vector_search served by the replica"""
+
+    @pytest.mark.asyncio
+    async def test_vector_search_uses_replica(self, replica):
+        """Test that only the top_k rows are read from Postgres"""
+        db = Mock()
+        db.execute.side_effect = [
+            papers_result([1]),
+            chunks_result([chunk_row(10, 1, [1, 0, 0]), chunk_row(11, 1, [0, 1, 0])])
+        ]
+        replica.sync(db)
+
+        detail_row = Mock(id=11, content="text", section_name=None, paper_id=1, title="Paper", authors=[], year=2024)
+        search_db = AsyncMock()
+        search_db.execute.return_value = Mock()
+        search_db.execute.return_value.fetchall.return_value = [detail_row]
+
+        from app.services.vector_store import vector_search
+
+        async def run_inline(func, *args):
+            return func(*args)
+
+        with patch('app.services.vector_store.settings.VECTOR_REPLICA_ENABLED', True):
+            with patch('app.services.vector_store.get_vector_replica', return_value=replica):
+                with patch('app.services.vector_replica.settings.VECTOR_REPLICA_SYNC_INTERVAL_S', 60):
+                    with patch('app.services.vector_store.run_blocking_io', side_effect=run_inline) as mock_io:
+                        result = await vector_search(db=search_db, query_embedding=[0.0, 1.0, 0.0], top_k=1)
+
+        assert [r["chunk_id"] for r in result] == [11]
+        # The ranking runs in the I/O pool, not on the event loop
+        assert mock_io.call_args[0][0] == replica.search
+        assert result[0]["similarity_score"] == pytest.approx(1.0)
+        search_db.execute.assert_called_once()
@@ -1,9 +1,11 @@
 """
 Unit tests for vector search service
 """
+import struct
+import numpy as np
 import pytest
-from unittest.mock import Mock
-from app.services.vector_store import vector_search
+from unittest.mock import AsyncMock, Mock, patch
+from app.services.vector_store import vector_search, bulk_insert_chunks, COPY_CHUNKS_SQL
 
 
 class TestVectorSearch:
@@ -13,7 +15,7 @@ class TestVectorSearch:
     async def test_vector_search_success(self):
         """Test successful vector search with results"""
         # Setup mock database session
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         # Create mock query results
         mock_row_1 = Mock()
@@ -70,9 +72,10 @@ class TestVectorSearch:
     async def test_vector_search_with_paper_ids_filter(self):
         """Test vector search with paper IDs filter"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_result = Mock()
         mock_result.fetchall.return_value = []
+        mock_result.scalar.return_value = 0
         mock_db.execute.return_value = mock_result
 
         # Execute with paper_ids filter
@@ -84,15 +87,17 @@ class TestVectorSearch:
             paper_ids=[1, 2, 3]
         )
 
-        # Assert
+        # Assert - the filter is planned from the number of selected chunks
         assert isinstance(result, list)
-        mock_db.execute.assert_called_once()
+        count_query = str(mock_db.execute.call_args_list[0][0][0])
+        assert "count" in count_query.lower()
+        assert "paper_id IN" in count_query
 
     @pytest.mark.asyncio
     async def test_vector_search_empty_results(self):
         """Test vector search with no results"""
         # Setup mock with empty results
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_result = Mock()
         mock_result.fetchall.return_value = []
         mock_db.execute.return_value = mock_result
@@ -113,7 +118,7 @@ class TestVectorSearch:
     async def test_vector_search_custom_top_k(self):
         """Test vector search with custom top_k parameter"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_rows = []
         for i in range(10):
             mock_row = Mock()
@@ -147,7 +152,7 @@ class TestVectorSearch:
     async def test_vector_search_similarity_score_calculation(self):
         """Test that similarity scores are correctly calculated from distances"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         mock_row = Mock()
         mock_row.id = 1
@@ -178,7 +183,7 @@ class TestVectorSearch:
     async def test_vector_search_with_none_section_name(self):
         """Test vector search when section_name is None"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         mock_row = Mock()
         mock_row.id = 1
@@ -210,7 +215,7 @@ class TestVectorSearch:
     async def test_vector_search_with_empty_authors(self):
         """Test vector search with papers that have no authors"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         mock_row = Mock()
         mock_row.id = 1
@@ -241,7 +246,7 @@ class TestVectorSearch:
     async def test_vector_search_with_multiple_paper_ids(self):
         """Test vector search filtering by multiple paper IDs"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         # Create results that would come from papers 1, 2, 3
         mock_rows = []
@@ -259,6 +264,8 @@ class TestVectorSearch:
 
         mock_result = Mock()
         mock_result.fetchall.return_value = mock_rows
+        # Many chunks in the selected papers: filtered index search
+        mock_result.scalar.return_value = 100000
         mock_db.execute.return_value = mock_result
 
         # Execute with specific paper_ids
@@ -266,7 +273,7 @@ class TestVectorSearch:
         result = await vector_search(
             db=mock_db,
             query_embedding=query_embedding,
-            top_k=10,
+            top_k=3,
             paper_ids=[1, 2, 3]
         )
 
@@ -278,7 +285,7 @@ class TestVectorSearch:
     async def test_vector_search_result_structure(self):
         """Test that result structure contains all required fields"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         mock_row = Mock()
         mock_row.id = 1
@@ -315,7 +322,7 @@ class TestVectorSearch:
     async def test_vector_search_with_high_similarity(self):
         """Test vector search with very high similarity (low distance)"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         mock_row = Mock()
         mock_row.id = 1
@@ -346,7 +353,7 @@ class TestVectorSearch:
     async def test_vector_search_with_low_similarity(self):
         """Test vector search with low similarity (high distance)"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         mock_row = Mock()
         mock_row.id = 1
@@ -377,7 +384,7 @@ class TestVectorSearch:
     async def test_vector_search_default_parameters(self):
         """Test vector search with default parameters"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
         mock_result = Mock()
         mock_result.fetchall.return_value = []
         mock_db.execute.return_value = mock_result
@@ -397,7 +404,7 @@ class TestVectorSearch:
     async def test_vector_search_with_special_characters_in_content(self):
         """Test vector search with special characters in chunk content"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         mock_row = Mock()
         mock_row.id = 1
@@ -429,7 +436,7 @@ class TestVectorSearch:
     async def test_vector_search_with_none_year(self):
         """Test vector search when year is None"""
         # Setup mock
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         mock_row = Mock()
         mock_row.id = 1
@@ -461,7 +468,7 @@ class TestVectorSearch:
     async def test_vector_search_ordering(self):
         """Test that results are ordered by similarity (distance ascending)"""
         # Setup mock with results in specific order
-        mock_db = Mock()
+        mock_db = AsyncMock()
 
         # Create rows with increasing distances
         mock_rows = []
@@ -494,3 +501,315 @@ class TestVectorSearch:
         similarities = [r["similarity_score"] for r in result]
         assert similarities == [0.9, 0.8, 0.7, 0.6, 0.5]
         assert similarities == sorted(similarities, reverse=True)
+
+
+class TestSearchTuning:
+    """Test cases for per-query ANN index tuning"""
+
+    @staticmethod
+    def make_db():
+        db = AsyncMock()
+        db.execute.return_value = Mock()
+        db.execute.return_value.fetchall.return_value = []
+        return db
+
+    @pytest.mark.asyncio
+    async def test_explicit_ef_search_is_set_before_search(self):
+        """Test that ef_search is applied in the transaction before the search query"""
+        mock_db = self.make_db()
+
+        await vector_search(db=mock_db, query_embedding=[0.1] * 1536, top_k=5, ef_search=100)
+
+        assert mock_db.execute.call_count == 2
+        tuning_sql = str(mock_db.execute.call_args_list[0][0][0])
+        assert "set_config('hnsw.ef_search', :value_0, true)" in tuning_sql
+        assert mock_db.execute.call_args_list[0][0][1] == {"value_0": "100"}
+
+    @pytest.mark.asyncio
+    async def test_probes_from_settings(self):
+        """Test that IVFFlat probes come from the settings when not given"""
+        mock_db = self.make_db()
+
+        with patch('app.services.vector_store.settings.IVFFLAT_PROBES', 10):
+            await vector_search(db=mock_db, query_embedding=[0.1] * 1536, top_k=5)
+
+        tuning_sql = str(mock_db.execute.call_args_list[0][0][0])
+        assert "ivfflat.probes" in tuning_sql
+        assert "hnsw.ef_search" not in tuning_sql
+        assert mock_db.execute.call_args_list[0][0][1] == {"value_0": "10"}
+
+    @pytest.mark.asyncio
+    async def test_ef_search_raised_to_top_k(self):
+        """Test that HNSW can return top_k rows when top_k exceeds ef_search"""
+        mock_db = self.make_db()
+
+        await vector_search(db=mock_db, query_embedding=[0.1] * 1536, top_k=60, ef_search=20)
+
+        assert mock_db.execute.call_args_list[0][0][1] == {"value_0": "60"}
+
+    @pytest.mark.asyncio
+    async def test_server_defaults_run_single_query(self):
+        """Test that nothing extra is executed when the server defaults apply"""
+        mock_db = self.make_db()
+
+        await vector_search(db=mock_db, query_embedding=[0.1] * 1536, top_k=5)
+
+        mock_db.execute.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_both_parameters(self):
+        """Test setting ef_search and probes in one statement"""
+        mock_db = self.make_db()
+
+        await vector_search(db=mock_db, query_embedding=[0.1] * 1536, top_k=5, ef_search=80, probes=4)
+
+        tuning_sql = str(mock_db.execute.call_args_list[0][0][0])
+        assert "hnsw.ef_search" in tuning_sql and "ivfflat.probes" in tuning_sql
+        assert mock_db.execute.call_args_list[0][0][1] == {"value_0": "80", "value_1": "4"}
+
+
+class TestFilteredSearchPlanner:
+    """Test cases for vector searches scoped by paper_ids"""
+
+    @staticmethod
+    def make_row(chunk_id, paper_id, distance=None, embedding=None):
+        row = Mock()
+        row.id = chunk_id
+        row.content = f"Chunk {chunk_id}"
+        row.section_name = "Section"
+        row.paper_id = paper_id
+        row.title = f"Paper {paper_id}"
+        row.authors = []
+        row.year = 2024
+        row.distance = distance
+        row.embedding = embedding
+        return row
+
+    @staticmethod
+    def results(rows=None, count=None):
+        result = Mock()
+        result.fetchall.return_value = rows or []
+        result.scalar.return_value = count
+        return result
+
+    @pytest.mark.asyncio
+    async def test_no_chunks_in_selected_papers(self):
+        """Test that an empty selection returns without searching"""
+        mock_db = AsyncMock()
+        mock_db.execute.return_value = self.results(count=0)
+
+        result = await vector_search(db=mock_db, query_embedding=[0.1] * 3, top_k=5, paper_ids=[1])
+
+        assert result == []
+        mock_db.execute.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_small_selection_ranked_exactly(self):
+        """Test that few selected chunks are ranked exactly by Postgres, without the ANN index"""
+        rows = [self.make_row(2, 1, distance=0.1), self.make_row(3, 2, distance=0.3)]
+        mock_db = AsyncMock()
+        mock_db.execute.side_effect = [
+            self.results(count=4),
+            self.results(rows=rows)
+        ]
+
+        result = await vector_search(db=mock_db, query_embedding=[1.0, 0.2, 0.0], top_k=2, paper_ids=[1, 2])
+
+        assert [r["chunk_id"] for r in result] == [2, 3]
+        assert result[0]["similarity_score"] == pytest.approx(0.9)
+        exact_query = str(mock_db.execute.call_args_list[1][0][0])
+        # The CTE keeps the ORDER BY off the ANN index, only top_k rows come back
+        assert "MATERIALIZED" in exact_query
+        assert "LIMIT" in exact_query
+        assert "chunks.content" in exact_query
+        assert mock_db.execute.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_broad_selection_uses_iterative_index_scan(self):
+        """Test that large selections go through the index with iterative scans"""
+        rows = [self.make_row(i, 1, distance=d) for i, d in [(1, 0.2), (2, 0.1), (3, 0.3)]]
+        mock_db = AsyncMock()
+        mock_db.execute.side_effect = [
+            self.results(count=100000),
+            self.results(),  # set_config
+            self.results(rows=rows)
+        ]
+
+        with patch('app.services.vector_store.settings.VECTOR_EXACT_SEARCH_MAX_CHUNKS', 1000):
+            result = await vector_search(db=mock_db, query_embedding=[0.1] * 3, top_k=3, paper_ids=[1])
+
+        tuning_sql = str(mock_db.execute.call_args_list[1][0][0])
+        assert "hnsw.iterative_scan" in tuning_sql
+        # Relaxed order is re-sorted
+        assert [r["chunk_id"] for r in result] == [2, 1, 3]
+        assert mock_db.execute.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_too_few_index_results_fall_back_to_exact_scan(self):
+        """Test that top_k results come back even when the index misses filtered rows"""
+        index_rows = [self.make_row(1, 1, distance=0.2)]
+        exact_rows = [self.make_row(i, 1, distance=0.1 * i) for i in range(1, 4)]
+        mock_db = AsyncMock()
+        mock_db.execute.side_effect = [
+            self.results(count=100000),
+            self.results(),  # set_config (tuning)
+            self.results(rows=index_rows),
+            self.results(rows=exact_rows)
+        ]
+
+        with patch('app.services.vector_store.settings.VECTOR_EXACT_SEARCH_MAX_CHUNKS', 1000):
+            result = await vector_search(db=mock_db, query_embedding=[0.1] * 3, top_k=3, paper_ids=[1])
+
+        assert [r["chunk_id"] for r in result] == [1, 2, 3]
+        # Distinct SQL instead of a planner setting: cached plans cannot reuse the ANN scan
+        fallback_sql = str(mock_db.execute.call_args_list[3][0][0])
+        assert "MATERIALIZED" in fallback_sql
+        assert not any("enable_indexscan" in str(call[0][0]) for call in mock_db.execute.call_args_list)
+        assert mock_db.execute.call_count == 4
+
+
+class TestBinaryRerank:
+    """Test cases for the binary prefilter + exact rerank search"""
+
+    make_row = staticmethod(TestFilteredSearchPlanner.make_row)
+    results = staticmethod(TestFilteredSearchPlanner.results)
+
+    def test_embedding_bits_not_created_with_the_table(self):
+        """Test that create_all leaves the generated column to the gated migration"""
+        from app.models import Chunk
+
+        assert "embedding_bits" not in Chunk.__table__.c
+        assert "embedding" in Chunk.__table__.c
+
+    @pytest.mark.asyncio
+    async def test_unfiltered_search_is_two_stage(self):
+        """Test that the Hamming scan over-fetches and the cosine rerank limits to top_k"""
+        rows = [self.make_row(1, 1, distance=0.1), self.make_row(2, 1, distance=0.2)]
+        mock_db = AsyncMock()
+        mock_db.execute.return_value = self.results(rows=rows)
+
+        with patch('app.services.vector_store.settings.VECTOR_BINARY_RERANK', True), \
+             patch('app.services.vector_store.settings.VECTOR_BINARY_OVERFETCH', 8):
+            result = await vector_search(db=mock_db, query_embedding=[0.1] * 3, top_k=2)
+
+        assert [r["chunk_id"] for r in result] == [1, 2]
+        mock_db.execute.assert_called_once()  # No ANN tuning
+        query = mock_db.execute.call_args[0][0]
+        sql = str(query)
+        assert "<~>" in sql
+        assert "binary_quantize" in sql
+        limits = [value for value in query.compile().params.values() if isinstance(value, int)]
+        assert 16 in limits  # top_k * overfetch candidates
+        assert 2 in limits
+
+    @pytest.mark.asyncio
+    async def test_overfetch_argument_overrides_settings(self):
+        """Test that the over-fetch factor can be set per query"""
+        mock_db = AsyncMock()
+        mock_db.execute.return_value = self.results()
+
+        with patch('app.services.vector_store.settings.VECTOR_BINARY_RERANK', True):
+            await vector_search(db=mock_db, query_embedding=[0.1] * 3, top_k=5, overfetch=3)
+
+        params = mock_db.execute.call_args[0][0].compile().params.values()
+        assert 15 in [value for value in params if isinstance(value, int)]
+
+    @pytest.mark.asyncio
+    async def test_broad_selection_filters_during_hamming_scan(self):
+        """Test that large paper_ids selections use the two-stage search"""
+        mock_db = AsyncMock()
+        mock_db.execute.side_effect = [
+            self.results(count=100000),
+            self.results(rows=[self.make_row(1, 1, distance=0.1)])
+        ]
+
+        with patch('app.services.vector_store.settings.VECTOR_BINARY_RERANK', True), \
+             patch('app.services.vector_store.settings.VECTOR_EXACT_SEARCH_MAX_CHUNKS', 1000):
+            result = await vector_search(db=mock_db, query_embedding=[0.1] * 3, top_k=1, paper_ids=[1])
+
+        assert len(result) == 1
+        sql = str(mock_db.execute.call_args_list[1][0][0])
+        assert "<~>" in sql
+        assert "chunks.paper_id IN" in sql
+        assert mock_db.execute.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_small_selection_still_ranked_exactly(self):
+        """Test that selections small enough for exact ranking skip the prefilter"""
+        mock_db = AsyncMock()
+        mock_db.execute.side_effect = [self.results(count=2), self.results()]
+
+        with patch('app.services.vector_store.settings.VECTOR_BINARY_RERANK', True):
+            result = await vector_search(db=mock_db, query_embedding=[0.1] * 3, top_k=1, paper_ids=[1])
+
+        assert result == []
+        assert "<~>" not in str(mock_db.execute.call_args_list[1][0][0])
+
+
+def decode_copy_rows(data: bytes):
+    """Parses a binary COPY stream into lists of raw field values (None for NULL)"""
+    assert data[:11] == b"PGCOPY\n\xff\r\n\x00"
+    offset = 19
+    rows = []
+    while True:
+        (nb_fields,) = struct.unpack_from(">h", data, offset)
+        offset += 2
+        if nb_fields == -1:
+            assert offset == len(data)
+            return rows
+        row = []
+        for _ in range(nb_fields):
+            (length,) = struct.unpack_from(">i", data, offset)
+            offset += 4
+            if length == -1:
+                row.append(None)
+            else:
+                row.append(data[offset:offset + length])
+                offset += length
+        rows.append(row)
+
+
+class TestBulkInsertChunks:
+    """Test cases for bulk_insert_chunks"""
+
+    def test_copies_rows_in_binary_format(self):
+        """Test that all chunks are sent in one binary COPY with pgvector's binary vectors"""
+        cursor = Mock()
+        sent = {}
+        cursor.copy_expert.side_effect = lambda sql, buffer: sent.update(sql=sql, data=buffer.read())
+        db = Mock()
+        db.connection.return_value.connection.cursor.return_value = cursor
+        chunks = [
+            {"content": "Intro é", "section_name": "Introduction", "chunk_index": 0},
+            {"content": "No section", "chunk_index": 1}
+        ]
+        embeddings = [[0.5, -1.0, 2.0], None]
+
+        stats = bulk_insert_chunks(db, 42, chunks, embeddings)
+
+        assert sent["sql"] == COPY_CHUNKS_SQL
+        rows = decode_copy_rows(sent["data"])
+        assert len(rows) == 2
+        paper_id, content, section, chunk_index, embedding = rows[0]
+        assert struct.unpack(">i", paper_id) == (42,)
+        assert content.decode("utf-8") == "Intro é"
+        assert section == b"Introduction"
+        assert struct.unpack(">i", chunk_index) == (0,)
+        assert struct.unpack(">HH", embedding[:4]) == (3, 0)
+        assert np.frombuffer(embedding[4:], dtype=">f4").tolist() == [0.5, -1.0, 2.0]
+        assert rows[1][2] is None and rows[1][4] is None
+        cursor.close.assert_called_once()
+        assert stats["rows"] == 2
+        assert stats["bytes"] == len(sent["data"])
+
+    def test_closes_cursor_on_error(self):
+        """Test that a failed COPY closes the cursor and propagates the error"""
+        cursor = Mock()
+        cursor.copy_expert.side_effect = Exception("copy failed")
+        db = Mock()
+        db.connection.return_value.connection.cursor.return_value = cursor
+
+        with pytest.raises(Exception, match="copy failed"):
+            bulk_insert_chunks(db, 1, [{"content": "x", "chunk_index": 0}], [[0.1]])
+
+        cursor.close.assert_called_once()
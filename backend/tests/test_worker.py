@@ -0,0 +1,172 @@
+"""
+Unit tests for the background ingestion worker
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+from app.worker import process_job, run_worker
+
+
+class TestProcessJob:
+    """Test cases for process_job function"""
+
+    @pytest.fixture
+    def job(self):
+        job = Mock()
+        job.id = 1
+        job.filename = "test_paper.pdf"
+        job.pdf_path = "uploads/20240101_000000_test_paper.pdf"
+        job.content_hash = "abc123"
+        job.attempts = 1
+        job.max_attempts = 3
+        return job
+
+    @pytest.mark.asyncio
+    @patch('app.worker.complete_job')
+    @patch('app.worker.ingest_pdf', new_callable=AsyncMock)
+    async def test_process_job_success(self, mock_ingest, mock_complete, job):
+        """Test that a successful ingestion completes the job"""
+        mock_db = Mock()
+        mock_paper = Mock()
+        mock_paper.id = 5
+        mock_paper.pdf_path = job.pdf_path
+        mock_ingest.return_value = mock_paper
+
+        await process_job(mock_db, job, "host:1")
+
+        mock_ingest.assert_called_once_with(mock_db, job.pdf_path, job.filename, "abc123")
+        mock_complete.assert_called_once_with(mock_db, job, "host:1", 5, pdf_path=None)
+
+    @pytest.mark.asyncio
+    @patch('app.worker.Path')
+    @patch('app.worker.complete_job')
+    @patch('app.worker.ingest_pdf', new_callable=AsyncMock)
+    async def test_process_job_duplicate_links_existing_paper(
+        self, mock_ingest, mock_complete, mock_path, job
+    ):
+        """Test that a job for an already indexed file drops its copy of the PDF"""
+        mock_db = Mock()
+        uploaded_path = job.pdf_path
+        mock_paper = Mock()
+        mock_paper.id = 2
+        mock_paper.pdf_path = "uploads/20230101_000000_original.pdf"
+        mock_ingest.return_value = mock_paper
+
+        await process_job(mock_db, job, "host:1")
+
+        mock_path.assert_called_once_with(uploaded_path)
+        mock_path.return_value.unlink.assert_called_once_with(missing_ok=True)
+        mock_complete.assert_called_once_with(mock_db, job, "host:1", 2, pdf_path=mock_paper.pdf_path)
+
+    @pytest.mark.asyncio
+    @patch('app.worker.fail_job')
+    @patch('app.worker.ingest_pdf', new_callable=AsyncMock)
+    async def test_process_job_unusable_pdf(self, mock_ingest, mock_fail, job):
+        """Test that unusable PDFs fail without retry"""
+        mock_db = Mock()
+        mock_ingest.side_effect = ValueError("No text could be extracted from the PDF")
+
+        await process_job(mock_db, job, "host:1")
+
+        mock_fail.assert_called_once_with(
+            mock_db, job, "host:1", "No text could be extracted from the PDF", retryable=False
+        )
+
+    @pytest.mark.asyncio
+    @patch('app.worker.fail_job')
+    @patch('app.worker.ingest_pdf', new_callable=AsyncMock)
+    async def test_process_job_transient_error(self, mock_ingest, mock_fail, job):
+        """Test that other errors are recorded as retryable"""
+        mock_db = Mock()
+        mock_ingest.side_effect = Exception("API rate limit exceeded")
+
+        await process_job(mock_db, job, "host:1")
+
+        mock_fail.assert_called_once_with(mock_db, job, "host:1", "API rate limit exceeded")
+
+    @pytest.mark.asyncio
+    @patch('app.worker.settings.INGESTION_LEASE_RENEWAL_S', 0.01)
+    @patch('app.worker.run_blocking_io', new_callable=AsyncMock)
+    @patch('app.worker.complete_job')
+    @patch('app.worker.ingest_pdf', new_callable=AsyncMock)
+    async def test_process_job_renews_lease(self, mock_ingest, mock_complete, mock_run_blocking_io, job):
+        """Test that the lease is renewed while the pipeline runs, and no longer after"""
+        mock_paper = Mock()
+        mock_paper.id = 5
+        mock_paper.pdf_path = job.pdf_path
+
+        async def slow_ingest(*args):
+            await asyncio.sleep(0.05)
+            return mock_paper
+
+        mock_ingest.side_effect = slow_ingest
+
+        await process_job(Mock(), job, "host:1")
+        nb_renewals = mock_run_blocking_io.call_count
+        await asyncio.sleep(0.03)
+
+        assert nb_renewals >= 1
+        assert mock_run_blocking_io.call_args[0][1:] == (1, "host:1")
+        assert mock_run_blocking_io.call_count == nb_renewals
+
+    @pytest.mark.asyncio
+    @patch('app.worker.Path')
+    @patch('app.worker.complete_job', return_value=False)
+    @patch('app.worker.ingest_pdf', new_callable=AsyncMock)
+    async def test_process_job_reclaimed_before_completion(self, mock_ingest, mock_complete, mock_path, job):
+        """Test that the uploaded copy is kept when the job was reclaimed meanwhile"""
+        mock_paper = Mock()
+        mock_paper.id = 2
+        mock_paper.pdf_path = "uploads/20230101_000000_original.pdf"
+        mock_ingest.return_value = mock_paper
+
+        await process_job(Mock(), job, "host:1")
+
+        mock_complete.assert_called_once()
+        assert not mock_path.called
+
+    @pytest.mark.asyncio
+    @patch('app.worker.settings.INGESTION_LEASE_RENEWAL_S', 0.01)
+    @patch('app.worker.run_blocking_io', new_callable=AsyncMock, return_value=False)
+    @patch('app.worker.fail_job')
+    @patch('app.worker.complete_job')
+    @patch('app.worker.ingest_pdf', new_callable=AsyncMock)
+    async def test_process_job_lease_lost(self, mock_ingest, mock_complete, mock_fail, mock_run_blocking_io, job):
+        """Test that the pipeline is cancelled and nothing is written once the lease is lost"""
+        cancelled = asyncio.Event()
+
+        async def long_ingest(*args):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        mock_ingest.side_effect = long_ingest
+        mock_db = Mock()
+
+        await asyncio.wait_for(process_job(mock_db, job, "host:1"), timeout=1)
+
+        assert cancelled.is_set()
+        mock_db.rollback.assert_called_once()
+        assert not mock_complete.called
+        assert not mock_fail.called
+
+
+class TestRunWorker:
+    """Test cases for the polling loop"""
+
+    @pytest.mark.asyncio
+    @patch('app.worker.claim_next_job')
+    @patch('app.worker.maybe_evict')
+    @patch('app.worker.SessionLocal')
+    async def test_cache_eviction_runs_in_the_worker(self, mock_session_local, mock_evict, mock_claim):
+        """Test that the worker loop drives embedding cache eviction"""
+        stop = asyncio.Event()
+        mock_claim.side_effect = lambda db, worker_id: stop.set()
+
+        await run_worker("host:1", stop)
+
+        db = mock_session_local.return_value
+        mock_evict.assert_called_once_with(db)
+        db.close.assert_called_once()
@@ -15,6 +15,9 @@ export class ChatPageComponent implements OnInit {
   // Conversation management
   currentConversationId: number | null = null;
   messages: Message[] = [];
+  // Cursor of the messages before the loaded ones (null once the first message is loaded)
+  messagesCursor: string | null = null;
+  loadingEarlier = false;
   conversations: ConversationListItem[] = [];
   showConversationList = true;
 
@@ -37,12 +40,14 @@ export class ChatPageComponent implements OnInit {
 
   selectConversation(conversationId: number) {
     this.currentConversationId = conversationId;
+    this.messagesCursor = null;
     this.error = null;
     this.loading = true;
 
     this.apiService.getConversation(conversationId).subscribe({
       next: (conversation) => {
         this.messages = conversation.messages;
+        this.messagesCursor = conversation.next_messages_cursor || null;
         this.loading = false;
       },
       error: (err) => {
@@ -53,9 +58,35 @@ export class ChatPageComponent implements OnInit {
     });
   }
 
+  loadEarlierMessages() {
+    const conversationId = this.currentConversationId;
+    if (!conversationId || !this.messagesCursor || this.loadingEarlier) {
+      return;
+    }
+
+    this.loadingEarlier = true;
+
+    this.apiService.listMessages(conversationId, this.messagesCursor).subscribe({
+      next: (page) => {
+        // Ignore the page if another conversation was opened meanwhile
+        if (this.currentConversationId === conversationId) {
+          this.messages = [...page.messages, ...this.messages];
+          this.messagesCursor = page.next_cursor;
+        }
+        this.loadingEarlier = false;
+      },
+      error: (err) => {
+        console.error('Error loading earlier messages:', err);
+        this.error = 'Erreur lors du chargement des messages précédents';
+        this.loadingEarlier = false;
+      }
+    });
+  }
+
   newConversation() {
     this.currentConversationId = null;
     this.messages = [];
+    this.messagesCursor = null;
     this.error = null;
 
     // Hide conversation list on mobile to show we're in a new conversation
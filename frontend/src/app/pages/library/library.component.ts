@@ -25,7 +25,7 @@ export class LibraryPageComponent implements OnInit {
   loadPapers() {
     this.loading = true;
 
-    this.apiService.listPapers(0, 100).subscribe({
+    this.apiService.listPapers(undefined, 100).subscribe({
       next: (papers) => {
         this.papers = papers;
         this.loading = false;
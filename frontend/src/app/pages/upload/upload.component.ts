@@ -1,5 +1,7 @@
 import { Component } from '@angular/core';
-import { ApiService } from '../../services/api.service';
+import { ApiService, IngestionJob } from '../../services/api.service';
+
+const JOB_POLL_INTERVAL_MS = 2000;
 
 @Component({
   selector: 'app-upload',
@@ -35,11 +37,9 @@ export class UploadPageComponent {
     this.uploadSuccess = false;
 
     this.apiService.uploadPaper(this.selectedFile).subscribe({
-      next: (response) => {
-        this.uploading = false;
-        this.uploadSuccess = true;
-        this.selectedFile = null;
-        console.log('Upload successful:', response);
+      next: (job) => {
+        console.log('Upload queued:', job);
+        this.waitForJob(job);
       },
       error: (error) => {
         this.uploading = false;
@@ -48,4 +48,30 @@ export class UploadPageComponent {
       }
     });
   }
+
+  // Indexing runs in the background workers: poll the job until it finishes
+  private waitForJob(job: IngestionJob) {
+    if (job.status === 'done') {
+      this.uploading = false;
+      this.uploadSuccess = true;
+      this.selectedFile = null;
+      return;
+    }
+    if (job.status === 'failed') {
+      this.uploading = false;
+      this.uploadError = job.error || 'Error during indexing';
+      return;
+    }
+
+    setTimeout(() => {
+      this.apiService.getIngestionJob(job.id).subscribe({
+        next: (updatedJob) => this.waitForJob(updatedJob),
+        error: (error) => {
+          this.uploading = false;
+          this.uploadError = error.error?.detail || error.message || 'Error while checking indexing status';
+          console.error('Job status error:', error);
+        }
+      });
+    }, JOB_POLL_INTERVAL_MS);
+  }
 }
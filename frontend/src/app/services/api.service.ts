@@ -1,6 +1,7 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
+import { map } from 'rxjs/operators';
 import { environment } from '../../environments/environment';
 
 export interface Paper {
@@ -14,6 +15,19 @@ export interface Paper {
   created_at: string;
 }
 
+export interface IngestionJob {
+  id: number;
+  filename: string;
+  status: 'pending' | 'running' | 'done' | 'failed';
+  attempts: number;
+  max_attempts: number;
+  error?: string;
+  paper_id?: number;
+  created_at: string;
+  updated_at: string;
+  finished_at?: string;
+}
+
 export interface ChatRequest {
   question: string;
   conversation_id?: number;
@@ -63,6 +77,12 @@ export interface Conversation {
   created_at: string;
   updated_at: string;
   messages: Message[];
+  next_messages_cursor?: string | null;
+}
+
+export interface MessagePage {
+  messages: Message[];
+  next_cursor: string | null;
 }
 
 export interface ConversationListItem {
@@ -83,14 +103,20 @@ export class ApiService {
   constructor(private http: HttpClient) { }
 
   // Papers endpoints
-  uploadPaper(file: File): Observable<Paper> {
+  uploadPaper(file: File): Observable<IngestionJob> {
     const formData = new FormData();
     formData.append('file', file);
-    return this.http.post<Paper>(`${this.apiUrl}/api/papers/upload`, formData);
+    return this.http.post<IngestionJob>(`${this.apiUrl}/api/papers/upload`, formData);
+  }
+
+  getIngestionJob(id: number): Observable<IngestionJob> {
+    return this.http.get<IngestionJob>(`${this.apiUrl}/api/papers/jobs/${id}`);
   }
 
-  listPapers(skip: number = 0, limit: number = 10, search?: string, year?: number): Observable<Paper[]> {
-    let params: any = { skip, limit };
+  // List endpoints are keyset-paginated: the X-Next-Cursor response header is the cursor of the next page
+  listPapers(cursor?: string, limit: number = 10, search?: string, year?: number): Observable<Paper[]> {
+    let params: any = { limit };
+    if (cursor) params.cursor = cursor;
     if (search) params.search = search;
     if (year) params.year = year;
     return this.http.get<Paper[]>(`${this.apiUrl}/api/papers`, { params });
@@ -119,14 +145,31 @@ export class ApiService {
     return this.http.post<Conversation>(`${this.apiUrl}/api/conversations`, { title });
   }
 
-  listConversations(skip: number = 0, limit: number = 20): Observable<ConversationListItem[]> {
-    return this.http.get<ConversationListItem[]>(`${this.apiUrl}/api/conversations`, { params: { skip, limit } });
+  listConversations(cursor?: string, limit: number = 20): Observable<ConversationListItem[]> {
+    let params: any = { limit };
+    if (cursor) params.cursor = cursor;
+    return this.http.get<ConversationListItem[]>(`${this.apiUrl}/api/conversations`, { params });
   }
 
   getConversation(id: number): Observable<Conversation> {
     return this.http.get<Conversation>(`${this.apiUrl}/api/conversations/${id}`);
   }
 
+  // Messages before the cursor (next_messages_cursor of the conversation), oldest first
+  listMessages(conversationId: number, cursor?: string, limit: number = 50): Observable<MessagePage> {
+    let params: any = { limit };
+    if (cursor) params.cursor = cursor;
+    return this.http.get<Message[]>(
+      `${this.apiUrl}/api/conversations/${conversationId}/messages`,
+      { params, observe: 'response' }
+    ).pipe(
+      map(response => ({
+        messages: response.body || [],
+        next_cursor: response.headers.get('X-Next-Cursor')
+      }))
+    );
+  }
+
   deleteConversation(id: number): Observable<{ message: string }> {
     return this.http.delete<{ message: string }>(`${this.apiUrl}/api/conversations/${id}`);
   }